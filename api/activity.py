@@ -0,0 +1,126 @@
+"""
+Activity feeds: a task's or project's comments and change-log entries in one
+stream, newest first.
+
+Every page reads at most ``page_size + 1`` rows from each source, walking its
+``(task|project, time, id)`` index backwards from the cursor, and merges them.
+The cursor names the last item returned (time, source, id), so deep pages
+cost the same as the first one and items written meanwhile never shift a
+page. Equal timestamps are ordered by source and then id, so the order is
+total and no item is skipped or repeated across pages.
+"""
+import base64
+import heapq
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.utils.urls import replace_query_param
+
+from .models import Comment, TaskLog
+
+CURSOR_PARAM = 'cursor'
+PAGE_SIZE_PARAM = 'page_size'
+
+
+class Source:
+    def __init__(self, name, rank, model, time_field, actor_field, fields):
+        self.name = name
+        self.rank = rank
+        self.model = model
+        self.time_field = time_field
+        self.actor_field = actor_field
+        self.fields = fields
+
+    def page(self, scope, cursor, limit, actor=None):
+        queryset = (
+            self.model.objects.filter(**scope)
+            .select_related(self.actor_field)
+            .only('id', 'task_id', self.time_field, *self.fields,
+                  f'{self.actor_field}__id', f'{self.actor_field}__username')
+            .order_by(f'-{self.time_field}', '-id')
+        )
+        if actor is not None:
+            queryset = queryset.filter(**{f'{self.actor_field}_id': actor})
+        if cursor is not None:
+            queryset = queryset.filter(self.before(*cursor))
+        return list(queryset[:limit])
+
+    def before(self, time, rank, pk):
+        """Rows that sort after the cursor in the feed's (time, rank, id) descending order"""
+        older = Q(**{f'{self.time_field}__lt': time})
+        if self.rank < rank:
+            return older | Q(**{self.time_field: time})
+        if self.rank > rank:
+            return older
+        return older | Q(**{self.time_field: time, 'id__lt': pk})
+
+    def key(self, obj):
+        return getattr(obj, self.time_field), self.rank, obj.pk
+
+    def render(self, obj):
+        actor = getattr(obj, self.actor_field)
+        return {
+            'type': self.name,
+            'id': obj.pk,
+            'task': obj.task_id,
+            'timestamp': getattr(obj, self.time_field),
+            'user': {'id': actor.id, 'username': actor.username},
+            **{field: getattr(obj, field) for field in self.fields},
+        }
+
+
+SOURCES = {
+    'comment': Source('comment', 0, Comment, 'created_at', 'author', ['content']),
+    'log': Source('log', 1, TaskLog, 'timestamp', 'changed_by', ['field_changed', 'old_value', 'new_value']),
+}
+
+
+def encode_cursor(key):
+    time, rank, pk = key
+    raw = f'{time.isoformat()}|{rank}|{pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+        time, rank, pk = raw.split('|')
+        return datetime.fromisoformat(time), int(rank), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        raise NotFound('Invalid cursor')
+
+
+def feed(request, scope, types=None):
+    """
+    One page of the feed for ``scope`` (``{'task_id': ..}`` or
+    ``{'project_id': ..}``) as ``{'next': url or None, 'results': [...]}``.
+    ``?type=comment|log`` and ``?user=<id>`` narrow it when ``types`` is not fixed.
+    """
+    params = request.query_params
+    if types is None:
+        requested = params.get('type')
+        if requested and requested not in SOURCES:
+            raise ValidationError({'type': [f'Choose from {", ".join(SOURCES)}.']})
+        types = [requested] if requested else list(SOURCES)
+    try:
+        actor = int(params['user']) if params.get('user') else None
+        page_size = int(params.get(PAGE_SIZE_PARAM, settings.ACTIVITY_PAGE_SIZE))
+    except ValueError:
+        raise ValidationError({'detail': 'user and page_size must be integers.'})
+    page_size = max(1, min(page_size, settings.ACTIVITY_MAX_PAGE_SIZE))
+    cursor = decode_cursor(params[CURSOR_PARAM]) if params.get(CURSOR_PARAM) else None
+
+    streams = []
+    for name in types:
+        source = SOURCES[name]
+        rows = source.page(scope, cursor, page_size + 1, actor)
+        streams.append([(source.key(obj), source, obj) for obj in rows])
+    merged = list(heapq.merge(*streams, key=lambda item: item[0], reverse=True))
+
+    page = merged[:page_size]
+    next_url = None
+    if len(merged) > page_size:
+        next_url = replace_query_param(request.build_absolute_uri(), CURSOR_PARAM, encode_cursor(page[-1][0]))
+    return {'next': next_url, 'results': [source.render(obj) for _, source, obj in page]}
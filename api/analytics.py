@@ -0,0 +1,359 @@
+"""
+Project flow analytics computed from ``TaskLog`` status transitions.
+
+Per project, the log is folded into a small state held in the cache: each
+task's current status and when it entered it, plus columnar arrays of
+finished status intervals, cycle and lead times, and per-day completion and
+burndown deltas. Each read first folds in only the ``TaskLog`` rows (and
+tasks) newer than the ones already seen, so the cost of a request follows the
+activity since the last one rather than the project's history. Ids are handed
+out on insert but rows only show up on commit, so a row can appear after one
+with a higher id was folded: rows from the last ``ANALYTICS_FOLD_OVERLAP``
+seconds before the newest folded one are read again and skipped by id when
+already folded. Log rows are read through the ``project`` column. Rows are read
+as flat tuples with ``values_list``, ``ANALYTICS_BATCH_SIZE`` at a time, never
+as model instances or all at once; creation and first-start times are looked
+up only for the tasks completing in a batch. The pickled state is stored in
+pieces of at most ``ANALYTICS_CACHE_ITEM_BYTES``, so a large project stays
+under memcached's item size limit instead of silently missing the cache.
+
+Deleting a task drops its log rows but not what was already folded in; pass
+``refresh=True`` (``?refresh=1``) to rebuild a project's state from scratch.
+The state also expires after ``ANALYTICS_CACHE_TIMEOUT``.
+"""
+import pickle
+import uuid
+from array import array
+from collections import Counter
+from datetime import datetime, timedelta, timezone as dt_timezone
+from itertools import accumulate
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Min, OuterRef, Q, Subquery
+from django.utils import timezone
+
+from .models import Task, TaskLog
+
+STATUSES = [choice for choice, _ in Task.STATUS_CHOICES]
+DONE = 'done'
+STARTED = 'in_progress'
+STATE_VERSION = 3
+# One shared string object per status, so the pickled state stores each name once
+_STATUS_NAMES = {status: status for status in STATUSES}
+
+
+def state_key(project_id):
+    return f'analytics:{project_id}:v{STATE_VERSION}'
+
+
+def _empty_state():
+    return {
+        'last_log_id': 0,
+        'last_task_id': 0,
+        # Newest log timestamp and task creation time folded, in epoch seconds
+        'log_watermark': 0.0,
+        'task_watermark': 0.0,
+        # Log id -> timestamp of the folded rows the overlap can read again
+        'recent_logs': {},
+        # task id -> [status, entered at]
+        'tasks': {},
+        # status -> (interval end times, interval lengths), both in epoch seconds
+        'dwell': {s: (array('d'), array('d')) for s in STATUSES},
+        # Completion time, cycle time (first start -> done) and lead time (created -> done)
+        'done_at': array('d'),
+        'cycle': array('d'),
+        'lead': array('d'),
+        'done_tasks': array('q'),
+        # Day ordinal -> change in the number of open tasks
+        'open_delta': Counter(),
+    }
+
+
+def _moment(ts):
+    return datetime.fromtimestamp(max(0.0, ts), tz=dt_timezone.utc)
+
+
+def _day(ts):
+    return datetime.fromtimestamp(ts, tz=timezone.get_current_timezone()).date().toordinal()
+
+
+def _chunks(queryset, size):
+    chunk = []
+    for row in queryset.iterator(chunk_size=size):
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _cache_get(key):
+    """The state stored by ``_cache_set``, or ``None`` if it (or any piece of it) is gone"""
+    head = cache.get(key)
+    if head is None:
+        return None
+    token, count = head
+    part_keys = [f'{key}:{token}:{i}' for i in range(count)]
+    parts = cache.get_many(part_keys)
+    if len(parts) != count:
+        return None
+    return pickle.loads(b''.join(parts[part_key] for part_key in part_keys))
+
+
+def _cache_set(key, state):
+    blob = pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+    size = settings.ANALYTICS_CACHE_ITEM_BYTES
+    # Pieces carry a fresh token, so a reader never mixes two writes
+    token = uuid.uuid4().hex[:12]
+    parts = {f'{key}:{token}:{i}': blob[start:start + size] for i, start in enumerate(range(0, len(blob), size))}
+    cache.set_many(parts, timeout=settings.ANALYTICS_CACHE_TIMEOUT)
+    cache.set(key, (token, len(parts)), timeout=settings.ANALYTICS_CACHE_TIMEOUT)
+
+
+def load_state(project_id, refresh=False):
+    """The project's folded state, brought up to date with rows added since the last call"""
+    key = state_key(project_id)
+    state = None if refresh else _cache_get(key)
+    if state is None:
+        state = _empty_state()
+    if _fold(project_id, state):
+        _cache_set(key, state)
+    return state
+
+
+def _fold(project_id, state):
+    """Fold in the tasks and status changes not seen yet; returns whether anything was"""
+    batch_size = settings.ANALYTICS_BATCH_SIZE
+    overlap = settings.ANALYTICS_FOLD_OVERLAP
+    status_logs = TaskLog.objects.filter(project_id=project_id, field_changed='status')
+    # Only logs up to here are folded this time; fixing the bound before tasks
+    # are read means every task those logs mention is read below
+    bound = status_logs.order_by('-id').values_list('id', flat=True).first() or 0
+    changed = False
+
+    # A task's status at creation is the "old" side of its first transition
+    first_old = (TaskLog.objects.filter(task=OuterRef('pk'), field_changed='status')
+                 .order_by('id').values('old_value')[:1])
+    new_tasks = Task.objects.filter(
+        Q(id__gt=state['last_task_id']) | Q(created_at__gte=_moment(state['task_watermark'] - overlap)),
+        project_id=project_id,
+    )
+    rows = (new_tasks.annotate(initial=Subquery(first_old)).order_by('id')
+            .values_list('id', 'status', 'initial', 'created_at'))
+    tasks = state['tasks']
+    open_delta = state['open_delta']
+    for chunk in _chunks(rows, batch_size):
+        for task_id, status, initial, created in chunk:
+            if task_id in tasks:
+                continue
+            status = _STATUS_NAMES.get(initial or status, initial or status)
+            created_ts = created.timestamp()
+            tasks[task_id] = [status, created_ts]
+            if status != DONE:
+                open_delta[_day(created_ts)] += 1
+            state['task_watermark'] = max(state['task_watermark'], created_ts)
+            changed = True
+        state['last_task_id'] = max(state['last_task_id'], chunk[-1][0])
+
+    recent = state['recent_logs']
+    new_logs = status_logs.filter(
+        Q(id__gt=state['last_log_id']) | Q(timestamp__gte=_moment(state['log_watermark'] - overlap)),
+        id__lte=bound,
+    )
+    last = 0
+    while True:
+        logs = list(
+            new_logs.filter(id__gt=last).order_by('id')
+            .values_list('id', 'task_id', 'old_value', 'new_value', 'timestamp')[:batch_size]
+        )
+        if not logs:
+            break
+        last, full = logs[-1][0], len(logs) == batch_size
+        logs = [log for log in logs if log[0] not in recent]
+        if logs:
+            _fold_logs(state, logs)
+            for log_id, _, _, _, timestamp in logs:
+                recent[log_id] = timestamp.timestamp()
+            state['log_watermark'] = max(state['log_watermark'], max(recent[log[0]] for log in logs))
+            changed = True
+        state['last_log_id'] = max(state['last_log_id'], last)
+        if not full:
+            break
+    # Only rows inside the next fold's overlap can be read again
+    horizon = state['log_watermark'] - overlap
+    state['recent_logs'] = {log_id: ts for log_id, ts in recent.items() if ts >= horizon}
+    return changed
+
+
+def _fold_logs(state, logs):
+    tasks = state['tasks']
+    open_delta = state['open_delta']
+    completing = {task_id for _, task_id, old, new, _ in logs
+                  if new == DONE and old != DONE and task_id in tasks}
+    created, started = {}, {}
+    if completing:
+        created = dict(Task.objects.filter(pk__in=completing).values_list('pk', 'created_at'))
+        # First start; leaving in_progress before ever entering it means it was created started
+        starts = (
+            TaskLog.objects.filter(Q(new_value=STARTED) | Q(old_value=STARTED),
+                                   task_id__in=completing, field_changed='status')
+            .order_by().values('task_id')
+            .annotate(entered=Min('timestamp', filter=Q(new_value=STARTED)),
+                      left=Min('timestamp', filter=Q(old_value=STARTED)))
+            .values_list('task_id', 'entered', 'left')
+        )
+        for task_id, entered, left in starts:
+            created_started = left is not None and (entered is None or left < entered)
+            started[task_id] = created.get(task_id) if created_started else entered
+
+    for _, task_id, old, new, timestamp in logs:
+        ts = timestamp.timestamp()
+        new = _STATUS_NAMES.get(new, new)
+        task = tasks.get(task_id)
+        if task is None:
+            # Moved here from another project; its history there is not ours
+            tasks[task_id] = [new, ts]
+            continue
+        if old in state['dwell']:
+            ends, lengths = state['dwell'][old]
+            ends.append(ts)
+            lengths.append(max(0.0, ts - task[1]))
+        task[0], task[1] = new, ts
+        if new == DONE and old != DONE:
+            first_start = started.get(task_id)
+            created_at = created.get(task_id)
+            state['done_at'].append(ts)
+            state['done_tasks'].append(task_id)
+            state['cycle'].append(
+                ts - first_start.timestamp() if first_start is not None and first_start.timestamp() <= ts else -1.0
+            )
+            state['lead'].append(ts - created_at.timestamp() if created_at is not None else -1.0)
+            open_delta[_day(ts)] -= 1
+        elif old == DONE and new != DONE:
+            open_delta[_day(ts)] += 1
+
+
+def _percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted sequence"""
+    index = max(0, -(-len(sorted_values) * pct // 100) - 1)
+    return sorted_values[int(index)]
+
+
+def _summary(seconds):
+    """count/mean/p50/p85/max in hours"""
+    if not seconds:
+        return {'count': 0, 'mean': None, 'p50': None, 'p85': None, 'max': None}
+    hours = sorted(s / 3600 for s in seconds)
+    return {
+        'count': len(hours),
+        'mean': round(sum(hours) / len(hours), 2),
+        'p50': round(_percentile(hours, 50), 2),
+        'p85': round(_percentile(hours, 85), 2),
+        'max': round(hours[-1], 2),
+    }
+
+
+def _since(weeks):
+    return (timezone.now() - timedelta(weeks=weeks)).timestamp()
+
+
+def dwell_times(state, weeks):
+    """Time spent in each status, over intervals that ended within the window"""
+    since = _since(weeks)
+    now = timezone.now().timestamp()
+    current = Counter(task[0] for task in state['tasks'].values())
+    result = {}
+    for status, (ends, lengths) in state['dwell'].items():
+        result[status] = _summary([length for end, length in zip(ends, lengths) if end >= since])
+        result[status]['current'] = current[status]
+        in_status = [now - task[1] for task in state['tasks'].values() if task[0] == status]
+        result[status]['current_age_p50'] = round(_percentile(sorted(in_status), 50) / 3600, 2) if in_status else None
+    return result
+
+
+def cycle_times(state, weeks):
+    since = _since(weeks)
+    recent = [i for i, ts in enumerate(state['done_at']) if ts >= since]
+    return {
+        'cycle_time': _summary([state['cycle'][i] for i in recent if state['cycle'][i] >= 0]),
+        'lead_time': _summary([state['lead'][i] for i in recent if state['lead'][i] >= 0]),
+    }
+
+
+def throughput(state, weeks):
+    """Tasks completed per week (weeks start on Monday), oldest first"""
+    today = timezone.localdate()
+    first = today - timedelta(days=today.weekday(), weeks=weeks - 1)
+    counts = Counter()
+    for ts in state['done_at']:
+        day = _day(ts)
+        if day >= first.toordinal():
+            counts[(day - first.toordinal()) // 7] += 1
+    return [{'week': (first + timedelta(weeks=i)).isoformat(), 'completed': counts[i]} for i in range(weeks)]
+
+
+def burndown(state, days):
+    """Open tasks at the end of each of the last ``days`` days"""
+    today = timezone.localdate().toordinal()
+    first = today - days + 1
+    deltas = state['open_delta']
+    baseline = sum(delta for day, delta in deltas.items() if day < first)
+    remaining = accumulate((deltas.get(day, 0) for day in range(first, today + 1)), initial=baseline)
+    next(remaining)
+    return [
+        {'date': datetime.fromordinal(day).date().isoformat(), 'open': count}
+        for day, count in zip(range(first, today + 1), remaining)
+    ]
+
+
+def _workload_row(rows, user_id, username):
+    return rows.setdefault(user_id, {
+        'user': {'id': user_id, 'username': username},
+        **{s: 0 for s in STATUSES if s != DONE},
+        'open': 0,
+        'completed': 0,
+    })
+
+
+def workload(state, project_id, weeks):
+    """Open tasks by status per assignee, and what each completed within the window"""
+    rows = {}
+    open_tasks = (
+        Task.objects.filter(project_id=project_id).exclude(status=DONE).order_by()
+        .values_list('assigned_to_id', 'assigned_to__username', 'status').annotate(total=Count('id'))
+    )
+    for user_id, username, status, total in open_tasks:
+        row = _workload_row(rows, user_id, username)
+        row[status] = total
+        row['open'] += total
+
+    since = _since(weeks)
+    recent = {task_id for task_id, ts in zip(state['done_tasks'], state['done_at']) if ts >= since}
+    if recent:
+        completed = (
+            Task.objects.filter(project_id=project_id, id__in=recent, status=DONE).order_by()
+            .values_list('assigned_to_id', 'assigned_to__username').annotate(total=Count('id'))
+        )
+        for user_id, username, total in completed:
+            _workload_row(rows, user_id, username)['completed'] = total
+    return sorted(rows.values(), key=lambda row: (-row['open'], row['user']['username']))
+
+
+REPORT_NAMES = ['dwell-times', 'cycle-times', 'throughput', 'burndown', 'workload']
+
+
+def report(project_id, name=None, weeks=12, days=30, refresh=False):
+    """One named report, or all of them keyed by name"""
+    state = load_state(project_id, refresh=refresh)
+    builders = {
+        'dwell-times': lambda: dwell_times(state, weeks),
+        'cycle-times': lambda: cycle_times(state, weeks),
+        'throughput': lambda: throughput(state, weeks),
+        'burndown': lambda: burndown(state, days),
+        'workload': lambda: workload(state, project_id, weeks),
+    }
+    if name is not None:
+        return builders[name]()
+    return {key: build() for key, build in builders.items()}
@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from . import checks, signals  # noqa: F401
+        from .slow_queries import install
+
+        connection_created.connect(install, dispatch_uid='api.slow_queries')
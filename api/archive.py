@@ -0,0 +1,233 @@
+"""
+Hot/cold storage for tasks.
+
+Done tasks of projects with no activity for ``ARCHIVE_INACTIVE_DAYS`` make up
+most of the task, comment and log rows while nobody reads them. ``archive_project``
+moves them, with their comments, change log and follower ids, into the
+``TaskArchive``/``CommentArchive``/``TaskLogArchive`` tables in batches, so
+the indexes behind every hot ``Task`` query only cover live work. Archived
+rows keep their original ids and are read through the project's
+``archived-tasks`` endpoints (or ``?include_archived=1`` on a task's detail);
+``unarchive`` puts them back on demand.
+
+Tasks that take part in a dependency stay hot: the dependency graph only
+reads ``Task``. Notifications about an archived task are kept with their
+task and comment links cleared. Nothing is written to the sync feed either
+way: the rows did not change, they only moved.
+"""
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from . import dashboard, followers
+from .models import (
+    Comment, CommentArchive, Notification, Project, Task, TaskArchive, TaskDependency, TaskFollower,
+    TaskLog, TaskLogArchive, TaskReminder,
+)
+from .positions import key_between
+
+DONE = 'done'
+
+
+def inactive_projects(days):
+    """Projects with done tasks and no task, comment or log activity in the last ``days`` days"""
+    cutoff = timezone.now() - timedelta(days=days)
+    return (
+        Project.objects.filter(updated_at__lt=cutoff)
+        .filter(Exists(Task.objects.filter(project=OuterRef('pk'), status=DONE)))
+        .exclude(Exists(Task.objects.filter(project=OuterRef('pk'), updated_at__gte=cutoff)))
+        .exclude(Exists(Comment.objects.filter(project=OuterRef('pk'), created_at__gte=cutoff)))
+        .exclude(Exists(TaskLog.objects.filter(project=OuterRef('pk'), timestamp__gte=cutoff)))
+        .order_by('id')
+    )
+
+
+def archivable_tasks(project_id):
+    in_graph = TaskDependency.objects.filter(Q(task=OuterRef('pk')) | Q(blocked_by=OuterRef('pk')))
+    return Task.objects.filter(project_id=project_id, status=DONE).exclude(Exists(in_graph))
+
+
+def archive_project(project_id, batch_size, sleep=0):
+    """Move the project's archivable tasks to the archive tables; returns rows moved per model"""
+    moved = {'tasks': 0, 'comments': 0, 'logs': 0}
+    assignee_ids = set()
+    kept = set()
+    while True:
+        with transaction.atomic():
+            # The lock makes a reopen or a new comment wait for the batch;
+            # without one (SQLite) the checks in _archive_batch catch them
+            ids = list(archivable_tasks(project_id).exclude(pk__in=kept).select_for_update()
+                       .order_by('pk').values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                break
+            counts, assignees, late = _archive_batch(project_id, ids)
+        assignee_ids.update(assignees)
+        kept.update(late)
+        for key, count in counts.items():
+            moved[key] += count
+        if sleep:
+            time.sleep(sleep)
+
+    if moved['tasks']:
+        _forget_counts(project_id, assignee_ids)
+    return moved
+
+
+def _archive_batch(project_id, ids):
+    rows = list(Task.objects.filter(pk__in=ids, status=DONE).order_by('pk').values(
+        'id', 'title', 'description', 'status', 'due_date', 'assigned_to_id', 'created_at', 'updated_at'))
+    ids = [row['id'] for row in rows]
+    # Explicit follows only; mutes of rule-based follows are not kept
+    explicit = {}
+    for task_id, user_id in (TaskFollower.objects.filter(task_id__in=ids, muted=False)
+                             .values_list('task_id', 'user_id')):
+        explicit.setdefault(task_id, []).append(user_id)
+
+    TaskArchive.objects.bulk_create([
+        TaskArchive(
+            original_id=row['id'], project_id=project_id, title=row['title'], description=row['description'],
+            status=row['status'], due_date=row['due_date'], assigned_to_id=row['assigned_to_id'],
+            follower_ids=sorted(explicit.get(row['id'], [])),
+            created_at=row['created_at'], updated_at=row['updated_at'],
+        )
+        for row in rows
+    ])
+    archive_ids = dict(TaskArchive.objects.filter(original_id__in=ids).values_list('original_id', 'id'))
+
+    comments = CommentArchive.objects.bulk_create([
+        CommentArchive(original_id=pk, task_id=archive_ids[task_id], author_id=author_id, content=content,
+                       created_at=created_at, updated_at=updated_at)
+        for pk, task_id, author_id, content, created_at, updated_at in
+        Comment.objects.filter(task_id__in=ids).order_by('pk').values_list(
+            'id', 'task_id', 'author_id', 'content', 'created_at', 'updated_at')
+    ])
+    logs = TaskLogArchive.objects.bulk_create([
+        TaskLogArchive(original_id=pk, task_id=archive_ids[task_id], field_changed=field, old_value=old,
+                       new_value=new, changed_by_id=changed_by_id, timestamp=timestamp)
+        for pk, task_id, field, old, new, changed_by_id, timestamp in
+        TaskLog.objects.filter(task_id__in=ids).order_by('pk').values_list(
+            'id', 'task_id', 'field_changed', 'old_value', 'new_value', 'changed_by_id', 'timestamp')
+    ])
+
+    # A comment or log entry written since the copy keeps its task hot until the next run
+    comment_ids = [comment.original_id for comment in comments]
+    log_ids = [log.original_id for log in logs]
+    late = set(Comment.objects.filter(task_id__in=ids).exclude(pk__in=comment_ids)
+               .values_list('task_id', flat=True))
+    late.update(TaskLog.objects.filter(task_id__in=ids).exclude(pk__in=log_ids).values_list('task_id', flat=True))
+    if late:
+        TaskArchive.objects.filter(original_id__in=late).delete()
+        late_archives = {archive_ids[pk] for pk in late}
+        comments = [comment for comment in comments if comment.task_id not in late_archives]
+        logs = [log for log in logs if log.task_id not in late_archives]
+        comment_ids = [comment.original_id for comment in comments]
+        log_ids = [log.original_id for log in logs]
+        ids = [pk for pk in ids if pk not in late]
+
+    Notification.objects.filter(Q(task_id__in=ids) | Q(comment_id__in=comment_ids)).update(task=None, comment=None)
+    # Every dependent row was copied or detached above, so bypass the
+    # collector (and its per-row signals, which would write sync tombstones).
+    # Comments and logs go by the copied pks only, never by task.
+    Comment.objects.filter(pk__in=comment_ids)._raw_delete(Comment.objects.db)
+    TaskLog.objects.filter(pk__in=log_ids)._raw_delete(TaskLog.objects.db)
+    for model in (TaskFollower, TaskReminder):
+        model.objects.filter(task_id__in=ids)._raw_delete(model.objects.db)
+    moving = set(ids)
+    assignees = {row['assigned_to_id'] for row in rows if row['id'] in moving}
+    Task.objects.filter(pk__in=ids)._raw_delete(Task.objects.db)
+    counts = {'tasks': len(ids), 'comments': len(comments), 'logs': len(logs)}
+    return counts, assignees, late
+
+
+def unarchive(project_id, task_ids=None, batch_size=500):
+    """
+    Move archived tasks of the project (all, or the given original ids) back
+    to the hot tables; returns the restored task ids. Restored tasks go to
+    the end of the done column and count as just updated, so the next
+    archiving run leaves them alone.
+    """
+    queryset = TaskArchive.objects.filter(project_id=project_id)
+    if task_ids is not None:
+        queryset = queryset.filter(original_id__in=task_ids)
+    project = Project.all_objects.only('id', 'manager_id').get(pk=project_id)
+
+    restored = []
+    assignee_ids = set()
+    while True:
+        with transaction.atomic():
+            archives = list(queryset.order_by('original_id')[:batch_size])
+            if not archives:
+                break
+            assignee_ids.update(_unarchive_batch(project, archives))
+        restored += [archive.original_id for archive in archives]
+
+    if restored:
+        _forget_counts(project_id, assignee_ids)
+        followers.forget(restored)
+    return restored
+
+
+def _unarchive_batch(project, archives):
+    archive_ids = [archive.id for archive in archives]
+    comments = list(CommentArchive.objects.filter(task_id__in=archive_ids).order_by('original_id'))
+    logs = list(TaskLogArchive.objects.filter(task_id__in=archive_ids).order_by('original_id'))
+    user_ids = {archive.assigned_to_id for archive in archives}
+    user_ids.update(user_id for archive in archives for user_id in archive.follower_ids)
+    user_ids.update(comment.author_id for comment in comments)
+    user_ids.update(log.changed_by_id for log in logs)
+    # Comments and log entries of users deleted meanwhile would have been deleted with them
+    users = set(User.objects.filter(pk__in=user_ids).values_list('pk', flat=True))
+
+    position = Task.end_of_column(project.id, DONE)
+    tasks = []
+    for archive in archives:
+        tasks.append(Task(
+            id=archive.original_id, project_id=project.id, title=archive.title, description=archive.description,
+            status=archive.status, due_date=archive.due_date, position=position, created_at=archive.created_at,
+            # An assignee deleted meanwhile hands the task to the project manager
+            assigned_to_id=archive.assigned_to_id if archive.assigned_to_id in users else project.manager_id,
+        ))
+        position = key_between(position, None)
+    Task.objects.bulk_create(tasks)
+    # auto_now_add would stamp the restore time over the original
+    for task, archive in zip(tasks, archives):
+        task.created_at = archive.created_at
+    Task.objects.bulk_update(tasks, ['created_at'])
+
+    original = {archive.id: archive.original_id for archive in archives}
+    TaskFollower.objects.bulk_create([
+        TaskFollower(task_id=archive.original_id, user_id=user_id)
+        for archive in archives for user_id in archive.follower_ids if user_id in users
+    ])
+    restored_comments = Comment.objects.bulk_create([
+        Comment(id=comment.original_id, task_id=original[comment.task_id], project_id=project.id,
+                author_id=comment.author_id, content=comment.content)
+        for comment in comments if comment.author_id in users
+    ])
+    restored_logs = TaskLog.objects.bulk_create([
+        TaskLog(id=log.original_id, task_id=original[log.task_id], project_id=project.id,
+                field_changed=log.field_changed, old_value=log.old_value, new_value=log.new_value,
+                changed_by_id=log.changed_by_id)
+        for log in logs if log.changed_by_id in users
+    ])
+    # Put back the original timestamps that auto_now(_add) replaced
+    stamps = {comment.original_id: comment for comment in comments}
+    for comment in restored_comments:
+        comment.created_at = stamps[comment.id].created_at
+        comment.updated_at = stamps[comment.id].updated_at
+    Comment.objects.bulk_update(restored_comments, ['created_at', 'updated_at'])
+    stamps = {log.original_id: log.timestamp for log in logs}
+    for log in restored_logs:
+        log.timestamp = stamps[log.id]
+    TaskLog.objects.bulk_update(restored_logs, ['timestamp'])
+
+    TaskArchive.objects.filter(pk__in=archive_ids).delete()
+    return {task.assigned_to_id for task in tasks}
+
+
+def _forget_counts(project_id, assignee_ids):
+    dashboard.forget_many([project_id], assignee_ids)
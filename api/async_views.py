@@ -0,0 +1,161 @@
+"""
+Async read views for the ASGI deployment profile.
+
+GET requests for the notification inbox, the task list and the project detail
+are served with Django's async ORM, so a slow database call parks a coroutine
+instead of tying up a worker. Every other method on the same URLs is handed to
+the regular DRF view. These views are only routed when ``ASYNC_READ_VIEWS`` is
+enabled (see ``api/urls.py``).
+"""
+import functools
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db.models import Count, Q
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import APIException, AuthenticationFailed, NotAuthenticated, NotFound
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from .error_handlers import custom_exception_handler
+from .models import Notification, Project, Task
+from .serializers import NotificationSerializer, ProjectSerializer, TaskListSerializer, UserSerializer
+from .views import NotificationViewSet, ProjectViewSet, TaskViewSet
+
+jwt_authentication = JWTAuthentication()
+
+
+async def authenticate(request):
+    """Async counterpart of ``JWTAuthentication.authenticate``; the user lookup is awaited"""
+    # Batch sub-requests carry the user the batch request was authenticated as
+    forced = getattr(request, '_force_auth_user', None)
+    if forced is not None:
+        return forced
+    header = jwt_authentication.get_header(request)
+    raw_token = jwt_authentication.get_raw_token(header) if header is not None else None
+    if raw_token is None:
+        raise NotAuthenticated()
+
+    validated_token = jwt_authentication.get_validated_token(raw_token)
+    try:
+        user_id = validated_token[jwt_settings.USER_ID_CLAIM]
+    except KeyError:
+        raise InvalidToken('Token contained no recognizable user identification')
+
+    try:
+        user = await User.objects.aget(**{jwt_settings.USER_ID_FIELD: user_id})
+    except User.DoesNotExist:
+        raise AuthenticationFailed('User not found', code='user_not_found')
+    if not user.is_active:
+        raise AuthenticationFailed('User is inactive', code='user_inactive')
+    return user
+
+
+def async_read_view(fallback):
+    """Serve GET with the decorated coroutine; delegate other methods to the sync ``fallback`` view"""
+    sync_fallback = sync_to_async(fallback)
+
+    def decorator(view):
+        @csrf_exempt
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method != 'GET':
+                return await sync_fallback(request, *args, **kwargs)
+            try:
+                user = await authenticate(request)
+                drf_request = Request(request)
+                drf_request.user = user
+                return await view(drf_request, *args, **kwargs)
+            except APIException as exc:
+                response = custom_exception_handler(exc, {})
+                return JsonResponse(response.data, status=response.status_code)
+        return wrapper
+    return decorator
+
+
+async def paginate(request, queryset, serializer_class):
+    """Async equivalent of ``PageNumberPagination``, producing the same envelope"""
+    page_size = api_settings.PAGE_SIZE
+    try:
+        page = int(request.query_params.get('page', 1))
+    except ValueError:
+        raise NotFound('Invalid page.')
+    count = await queryset.acount()
+    if page < 1 or (page > 1 and (page - 1) * page_size >= count):
+        raise NotFound('Invalid page.')
+
+    objects = [obj async for obj in queryset[(page - 1) * page_size:page * page_size]]
+    url = request.build_absolute_uri()
+    if page == 1:
+        previous = None
+    elif page == 2:
+        previous = remove_query_param(url, 'page')
+    else:
+        previous = replace_query_param(url, 'page', page - 1)
+
+    return {
+        'count': count,
+        'next': replace_query_param(url, 'page', page + 1) if page * page_size < count else None,
+        'previous': previous,
+        'results': serializer_class(objects, many=True, context={'request': request}).data,
+    }
+
+
+@async_read_view(NotificationViewSet.as_view({'get': 'list'}))
+async def notification_list(request):
+    notifications = Notification.objects.filter(user=request.user).order_by('-created_at')
+    notifications = NotificationSerializer.setup_queryset(notifications, request)
+    serializer = NotificationSerializer([n async for n in notifications], many=True, context={'request': request})
+    return JsonResponse(serializer.data, safe=False)
+
+
+@async_read_view(TaskViewSet.as_view({'get': 'list', 'post': 'create'}))
+async def task_list(request):
+    view = TaskViewSet(action='list', format_kwarg=None, args=(), kwargs={})
+    view.request = request
+    # Filter backends may validate choices against the database, so the
+    # queryset is built in a worker thread; evaluating it is fully async.
+    queryset = await sync_to_async(lambda: view.filter_queryset(view.get_queryset()))()
+    return JsonResponse(await paginate(request, queryset, TaskListSerializer))
+
+
+@async_read_view(ProjectViewSet.as_view({'get': 'retrieve', 'put': 'update',
+                                         'patch': 'partial_update', 'delete': 'destroy'}))
+async def project_detail(request, pk):
+    queryset = ProjectSerializer.setup_queryset(Project.objects.filter(members=request.user), request)
+    try:
+        project = await queryset.aget(pk=pk)
+    except Project.DoesNotExist:
+        raise NotFound()
+
+    selected, _ = ProjectSerializer.requested_fields(request)
+    wanted = set(ProjectSerializer.Meta.fields) if selected is None else selected
+    # These method fields query the database, so they are computed here with
+    # awaited queries instead.
+    computed = {'member_count', 'members_preview', 'tasks', 'task_stats'}
+    serializer = ProjectSerializer(project, context={'request': request}, fields=wanted - computed)
+    data = dict(serializer.data)
+
+    if 'member_count' in wanted:
+        data['member_count'] = await project.members.acount()
+    if 'members_preview' in wanted:
+        members = project.members.order_by('id')[:settings.PROJECT_MEMBERS_PREVIEW_SIZE]
+        data['members_preview'] = UserSerializer([user async for user in members], many=True).data
+
+    if 'tasks' in wanted:
+        tasks = TaskListSerializer.setup_queryset(project.tasks.all())[:5]
+        data['tasks'] = TaskListSerializer([task async for task in tasks], many=True).data
+    if 'task_stats' in wanted:
+        data['task_stats'] = await Task.objects.filter(project=project).aaggregate(
+            total=Count('id'),
+            todo=Count('id', filter=Q(status='todo')),
+            in_progress=Count('id', filter=Q(status='in_progress')),
+            done=Count('id', filter=Q(status='done')),
+        )
+    return JsonResponse(data)
@@ -0,0 +1,123 @@
+"""
+``POST /api/batch/``: run several API calls in one round trip.
+
+The batch request is authenticated once and every sub-request is dispatched
+straight to the view that ``api/urls.py`` resolves it to, skipping the
+middleware stack and re-authentication. Sub-requests run in order; runs of
+consecutive GETs are independent of each other and are served concurrently
+by up to ``BATCH_MAX_WORKERS`` threads.
+"""
+import asyncio
+import io
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import connections
+from django.urls import Resolver404, resolve
+from rest_framework import permissions
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .serializers import BatchSerializer
+
+logger = logging.getLogger(__name__)
+
+API_PREFIX = '/api/'
+# Request metadata that sub-requests inherit from the batch request
+INHERITED_META = ('SERVER_NAME', 'SERVER_PORT', 'REMOTE_ADDR', 'HTTP_HOST', 'HTTP_USER_AGENT',
+                  'HTTP_X_FORWARDED_FOR', 'HTTP_X_FORWARDED_PROTO', 'wsgi.url_scheme')
+
+
+def build_subrequest(request, item):
+    url = urlsplit(item['path'])
+    body = b'' if item.get('body') is None else json.dumps(item['body']).encode()
+    environ = {key: request.META[key] for key in INHERITED_META if key in request.META}
+    environ.update({
+        'REQUEST_METHOD': item['method'],
+        'PATH_INFO': url.path,
+        'QUERY_STRING': url.query,
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.input': io.BytesIO(body),
+    })
+    for name, value in item.get('headers', {}).items():
+        environ['HTTP_' + name.upper().replace('-', '_')] = value
+
+    subrequest = WSGIRequest(environ)
+    # Reuse the batch request's authentication instead of running it again
+    subrequest.user = request.user
+    subrequest._force_auth_user = request.user
+    subrequest._force_auth_token = request.auth
+    return subrequest
+
+
+def dispatch(request, item):
+    """Run one sub-request and return its ``{status, body}`` entry"""
+    path = urlsplit(item['path']).path
+    if not path.startswith(API_PREFIX):
+        return {'status': 400, 'body': {'detail': f'Path must start with {API_PREFIX}'}}
+    try:
+        match = resolve(path[len(API_PREFIX) - 1:], urlconf='api.urls')
+    except Resolver404:
+        return {'status': 404, 'body': {'detail': 'Not found.'}}
+    if getattr(match.func, 'view_class', None) is BatchView:
+        return {'status': 400, 'body': {'detail': 'Batch requests cannot be nested.'}}
+
+    view = match.func
+    if asyncio.iscoroutinefunction(view):
+        view = async_to_sync(view)
+    try:
+        response = view(build_subrequest(request, item), *match.args, **match.kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+    except Exception:
+        logger.exception('Batch sub-request %s %s failed', item['method'], item['path'])
+        return {'status': 500, 'body': {'detail': 'Internal server error.'}}
+
+    body = None
+    if response.content:
+        if response.get('Content-Type', '').startswith('application/json'):
+            body = json.loads(response.content)
+        else:
+            body = response.content.decode(response.charset)
+    return {'status': response.status_code, 'body': body}
+
+
+def dispatch_in_thread(request, item):
+    try:
+        return dispatch(request, item)
+    finally:
+        # Worker threads open their own connections; don't leave them behind
+        connections.close_all()
+
+
+class BatchView(APIView):
+    """Run a list of sub-requests and return their results in the same order"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        items = serializer.validated_data['requests']
+
+        results = []
+        reads = []
+        with ThreadPoolExecutor(max_workers=settings.BATCH_MAX_WORKERS) as pool:
+            for item in items + [None]:
+                if item is not None and item['method'] == 'GET' and settings.BATCH_MAX_WORKERS > 1:
+                    reads.append(item)
+                    continue
+                # A write (or the end of the batch) waits for the pending reads
+                if len(reads) > 1:
+                    results.extend(pool.map(lambda read: dispatch_in_thread(request, read), reads))
+                else:
+                    results.extend(dispatch(request, read) for read in reads)
+                reads = []
+                if item is not None:
+                    results.append(dispatch(request, item))
+        return Response({'results': results})
@@ -0,0 +1,26 @@
+"""
+System checks for settings the API's caches depend on.
+"""
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+# Backends whose entries live inside one worker process
+PROCESS_LOCAL_CACHES = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """Follower sets and dashboard counters are dropped or adjusted in place, so every worker must see it"""
+    backend = settings.CACHES.get('default', {}).get('BACKEND')
+    if backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [Warning(
+        'The default cache is local to each worker process.',
+        hint=('Follower sets and dashboard counters changed by one worker stay stale in the others until they '
+              'expire, so users keep being notified after unfollowing or leaving a project. Set REDIS_URL to '
+              'a cache shared by every worker.'),
+        id='api.W001',
+    )]
@@ -0,0 +1,192 @@
+"""
+Negotiated response compression: zstd, brotli or gzip.
+
+``CompressionMiddleware`` picks the best encoding the client accepts (ties go
+to the order of ``COMPRESSION_ENCODINGS``) and compresses compressible
+responses of at least ``COMPRESSION_MIN_SIZE`` bytes. Streaming responses,
+sync or async, are compressed chunk by chunk and flushed after every chunk,
+so clients keep receiving data as it is produced.
+
+Levels default to cheap settings (gzip 5, brotli 4, zstd 3): on JSON they
+keep most of the size reduction of the maximum levels at a fraction of the
+CPU. ``python benchmarks/compression.py`` measures the trade-off on task list
+pages. brotli and zstd need the ``brotli`` and ``zstandard`` packages; an
+encoding whose package is missing is simply never offered.
+"""
+import gzip
+import zlib
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSIBLE_TYPES = (
+    'application/json', 'application/problem+json', 'application/x-ndjson', 'application/javascript',
+    'application/xml', 'application/vnd.oai.openapi', 'image/svg+xml', 'text/',
+)
+
+
+class GzipEncoder:
+    name = 'gzip'
+
+    def __init__(self, level):
+        self.level = level
+
+    def compress(self, data):
+        return gzip.compress(data, compresslevel=self.level, mtime=0)
+
+    def stream(self):
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, 31)  # 31: gzip container
+        return (lambda data: compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH),
+                compressor.flush)
+
+
+class BrotliEncoder:
+    name = 'br'
+
+    def __init__(self, quality):
+        self.quality = quality
+
+    def compress(self, data):
+        return brotli.compress(data, quality=self.quality)
+
+    def stream(self):
+        compressor = brotli.Compressor(quality=self.quality)
+        return (lambda data: compressor.process(data) + compressor.flush(), compressor.finish)
+
+
+class ZstdEncoder:
+    name = 'zstd'
+
+    def __init__(self, level):
+        self.compressor = zstandard.ZstdCompressor(level=level)
+
+    def compress(self, data):
+        return self.compressor.compress(data)
+
+    def stream(self):
+        compressor = self.compressor.compressobj()
+        return (lambda data: compressor.compress(data) + compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK),
+                compressor.flush)
+
+
+def available_encoders():
+    """Encoders for ``COMPRESSION_ENCODINGS`` whose libraries are installed, in preference order"""
+    factories = {
+        'gzip': lambda: GzipEncoder(settings.COMPRESSION_GZIP_LEVEL),
+        'br': (lambda: BrotliEncoder(settings.COMPRESSION_BROTLI_QUALITY)) if brotli else None,
+        'zstd': (lambda: ZstdEncoder(settings.COMPRESSION_ZSTD_LEVEL)) if zstandard else None,
+    }
+    return [factories[name]() for name in settings.COMPRESSION_ENCODINGS if factories.get(name)]
+
+
+def parse_accept_encoding(header):
+    """``{coding: q}`` from an Accept-Encoding header"""
+    accepted = {}
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key.strip() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def negotiate(header, encoders):
+    """The encoder the client prefers most, ties broken by server preference; ``None`` for identity"""
+    accepted = parse_accept_encoding(header)
+    best, best_q = None, 0.0
+    for encoder in encoders:
+        q = accepted.get(encoder.name, accepted.get('*', 0.0))
+        if q > best_q:
+            best, best_q = encoder, q
+    return best
+
+
+def compress_stream(encoder, content):
+    chunk, finish = encoder.stream()
+    for data in content:
+        out = chunk(data)
+        if out:
+            yield out
+    yield finish()
+
+
+async def compress_stream_async(encoder, content):
+    chunk, finish = encoder.stream()
+    async for data in content:
+        out = chunk(data)
+        if out:
+            yield out
+    yield finish()
+
+
+class CompressionMiddleware:
+    def __init__(self, get_response):
+        if not settings.COMPRESSION_ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.encoders = available_encoders()
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        return self.compress(request, response)
+
+    def compress(self, request, response):
+        if not self.is_compressible(response):
+            return response
+        # Caches must key on Accept-Encoding even when this client gets identity
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoder = negotiate(request.headers.get('Accept-Encoding', ''), self.encoders)
+        if encoder is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = compress_stream_async(encoder, response.streaming_content)
+            else:
+                response.streaming_content = compress_stream(encoder, response.streaming_content)
+            # The compressed length is not known in advance
+            del response.headers['Content-Length']
+        else:
+            if len(response.content) < settings.COMPRESSION_MIN_SIZE:
+                return response
+            compressed = encoder.compress(response.content)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        # The representation changed, so a strong validator no longer applies
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoder.name
+        return response
+
+    @staticmethod
+    def is_compressible(response):
+        if response.has_header('Content-Encoding') or response.status_code in (204, 304):
+            return False
+        if 'no-transform' in response.get('Cache-Control', ''):
+            return False
+        content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+        return content_type.startswith(COMPRESSIBLE_TYPES)
@@ -0,0 +1,99 @@
+"""
+Cached task summaries backing the "My Work" dashboard.
+
+Task counts per status are kept in the cache under one key per
+(scope, id, status), where scope is either a project or an assignee. Task
+writes adjust the affected counters in place (see ``api.signals``) and a
+missing counter is rebuilt from the database on the next read, so the cache
+never needs to be warmed or invalidated wholesale. That only holds with a
+cache shared by every worker (``REDIS_URL``): with a per-process cache the
+other workers never see the adjustment.
+
+Only ``save()``/``delete()`` reach those signals. Queryset ``update()``,
+``bulk_create``/``bulk_update`` and raw deletes leave the counters as they
+were, so code writing tasks that way calls ``forget_many`` for the projects
+and assignees it touched; otherwise the counts drift until
+``DASHBOARD_CACHE_TIMEOUT`` expires them.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+
+from .models import Task
+
+STATUSES = [choice for choice, _ in Task.STATUS_CHOICES]
+
+# Which Task column each summary scope is grouped by
+SCOPE_FIELDS = {
+    'project': 'project_id',
+    'user': 'assigned_to_id',
+}
+
+
+def counter_key(scope, pk, task_status):
+    return f'dashboard:{scope}:{pk}:{task_status}'
+
+
+def get_status_counts(scope, ids):
+    """
+    Return ``{id: {status: count, ..., 'total': n}}`` for every id in ``ids``.
+
+    Cached counters are used where present; all misses are rebuilt with a
+    single grouped query.
+    """
+    ids = list(ids)
+    keys = {counter_key(scope, pk, s): (pk, s) for pk in ids for s in STATUSES}
+    cached = cache.get_many(keys.keys())
+
+    counts = {pk: {s: 0 for s in STATUSES} for pk in ids}
+    missing = set()
+    for key, (pk, task_status) in keys.items():
+        if key in cached:
+            counts[pk][task_status] = cached[key]
+        else:
+            missing.add(pk)
+
+    if missing:
+        field = SCOPE_FIELDS[scope]
+        for pk in missing:
+            counts[pk] = {s: 0 for s in STATUSES}
+        rows = (
+            Task.objects.filter(**{f'{field}__in': missing})
+            .order_by()
+            .values_list(field, 'status')
+            .annotate(total=Count('id'))
+        )
+        for pk, task_status, total in rows:
+            counts[pk][task_status] = total
+        cache.set_many(
+            {counter_key(scope, pk, s): counts[pk][s] for pk in missing for s in STATUSES},
+            timeout=settings.DASHBOARD_CACHE_TIMEOUT,
+        )
+
+    for pk in ids:
+        counts[pk]['total'] = sum(counts[pk][s] for s in STATUSES)
+    return counts
+
+
+def adjust_count(scope, pk, task_status, delta):
+    """Increment a cached counter; counters that are not cached are left to be rebuilt"""
+    if pk is None or task_status not in STATUSES:
+        return
+    try:
+        cache.incr(counter_key(scope, pk, task_status), delta)
+    except ValueError:
+        pass
+
+
+def forget_counts(scope, pk):
+    """Drop the cached counters for one scope so they are rebuilt on next read"""
+    cache.delete_many([counter_key(scope, pk, s) for s in STATUSES])
+
+
+def forget_many(project_ids=(), user_ids=(), batch_size=1000):
+    """``forget_counts`` for many projects and assignees, after writes that bypassed the signals"""
+    keys = [counter_key(scope, pk, s)
+            for scope, ids in (('project', project_ids), ('user', user_ids))
+            for pk in ids if pk is not None for s in STATUSES]
+    for start in range(0, len(keys), batch_size):
+        cache.delete_many(keys[start:start + batch_size])
@@ -0,0 +1,115 @@
+"""
+Two-phase project deletion.
+
+``request_project_deletion`` runs inside the API request: it flags the project
+(hiding it through ``Project.objects``), removes its memberships in one
+statement (hiding its tasks, comments and logs from every member-scoped
+queryset) and records a ``ProjectDeletion``. Neither the membership delete nor
+the raw batch deletes write sync events, so every former member gets a project
+tombstone of their own right away. ``process_deletion`` is run by
+``manage.py process_deletions`` and removes the data in small batches,
+children before parents, so no single transaction holds locks for long. Every
+batch commits on its own and progress is saved after each one, so an
+interrupted run simply continues where it stopped.
+"""
+import time
+
+from django.db import models, transaction
+from django.utils import timezone
+
+from . import dashboard, followers
+from .models import ChangeEvent, Project, ProjectDeletion, Task
+
+
+def request_project_deletion(project, user):
+    with transaction.atomic():
+        Project.all_objects.filter(pk=project.pk).update(deletion_requested_at=timezone.now())
+        memberships = Project.members.through.objects.filter(project_id=project.pk)
+        member_ids = list(memberships.values_list('user_id', flat=True))
+        memberships.delete()
+        ChangeEvent.revoke(project.pk, member_ids)
+        deletion, _ = ProjectDeletion.objects.get_or_create(
+            project_id=project.pk,
+            defaults={'project_name': project.name, 'requested_by': user},
+        )
+    # Nobody follows a project's tasks once its members are gone
+    followers.forget_project(project.pk)
+    return deletion
+
+
+def process_deletion(deletion, chunk_size, sleep=0):
+    """Delete everything belonging to ``deletion``'s project in batches of ``chunk_size`` rows"""
+    if deletion.started_at is None:
+        deletion.started_at = timezone.now()
+        deletion.save(update_fields=['started_at'])
+
+    project_id = deletion.project_id
+    assignee_ids = set(
+        Task.objects.filter(project_id=project_id)
+        .order_by().values_list('assigned_to_id', flat=True).distinct()
+    )
+
+    def on_chunk(model, count):
+        label = model._meta.label
+        deletion.rows_deleted[label] = deletion.rows_deleted.get(label, 0) + count
+        ProjectDeletion.objects.filter(pk=deletion.pk).update(rows_deleted=deletion.rows_deleted)
+        if sleep:
+            time.sleep(sleep)
+
+    for model, lookup, null_field in _dependents(Project):
+        queryset = model._base_manager.filter(**{lookup: project_id})
+        if null_field:
+            _update_in_chunks(queryset, {null_field: None}, chunk_size, sleep)
+        else:
+            _delete_in_chunks(queryset, chunk_size, on_chunk)
+
+    # The project row itself goes through the regular delete so the usual
+    # signals (sync tombstone) fire; nothing is left for it to cascade to.
+    Project.all_objects.filter(pk=project_id).delete()
+
+    dashboard.forget_counts('project', project_id)
+    for user_id in assignee_ids:
+        dashboard.forget_counts('user', user_id)
+
+    deletion.completed_at = timezone.now()
+    deletion.save(update_fields=['completed_at', 'rows_deleted'])
+    return deletion
+
+
+def _dependents(model, lookup=None):
+    """
+    Yield ``(related model, lookup to the project id, field to null or None)``
+    for every relation that points at ``model``, deepest first, so each batch
+    can be deleted without triggering further cascades.
+    """
+    for relation in model._meta.related_objects:
+        related_lookup = relation.field.name if lookup is None else f'{relation.field.name}__{lookup}'
+        if relation.on_delete is models.CASCADE:
+            yield from _dependents(relation.related_model, related_lookup)
+            yield relation.related_model, related_lookup, None
+        elif relation.on_delete is models.SET_NULL:
+            yield relation.related_model, related_lookup, relation.field.name
+
+
+def _delete_in_chunks(queryset, chunk_size, on_chunk):
+    model = queryset.model
+    while True:
+        ids = list(queryset.order_by('pk').values_list('pk', flat=True)[:chunk_size])
+        if not ids:
+            return
+        with transaction.atomic():
+            # Dependents were removed in earlier passes, so bypass the
+            # collector (and its per-row signals) and issue one DELETE.
+            count = model._base_manager.filter(pk__in=ids)._raw_delete(queryset.db)
+        on_chunk(model, count)
+
+
+def _update_in_chunks(queryset, values, chunk_size, sleep):
+    model = queryset.model
+    while True:
+        ids = list(queryset.order_by('pk').values_list('pk', flat=True)[:chunk_size])
+        if not ids:
+            return
+        model._base_manager.filter(pk__in=ids).update(**values)
+        if sleep:
+            time.sleep(sleep)
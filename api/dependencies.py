@@ -0,0 +1,264 @@
+"""
+Task dependency graph.
+
+Edges are stored as ``TaskDependency`` rows ("task is blocked by
+blocked_by"). Cycles are refused on insert with the incremental topological
+ordering of Pearce and Kelly: every task taking part in a dependency holds a
+``dependency_rank`` such that each blocker ranks below the tasks it blocks.
+An edge that already agrees with the ranks cannot close a cycle and is
+inserted without looking at the graph. Otherwise only the edges between the
+two tasks' ranks are read; a cycle exists if the blocker is reachable from
+the blocked task within that band, and if not, the ranks of just the tasks
+in the band that need it are swapped around.
+
+Reads load a project's edges in one query into ``DependencyGraph``, a
+compressed adjacency structure (offsets into flat arrays of neighbour
+indexes), and answer topological order, blocked and ready lists and the
+critical path in linear time.
+"""
+import heapq
+from array import array
+from datetime import date
+
+from django.db import transaction
+from django.db.models import Max
+
+from .models import Project, Task, TaskDependency
+
+DONE = 'done'
+NO_DUE_DATE = date.max.toordinal()
+
+
+class DependencyCycle(Exception):
+    def __init__(self, path):
+        super().__init__('Dependency would create a cycle')
+        # Task ids around the cycle, each blocking the next
+        self.path = path
+
+
+def add_dependency(task, blocked_by, user=None):
+    """Record that ``task`` is blocked by ``blocked_by``; raises ``DependencyCycle``"""
+    if task.pk == blocked_by.pk:
+        raise DependencyCycle([task.pk, task.pk])
+    with transaction.atomic():
+        # Serialise graph edits per project: ranks are only consistent under one writer
+        Project.all_objects.select_for_update().filter(pk=task.project_id).first()
+        existing = TaskDependency.objects.filter(task=task, blocked_by=blocked_by).first()
+        if existing is not None:
+            return existing, False
+
+        ranks = dict(Task.objects.filter(pk__in=[task.pk, blocked_by.pk]).values_list('pk', 'dependency_rank'))
+        _assign_ranks(task.project_id, [blocked_by.pk, task.pk], ranks)
+        if ranks[blocked_by.pk] > ranks[task.pk]:
+            _reorder(task.project_id, blocked_by.pk, task.pk, ranks)
+
+        dependency = TaskDependency.objects.create(
+            project_id=task.project_id, task=task, blocked_by=blocked_by, created_by=user,
+        )
+    return dependency, True
+
+
+def _assign_ranks(project_id, task_ids, ranks):
+    """Give unranked tasks the next free ranks, in the given order"""
+    unranked = [pk for pk in task_ids if ranks[pk] is None]
+    if not unranked:
+        return
+    top = Task.objects.filter(project_id=project_id).aggregate(top=Max('dependency_rank'))['top']
+    next_rank = 0 if top is None else top + 1
+    for pk in unranked:
+        ranks[pk] = next_rank
+        Task.objects.filter(pk=pk).update(dependency_rank=next_rank)
+        next_rank += 1
+
+
+def _reorder(project_id, source, target, ranks):
+    """
+    Make room for the edge ``source -> target`` when ``source`` ranks above
+    ``target``, or raise ``DependencyCycle`` if ``target`` already leads to ``source``.
+    """
+    low, high = ranks[target], ranks[source]
+    band = (
+        TaskDependency.objects.filter(
+            project_id=project_id,
+            blocked_by__dependency_rank__range=(low, high),
+            task__dependency_rank__range=(low, high),
+        )
+        .values_list('blocked_by_id', 'task_id', 'blocked_by__dependency_rank', 'task__dependency_rank')
+    )
+    forward, backward = {}, {}
+    for blocker, blocked, blocker_rank, blocked_rank in band:
+        forward.setdefault(blocker, []).append(blocked)
+        backward.setdefault(blocked, []).append(blocker)
+        ranks[blocker], ranks[blocked] = blocker_rank, blocked_rank
+
+    # Tasks reachable from target; reaching source means a cycle
+    parents = {target: None}
+    stack = [target]
+    while stack:
+        node = stack.pop()
+        for succ in forward.get(node, ()):
+            if succ == source:
+                path = [node]
+                while parents[path[-1]] is not None:
+                    path.append(parents[path[-1]])
+                path.reverse()
+                raise DependencyCycle(path + [source, target])
+            if succ not in parents:
+                parents[succ] = node
+                stack.append(succ)
+    reachable_from_target = list(parents)
+
+    # Tasks leading to source
+    seen = {source}
+    stack = [source]
+    while stack:
+        node = stack.pop()
+        for pred in backward.get(node, ()):
+            if pred not in seen:
+                seen.add(pred)
+                stack.append(pred)
+    leading_to_source = list(seen)
+
+    # Reuse the same ranks: everything before source first, then everything after target
+    moved = sorted(leading_to_source, key=ranks.get) + sorted(reachable_from_target, key=ranks.get)
+    pool = sorted(ranks[pk] for pk in moved)
+    updates = [Task(pk=pk, dependency_rank=rank) for pk, rank in zip(moved, pool) if ranks[pk] != rank]
+    Task.objects.bulk_update(updates, ['dependency_rank'])
+    for pk, rank in zip(moved, pool):
+        ranks[pk] = rank
+
+
+class DependencyGraph:
+    """A project's tasks and dependencies as flat arrays indexed ``0..n-1``"""
+
+    def __init__(self, tasks, edges):
+        """``tasks``: ``(id, title, status, due_date, assigned_to_id)`` rows; ``edges``: ``(blocker, blocked)``"""
+        self.ids = array('q')
+        self.titles = []
+        self.statuses = []
+        self.done = bytearray()
+        self.due = array('l')
+        self.assignees = array('q')
+        for pk, title, status, due_date, assigned_to_id in tasks:
+            self.ids.append(pk)
+            self.titles.append(title)
+            self.statuses.append(status)
+            self.done.append(status == DONE)
+            self.due.append(due_date.toordinal() if due_date else NO_DUE_DATE)
+            self.assignees.append(assigned_to_id)
+        self.index = {pk: i for i, pk in enumerate(self.ids)}
+        n = len(self.ids)
+
+        pairs = [(self.index[a], self.index[b]) for a, b in edges if a in self.index and b in self.index]
+        self.successors = self._compress(n, pairs)
+        self.predecessors = self._compress(n, [(b, a) for a, b in pairs])
+
+    @staticmethod
+    def _compress(n, pairs):
+        """CSR layout: neighbours of ``i`` are ``targets[offsets[i]:offsets[i + 1]]``"""
+        counts = [0] * (n + 1)
+        for a, _ in pairs:
+            counts[a + 1] += 1
+        for i in range(n):
+            counts[i + 1] += counts[i]
+        offsets = array('l', counts)
+        fill = counts[:-1]
+        targets = array('l', [0]) * len(pairs)
+        for a, b in pairs:
+            targets[fill[a]] = b
+            fill[a] += 1
+        return offsets, targets
+
+    @classmethod
+    def load(cls, project_id):
+        tasks = (Task.objects.filter(project_id=project_id).order_by('id')
+                 .values_list('id', 'title', 'status', 'due_date', 'assigned_to_id'))
+        edges = TaskDependency.objects.filter(project_id=project_id).values_list('blocked_by_id', 'task_id')
+        return cls(tasks.iterator(chunk_size=5000), edges.iterator(chunk_size=5000))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _neighbours(self, adjacency, i):
+        offsets, targets = adjacency
+        return targets[offsets[i]:offsets[i + 1]]
+
+    def task(self, i, **extra):
+        due = self.due[i]
+        return {
+            'id': self.ids[i],
+            'title': self.titles[i],
+            'status': self.statuses[i],
+            'due_date': date.fromordinal(due).isoformat() if due != NO_DUE_DATE else None,
+            'assigned_to': self.assignees[i],
+            **extra,
+        }
+
+    def topological_order(self):
+        """Every task after its blockers; among available tasks, earliest due date first"""
+        offsets, _ = self.predecessors
+        remaining = array('l', (offsets[i + 1] - offsets[i] for i in range(len(self))))
+        heap = [(self.due[i], self.ids[i], i) for i in range(len(self)) if not remaining[i]]
+        heapq.heapify(heap)
+        order = []
+        while heap:
+            _, _, i = heapq.heappop(heap)
+            order.append(i)
+            for j in self._neighbours(self.successors, i):
+                remaining[j] -= 1
+                if not remaining[j]:
+                    heapq.heappush(heap, (self.due[j], self.ids[j], j))
+        return order
+
+    def open_blockers(self, i):
+        return [j for j in self._neighbours(self.predecessors, i) if not self.done[j]]
+
+    def blocked(self):
+        """Indexes of unfinished tasks waiting on at least one unfinished blocker"""
+        return [i for i in range(len(self)) if not self.done[i] and self.open_blockers(i)]
+
+    def blocked_task(self, i):
+        return self.task(i, blocked_by=[self.ids[j] for j in self.open_blockers(i)])
+
+    def ready(self):
+        """Indexes of unfinished tasks whose blockers (if any) are all done, earliest due date first"""
+        ready = [i for i in range(len(self)) if not self.done[i] and not self.open_blockers(i)]
+        ready.sort(key=lambda i: (self.due[i], self.ids[i]))
+        return ready
+
+    def critical_path(self):
+        """
+        The longest chain of unfinished tasks, each blocking the next. Every
+        task's effective deadline is its own due date tightened by the due
+        dates of the tasks it (transitively) blocks; ties between chains go to
+        the one whose deadline comes first.
+        """
+        order = [i for i in self.topological_order() if not self.done[i]]
+        deadline = array('l', self.due)
+        for i in reversed(order):
+            for j in self._neighbours(self.successors, i):
+                if not self.done[j] and deadline[j] < deadline[i]:
+                    deadline[i] = deadline[j]
+
+        length = array('l', [0]) * len(self)
+        previous = array('l', [-1]) * len(self)
+        for i in order:
+            blockers = self.open_blockers(i)
+            if blockers:
+                best = max(blockers, key=lambda j: (length[j], -deadline[j]))
+                length[i], previous[i] = length[best] + 1, best
+            else:
+                length[i] = 1
+        if not order:
+            return []
+        end = max(order, key=lambda i: (length[i], -deadline[i], -self.ids[i]))
+        path = []
+        while end >= 0:
+            path.append(end)
+            end = previous[end]
+        path.reverse()
+        return [
+            self.task(i, effective_due_date=date.fromordinal(deadline[i]).isoformat()
+                      if deadline[i] != NO_DUE_DATE else None)
+            for i in path
+        ]
@@ -0,0 +1,155 @@
+"""
+Who follows a task.
+
+A task's followers are its explicit ``TaskFollower`` rows plus whoever the
+project's ``auto_follow`` rules name: the assignee, everyone who commented
+and the project manager. Rules are stored once per project, not as rows per
+task; a user who unfollows a task they follow through a rule gets a single
+``muted`` row instead. Only current members of the project follow, whatever
+rows or rules name them. The resolved set of user ids is cached per task, so
+notification fan-out and the ``follower_count``/``is_following`` fields read
+it without touching the database. Follow and unfollow here and task and
+comment writes (``api.signals``) drop the affected entries. Rule and
+membership changes bump the project's generation number instead: every
+entry records the generation it was built under and counts as missing once
+it differs, so a single key write retires all of the project's sets. A
+missing entry is rebuilt for all misses of a lookup with at most four
+queries. Workers only see each other's drops through a shared
+cache (``REDIS_URL``); ``manage.py check --deploy`` warns without one.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Comment, Project, Task, TaskFollower
+
+ASSIGNEE = 'assignee'
+COMMENTER = 'commenter'
+MANAGER = 'manager'
+RULES = [choice for choice, _ in Project.AUTO_FOLLOW_CHOICES]
+
+
+def cache_key(task_id):
+    return f'followers:{task_id}'
+
+
+def generation_key(project_id):
+    return f'followers:generation:{project_id}'
+
+
+def _generations(project_ids):
+    """The current generation of each project, starting a new one where none is cached"""
+    keys = {generation_key(pk): pk for pk in project_ids}
+    cached = cache.get_many(keys.keys())
+    generations = {keys[key]: value for key, value in cached.items()}
+    # A lost generation may have been bumped, so entries built under it are stale
+    started = {pk: time.time_ns() for pk in keys.values() if pk not in generations}
+    if started:
+        cache.set_many({generation_key(pk): value for pk, value in started.items()}, timeout=None)
+        generations.update(started)
+    return generations
+
+
+def follower_ids(task_ids):
+    """``{task_id: frozenset of user ids}`` for every task in ``task_ids``"""
+    keys = {cache_key(pk): pk for pk in task_ids}
+    # Entries are (project id, generation, user ids)
+    cached = cache.get_many(keys.keys())
+    generations = _generations({project_id for project_id, _, _ in cached.values()}) if cached else {}
+    result = {
+        keys[key]: ids for key, (project_id, generation, ids) in cached.items()
+        if generations[project_id] == generation
+    }
+    missing = [pk for pk in keys.values() if pk not in result]
+    if missing:
+        projects = {}
+        generations = {}
+        built = _build(missing, projects, generations)
+        cache.set_many(
+            {cache_key(pk): (projects[pk], generations[projects[pk]], built[pk]) for pk in projects},
+            timeout=settings.FOLLOWER_CACHE_TIMEOUT,
+        )
+        result.update(built)
+    return result
+
+
+def followers_of(task):
+    return follower_ids([task.pk]).get(task.pk, frozenset())
+
+
+def _build(task_ids, projects=None, generations=None):
+    """
+    Resolve the followers of ``task_ids``. ``projects`` is filled with each
+    existing task's project and ``generations`` with those projects'
+    generations, read before their members are.
+    """
+    if projects is None:
+        projects = {}
+    followers = {pk: set() for pk in task_ids}
+    muted = {pk: set() for pk in task_ids}
+    for task_id, user_id, is_muted in (TaskFollower.objects.filter(task_id__in=task_ids)
+                                       .values_list('task_id', 'user_id', 'muted')):
+        (muted if is_muted else followers)[task_id].add(user_id)
+
+    by_commenters = []
+    tasks = list(Task.objects.filter(pk__in=task_ids).values_list(
+        'pk', 'project_id', 'assigned_to_id', 'project__manager_id', 'project__auto_follow'))
+    if generations is not None:
+        generations.update(_generations({project_id for _, project_id, _, _, _ in tasks}))
+    for pk, project_id, assigned_to_id, manager_id, rules in tasks:
+        projects[pk] = project_id
+        if ASSIGNEE in rules:
+            followers[pk].add(assigned_to_id)
+        if MANAGER in rules:
+            followers[pk].add(manager_id)
+        if COMMENTER in rules:
+            by_commenters.append(pk)
+    if by_commenters:
+        commenters = (Comment.objects.filter(task_id__in=by_commenters).order_by()
+                      .values_list('task_id', 'author_id').distinct())
+        for task_id, author_id in commenters:
+            followers[task_id].add(author_id)
+
+    # Former members keep their follow rows, comments and assignments
+    candidates = set().union(*followers.values())
+    members = set()
+    if candidates:
+        members = set(Project.members.through.objects.filter(
+            project_id__in=set(projects.values()), user_id__in=candidates,
+        ).values_list('project_id', 'user_id'))
+    return {
+        pk: frozenset(user_id for user_id in followers[pk] - muted[pk] if (projects.get(pk), user_id) in members)
+        for pk in task_ids
+    }
+
+
+def forget(task_ids):
+    cache.delete_many([cache_key(pk) for pk in task_ids])
+
+
+def forget_project(project_id):
+    """Retire every cached set of the project's tasks, after its rules, manager or members changed"""
+    cache.set(generation_key(project_id), time.time_ns(), timeout=None)
+
+
+def follow(user, task_ids):
+    """Make ``user`` an explicit follower of every task in ``task_ids``, lifting any mute"""
+    task_ids = list(task_ids)
+    with transaction.atomic():
+        TaskFollower.objects.filter(user=user, task_id__in=task_ids, muted=True).update(muted=False)
+        TaskFollower.objects.bulk_create(
+            [TaskFollower(user=user, task_id=pk) for pk in task_ids], ignore_conflicts=True,
+        )
+    forget(task_ids)
+
+
+def unfollow(user, task_ids):
+    """Stop ``user`` following the tasks, muting them where a rule would still make them follow"""
+    task_ids = list(task_ids)
+    with transaction.atomic():
+        TaskFollower.objects.filter(user=user, task_id__in=task_ids).delete()
+        by_rule = [pk for pk, ids in _build(task_ids).items() if user.id in ids]
+        TaskFollower.objects.bulk_create([TaskFollower(user=user, task_id=pk, muted=True) for pk in by_rule])
+    forget(task_ids)
@@ -0,0 +1,115 @@
+"""
+``Idempotency-Key`` support for write endpoints.
+
+A client that retries a POST/PUT/PATCH with the same key gets the first
+response replayed instead of the view running again. The unique
+``(user, key)`` row doubles as the lock: whoever inserts it processes the
+request, and anyone arriving while it is still in flight gets a 409.
+"""
+import hashlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+METHODS = ('POST', 'PUT', 'PATCH')
+
+
+class Replay(Exception):
+    """Raised once the key is found to be finished; carries the stored record"""
+
+    def __init__(self, record):
+        self.record = record
+
+
+class IdempotencyConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'A request with this Idempotency-Key is still being processed.'
+    default_code = 'idempotency_conflict'
+
+
+class IdempotencyKeyReused(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = 'This Idempotency-Key was already used for a different request.'
+    default_code = 'idempotency_key_reused'
+
+
+def request_fingerprint(request):
+    """Hash of the method, path and raw body; the body must have been read with ``request.body`` first"""
+    digest = hashlib.sha256()
+    digest.update(request.method.encode())
+    digest.update(request.get_full_path().encode())
+    digest.update(request.body)
+    return digest.hexdigest()
+
+
+def claim(user, key, fingerprint):
+    """
+    Take the lock for ``key`` and return ``(record, None)``, or return
+    ``(None, record)`` when a finished response should be replayed.
+    """
+    if len(key) > IdempotencyKey._meta.get_field('key').max_length:
+        raise ValidationError({HEADER: 'Key is too long.'})
+
+    now = timezone.now()
+    fields = {
+        'request_hash': fingerprint,
+        'status_code': None,
+        'response_body': None,
+        'created_at': now,
+        'expires_at': now + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL),
+    }
+    try:
+        with transaction.atomic():
+            return IdempotencyKey.objects.create(user=user, key=key, **fields), None
+    except IntegrityError:
+        pass
+
+    existing = IdempotencyKey.objects.filter(user=user, key=key).first()
+    if existing is None:
+        # Released by its owner between our insert and this read
+        raise IdempotencyConflict()
+
+    stale_lock = now - timedelta(seconds=settings.IDEMPOTENCY_LOCK_TIMEOUT)
+    expired = existing.expires_at <= now
+    abandoned = existing.status_code is None and existing.created_at <= stale_lock
+    if expired or abandoned:
+        # Take the row over only if nobody else did first
+        taken = IdempotencyKey.objects.filter(
+            pk=existing.pk, created_at=existing.created_at
+        ).update(**fields)
+        if not taken:
+            raise IdempotencyConflict()
+        existing.refresh_from_db()
+        return existing, None
+
+    if existing.status_code is None:
+        raise IdempotencyConflict()
+    if existing.request_hash != fingerprint:
+        raise IdempotencyKeyReused()
+    return None, existing
+
+
+def complete(record, response):
+    """Store ``response`` for replay; server errors release the key so the client can retry"""
+    if response.status_code >= 500:
+        release(record)
+        return
+    IdempotencyKey.objects.filter(pk=record.pk).update(
+        status_code=response.status_code,
+        response_body=response.data,
+    )
+
+
+def release(record):
+    IdempotencyKey.objects.filter(pk=record.pk, status_code__isnull=True).delete()
+
+
+def purge_expired():
+    return IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).delete()[0]
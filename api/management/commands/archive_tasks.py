@@ -0,0 +1,63 @@
+"""
+Move done tasks of inactive projects (and their comments and logs) to the
+archive tables, or bring a project's archived tasks back with ``--unarchive``.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.archive import archivable_tasks, archive_project, inactive_projects, unarchive
+from api.models import Project
+
+
+class Command(BaseCommand):
+    help = 'Archive done tasks of projects idle for --days in throttled batches (safe to rerun)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.ARCHIVE_INACTIVE_DAYS,
+                            help='Archive projects with no task, comment or log activity for this many days')
+        parser.add_argument('--batch-size', type=int, default=settings.ARCHIVE_BATCH_SIZE,
+                            help='Tasks moved per transaction')
+        parser.add_argument('--sleep', type=float, default=settings.ARCHIVE_SLEEP,
+                            help='Seconds to pause between batches')
+        parser.add_argument('--project', type=int,
+                            help='Only this project (archived regardless of --days)')
+        parser.add_argument('--unarchive', action='store_true',
+                            help='Move every archived task of --project back instead')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only report how many tasks would be archived')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1.')
+
+        if options['unarchive']:
+            if not options['project']:
+                raise CommandError('--unarchive needs --project.')
+            if not Project.all_objects.filter(pk=options['project']).exists():
+                raise CommandError(f'Project {options["project"]} does not exist.')
+            restored = unarchive(options['project'], batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'Restored {len(restored)} tasks.'))
+            return
+
+        if options['project']:
+            projects = Project.objects.filter(pk=options['project'])
+        else:
+            projects = inactive_projects(options['days'])
+
+        total = 0
+        for project_id, name in projects.values_list('id', 'name'):
+            if options['dry_run']:
+                count = archivable_tasks(project_id).count()
+                self.stdout.write(f'Project {project_id} ({name}): {count} tasks')
+                total += count
+                continue
+            moved = archive_project(project_id, options['batch_size'], options['sleep'])
+            if moved['tasks']:
+                self.stdout.write(
+                    f'Project {project_id} ({name}): {moved["tasks"]} tasks, '
+                    f'{moved["comments"]} comments, {moved["logs"]} log entries'
+                )
+            total += moved['tasks']
+
+        verb = 'Would archive' if options['dry_run'] else 'Archived'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {total} tasks.'))
@@ -0,0 +1,34 @@
+"""
+Write the OpenAPI schema to ``OPENAPI_SCHEMA_DIR`` so it can be served statically.
+"""
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.schema import SCHEMA_FORMATS
+
+
+class Command(BaseCommand):
+    help = 'Generate the OpenAPI schema as static YAML and JSON files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output-dir', default=settings.OPENAPI_SCHEMA_DIR,
+                            help='Directory to write schema.yaml and schema.json to')
+
+    def handle(self, *args, **options):
+        from drf_spectacular.renderers import OpenApiJsonRenderer, OpenApiYamlRenderer
+        from drf_spectacular.settings import spectacular_settings
+
+        generator = spectacular_settings.DEFAULT_GENERATOR_CLASS()
+        schema = generator.get_schema(request=None, public=True)
+
+        output_dir = options['output_dir']
+        os.makedirs(output_dir, exist_ok=True)
+        for fmt, renderer in (('yaml', OpenApiYamlRenderer()), ('json', OpenApiJsonRenderer())):
+            path = os.path.join(output_dir, SCHEMA_FORMATS[fmt][0])
+            # Write to a temporary file first so a running server never reads a partial schema
+            with open(path + '.tmp', 'wb') as fh:
+                fh.write(renderer.render(schema, renderer_context={}))
+            os.replace(path + '.tmp', path)
+            self.stdout.write(self.style.SUCCESS(f'Wrote {path}'))
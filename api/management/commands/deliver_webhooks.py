@@ -0,0 +1,43 @@
+"""
+Deliver queued webhook events (see ``api/webhooks.py``).
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.webhooks import Dispatcher
+
+
+class Command(BaseCommand):
+    help = 'POST queued task and comment events to webhook subscribers, retrying failures with backoff'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=1000,
+                            help='Deliveries claimed per pass')
+        parser.add_argument('--batch-size', type=int, default=settings.WEBHOOK_BATCH_SIZE,
+                            help='Events sent per HTTP request to one endpoint')
+        parser.add_argument('--workers', type=int, default=settings.WEBHOOK_WORKERS,
+                            help='Requests in flight across all endpoints')
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Keep running, sleeping this many seconds between passes')
+
+    def handle(self, *args, **options):
+        for option in ('limit', 'batch_size', 'workers'):
+            if options[option] < 1:
+                raise CommandError(f"--{option.replace('_', '-')} must be at least 1.")
+
+        dispatcher = Dispatcher(batch_size=options['batch_size'], workers=options['workers'])
+        try:
+            while True:
+                delivered, failed = dispatcher.run_once(options['limit'])
+                # Drain the backlog before pausing
+                if delivered or failed:
+                    self.stdout.write(self.style.SUCCESS(f'Delivered {delivered} events, {failed} failed.'))
+                    if delivered + failed >= options['limit']:
+                        continue
+                if not options['interval']:
+                    break
+                time.sleep(options['interval'])
+        finally:
+            dispatcher.close()
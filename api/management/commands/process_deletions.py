@@ -0,0 +1,34 @@
+"""
+Physically delete projects that were marked for deletion through the API.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.deletion import process_deletion
+from api.models import ProjectDeletion
+
+
+class Command(BaseCommand):
+    help = 'Delete pending projects and their data in throttled batches (safe to rerun after interruption)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=settings.DELETION_CHUNK_SIZE,
+                            help='Rows deleted per transaction')
+        parser.add_argument('--sleep', type=float, default=settings.DELETION_SLEEP,
+                            help='Seconds to pause between batches')
+        parser.add_argument('--project', type=int,
+                            help='Only process the deletion of this project id')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be at least 1.')
+
+        deletions = ProjectDeletion.objects.filter(completed_at__isnull=True).order_by('requested_at')
+        if options['project']:
+            deletions = deletions.filter(project_id=options['project'])
+
+        for deletion in deletions:
+            self.stdout.write(f'Deleting project {deletion.project_id} ({deletion.project_name})...')
+            process_deletion(deletion, options['chunk_size'], options['sleep'])
+            total = sum(deletion.rows_deleted.values())
+            self.stdout.write(self.style.SUCCESS(f'  removed {total} rows'))
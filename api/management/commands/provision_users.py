@@ -0,0 +1,50 @@
+"""
+Create user accounts in bulk from a CSV file.
+
+The file needs ``username`` and ``password`` columns and may have ``email``
+and ``projects`` (project ids separated by ``;``).
+"""
+import csv
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.provisioning import provision_users
+
+
+class Command(BaseCommand):
+    help = 'Create users (and their project memberships) from a CSV file, hashing passwords in parallel'
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_file', help='CSV with username, password and optional email, projects columns')
+        parser.add_argument('--workers', type=int, default=settings.PROVISIONING_WORKERS,
+                            help='Password hashing processes (default: one per CPU core)')
+        parser.add_argument('--batch-size', type=int, default=settings.PROVISIONING_BATCH_SIZE,
+                            help='Users inserted per statement')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1 or options['workers'] < 0:
+            raise CommandError('--batch-size must be at least 1 and --workers not negative.')
+        try:
+            with open(options['csv_file'], newline='') as fh:
+                rows = [self.parse(row) for row in csv.DictReader(fh)]
+        except FileNotFoundError:
+            raise CommandError(f"{options['csv_file']} does not exist.")
+
+        started = time.monotonic()
+        created, errors = provision_users(rows, workers=options['workers'], batch_size=options['batch_size'])
+        elapsed = time.monotonic() - started
+
+        for error in errors:
+            # Row numbers are 1-based data lines, after the header
+            self.stderr.write(f"row {error['row'] + 1}: {error['errors']}")
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {len(created)} users, {len(errors)} failed, in {elapsed:.1f}s.'
+        ))
+
+    def parse(self, row):
+        projects = (row.pop('projects', None) or '').strip()
+        if projects:
+            row['projects'] = [part.strip() for part in projects.split(';') if part.strip()]
+        return {key: value for key, value in row.items() if key is not None}
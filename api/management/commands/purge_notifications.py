@@ -0,0 +1,144 @@
+"""
+Enforce the notification retention policy.
+
+Read notifications older than the retention window are removed, and every
+user is trimmed down to their most recent ``--max-per-user`` notifications.
+Rows are deleted in small, index-ordered chunks with a pause between chunks
+so the command can run alongside normal traffic.
+"""
+import json
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from api.models import Notification, NotificationArchive
+
+ARCHIVE_FIELDS = ['id', 'user_id', 'task_id', 'comment_id', 'message', 'is_read', 'created_at']
+
+
+class Command(BaseCommand):
+    help = 'Purge old notifications in throttled chunks, optionally archiving them first'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.NOTIFICATION_RETENTION_DAYS,
+                            help='Delete read notifications older than this many days (0 disables)')
+        parser.add_argument('--max-per-user', type=int, default=settings.NOTIFICATION_MAX_PER_USER,
+                            help='Keep at most this many notifications per user (0 disables)')
+        parser.add_argument('--chunk-size', type=int, default=settings.NOTIFICATION_PURGE_CHUNK_SIZE,
+                            help='Rows deleted per transaction')
+        parser.add_argument('--sleep', type=float, default=settings.NOTIFICATION_PURGE_SLEEP,
+                            help='Seconds to pause between chunks')
+        parser.add_argument('--archive-table', action='store_true',
+                            help='Copy purged rows into the NotificationArchive table')
+        parser.add_argument('--archive-file',
+                            help='Append purged rows to this NDJSON file')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only report how many rows would be purged')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be at least 1.')
+
+        self.chunk_size = options['chunk_size']
+        self.sleep = options['sleep']
+        self.dry_run = options['dry_run']
+        self.archive_table = options['archive_table']
+        self.archive_file = open(options['archive_file'], 'a') if options['archive_file'] else None
+
+        try:
+            expired = self.purge_expired(options['days'])
+            trimmed = self.purge_over_limit(options['max_per_user'])
+        finally:
+            if self.archive_file:
+                self.archive_file.close()
+
+        verb = 'Would purge' if self.dry_run else 'Purged'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {expired} expired and {trimmed} over-limit notifications.'
+        ))
+
+    def purge_expired(self, days):
+        """Delete read notifications older than ``days`` days"""
+        if days <= 0:
+            return 0
+        cutoff = timezone.now() - timedelta(days=days)
+        return self.purge(Notification.objects.filter(is_read=True, created_at__lt=cutoff))
+
+    def purge_over_limit(self, max_per_user):
+        """Trim each user to their ``max_per_user`` most recent notifications"""
+        if max_per_user <= 0:
+            return 0
+
+        over_limit = (
+            Notification.objects.order_by()
+            .values('user_id')
+            .annotate(total=Count('id'))
+            .filter(total__gt=max_per_user)
+            .values_list('user_id', flat=True)
+        )
+
+        purged = 0
+        for user_id in over_limit.iterator():
+            # The newest notification that falls outside the limit; it and
+            # everything older than it are removed.
+            boundary = (
+                Notification.objects.filter(user_id=user_id)
+                .order_by('-created_at', '-id')
+                .values_list('created_at', 'id')[max_per_user]
+            )
+            created_at, pk = boundary
+            purged += self.purge(
+                Notification.objects.filter(user_id=user_id).filter(
+                    Q(created_at__lt=created_at) | Q(created_at=created_at, id__lte=pk)
+                )
+            )
+        return purged
+
+    def purge(self, queryset):
+        """Delete ``queryset`` in chunks ordered along the ``created_at`` indexes"""
+        if self.dry_run:
+            return queryset.count()
+
+        purged = 0
+        while True:
+            rows = list(queryset.order_by('created_at', 'id').values(*ARCHIVE_FIELDS)[:self.chunk_size])
+            if not rows:
+                break
+
+            with transaction.atomic():
+                self.archive(rows)
+                Notification.objects.filter(pk__in=[row['id'] for row in rows]).delete()
+            purged += len(rows)
+
+            if len(rows) < self.chunk_size:
+                break
+            # Resume after the last deleted row so the scan does not revisit
+            # index entries that were just removed.
+            queryset = queryset.filter(created_at__gte=rows[-1]['created_at'])
+            if self.sleep:
+                time.sleep(self.sleep)
+        return purged
+
+    def archive(self, rows):
+        if self.archive_table:
+            NotificationArchive.objects.bulk_create([
+                NotificationArchive(
+                    original_id=row['id'],
+                    user_id=row['user_id'],
+                    task_id=row['task_id'],
+                    comment_id=row['comment_id'],
+                    message=row['message'],
+                    is_read=row['is_read'],
+                    created_at=row['created_at'],
+                )
+                for row in rows
+            ])
+        if self.archive_file:
+            for row in rows:
+                self.archive_file.write(json.dumps(row, cls=DjangoJSONEncoder) + '\n')
@@ -0,0 +1,59 @@
+"""
+Respace board columns whose fractional position keys have grown long.
+
+Moves only ever rewrite the moved task, so keys lengthen when tasks are
+repeatedly dropped into the same gap. This gives each affected column short,
+evenly spaced keys again, preserving the order. Columns holding duplicate
+keys (two tasks created concurrently at the end) are fixed too.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.db.models.functions import Length
+
+from api import dashboard
+from api.models import ChangeEvent, Task
+from api.positions import rebalance
+
+
+class Command(BaseCommand):
+    help = 'Rewrite task positions in board columns with overly long or duplicate keys'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--project', type=int, help='Only check this project')
+        parser.add_argument('--max-length', type=int, default=settings.TASK_POSITION_REBALANCE_LENGTH,
+                            help='Rebalance columns holding a key longer than this')
+        parser.add_argument('--all', action='store_true',
+                            help='Rebalance every column regardless of key length')
+
+    def handle(self, *args, **options):
+        tasks = Task.objects.order_by()
+        if options['project']:
+            tasks = tasks.filter(project_id=options['project'])
+
+        if options['all']:
+            columns = set(tasks.values_list('project_id', 'status').distinct())
+        else:
+            long_keys = (tasks.annotate(key_length=Length('position'))
+                         .filter(key_length__gt=options['max_length'])
+                         .values_list('project_id', 'status').distinct())
+            duplicates = (tasks.values('project_id', 'status', 'position')
+                          .annotate(count=Count('id')).filter(count__gt=1)
+                          .values_list('project_id', 'status'))
+            columns = set(long_keys) | set(duplicates)
+
+        rewritten = 0
+        for project_id, status in sorted(columns):
+            column = Task.objects.filter(project_id=project_id, status=status)
+            rewritten += rebalance(column)
+            # bulk_update skips post_save, so feed the sync log directly
+            ChangeEvent.objects.bulk_create([
+                ChangeEvent(model='task', object_id=pk, project_id=project_id)
+                for pk in column.values_list('id', flat=True).order_by('id').iterator()
+            ], batch_size=1000)
+        # Nor do the dashboard counters see bulk writes
+        dashboard.forget_many({project_id for project_id, _ in columns})
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebalanced {len(columns)} columns ({rewritten} tasks)'
+        ))
@@ -0,0 +1,113 @@
+"""
+Send due-soon and overdue reminders for tasks.
+
+Candidate tasks are found with a range scan over ``(due_date, status)`` and
+walked in keyset-paginated batches, so memory use is bounded by the batch
+size no matter how many tasks exist. Every reminder sent is recorded in
+``TaskReminder``; tasks that already have a matching record are skipped,
+which makes reruns idempotent. Each batch locks its tasks and checks the
+records again before writing, so a run that overlaps another only notifies
+about the reminders it actually inserted.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from api import followers
+from api.models import Notification, Task, TaskReminder
+
+
+class Command(BaseCommand):
+    help = 'Notify assignees and followers about tasks that are due soon or overdue'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.SCHEDULER_BATCH_SIZE,
+                            help='Tasks processed per batch')
+        parser.add_argument('--due-soon-days', type=int, default=settings.SCHEDULER_DUE_SOON_DAYS,
+                            help='Remind about tasks due within this many days')
+        parser.add_argument('--overdue-lookback-days', type=int, default=settings.SCHEDULER_OVERDUE_LOOKBACK_DAYS,
+                            help='Only consider tasks that became overdue within this many days')
+        parser.add_argument('--interval', type=int, default=0,
+                            help='Keep running, sleeping this many seconds between passes')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1.')
+        self.batch_size = options['batch_size']
+
+        while True:
+            today = timezone.localdate()
+            due_soon = self.send_reminders(
+                'due_soon',
+                today,
+                today + timedelta(days=options['due_soon_days']),
+                "Task '{title}' is due on {due_date}.",
+            )
+            overdue = self.send_reminders(
+                'overdue',
+                today - timedelta(days=options['overdue_lookback_days']),
+                today - timedelta(days=1),
+                "Task '{title}' is overdue (was due {due_date}).",
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f'Sent {due_soon} due-soon and {overdue} overdue reminders.'
+            ))
+
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def send_reminders(self, kind, start, end, message):
+        """Remind about open tasks due in ``[start, end]`` that have not had a ``kind`` reminder yet"""
+        already_sent = TaskReminder.objects.filter(task=OuterRef('pk'), kind=kind, due_date=OuterRef('due_date'))
+        candidates = (
+            Task.objects.filter(due_date__gte=start, due_date__lte=end, project__deletion_requested_at__isnull=True)
+            .exclude(status='done')
+            .filter(~Exists(already_sent))
+            .order_by('due_date', 'id')
+        )
+
+        sent = 0
+        queryset = candidates
+        while True:
+            batch = list(queryset.values_list('id', 'title', 'due_date', 'assigned_to_id')[:self.batch_size])
+            if not batch:
+                break
+            sent += self.send_batch(kind, batch, message)
+
+            if len(batch) < self.batch_size:
+                break
+            last_id, _, last_due, _ = batch[-1]
+            queryset = candidates.filter(Q(due_date__gt=last_due) | Q(due_date=last_due, id__gt=last_id))
+        return sent
+
+    def send_batch(self, kind, batch, message):
+        recipients = {task_id: {assigned_to_id} for task_id, _, _, assigned_to_id in batch}
+        for task_id, user_ids in followers.follower_ids(recipients).items():
+            recipients[task_id].update(user_ids)
+
+        with transaction.atomic():
+            # A concurrent run waits on the lock, then finds this run's reminders
+            list(Task.objects.filter(pk__in=recipients).select_for_update().values_list('pk', flat=True))
+            sent = set(TaskReminder.objects.filter(task_id__in=recipients, kind=kind)
+                       .values_list('task_id', 'due_date'))
+            batch = [row for row in batch if (row[0], row[2]) not in sent]
+
+            notifications = [
+                Notification(user_id=user_id, task_id=task_id,
+                             message=message.format(title=title, due_date=due_date))
+                for task_id, title, due_date, _ in batch
+                for user_id in recipients[task_id]
+            ]
+            # Without row locks (SQLite) the unique constraint is the last guard
+            TaskReminder.objects.bulk_create([
+                TaskReminder(task_id=task_id, kind=kind, due_date=due_date)
+                for task_id, _, due_date, _ in batch
+            ], ignore_conflicts=True)
+            Notification.objects.bulk_create(notifications)
+        return len(notifications)
@@ -0,0 +1,281 @@
+"""
+Generate a large, deterministic dataset for performance testing.
+
+Everything is derived from ``--seed`` (including timestamps, which count from
+a fixed epoch), so two runs against fresh databases produce identical rows
+and benchmark results can be compared. Rows are written with ``bulk_create``
+in batches and model signals are not fired, so no sync events or webhooks
+are produced for the seeded data; cached dashboard counters of the seeded
+projects and users (left over from an earlier database) are dropped instead.
+
+Project sizes follow a Pareto distribution: most projects have a handful of
+members and a few have hundreds. Tasks are spread in proportion to project
+size, and comments, followers and activity concentrate on a minority of
+"hot" tasks. Each task's status logs form one chain in time order that ends
+at the task's seeded status, so history-based reports see possible histories.
+"""
+import bisect
+import random
+import time
+from array import array
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api import dashboard
+from api.models import Comment, Notification, Project, Task, TaskFollower, TaskLog
+from api.positions import key_between
+
+USERNAME_PREFIX = 'perf_user_'
+PASSWORD = 'perf-pass-123'
+EPOCH = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+# Seeded activity covers this many days after EPOCH
+SPAN_DAYS = 365
+STATUSES = ['todo', 'in_progress', 'done']
+STATUS_WEIGHTS = [4, 2, 4]
+WORDS = ('api sync deploy review design fix migrate cache index query report billing onboarding '
+         'search export import release audit layout mobile invoice backlog sprint metrics').split()
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """Let bulk_create store the generated timestamps instead of now()"""
+    fields = [(field, field.auto_now, field.auto_now_add)
+              for model in models for field in model._meta.concrete_fields
+              if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)]
+    for field, _, _ in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in fields:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = 'Fill the database with a large deterministic dataset for performance testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=42, help='Random seed; same seed, same data')
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--projects', type=int, default=500)
+        parser.add_argument('--tasks', type=int, default=200000)
+        parser.add_argument('--comments', type=int, default=400000)
+        parser.add_argument('--followers', type=int, default=200000)
+        parser.add_argument('--logs', type=int, default=600000)
+        parser.add_argument('--notifications', type=int, default=500000)
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per INSERT')
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['projects'] < 1 or options['batch_size'] < 1:
+            raise CommandError('--users, --projects and --batch-size must be at least 1.')
+        if options['tasks'] < 1 and any(options[k] for k in ('comments', 'followers', 'logs', 'notifications')):
+            raise CommandError('Comments, followers, logs and notifications need at least one task.')
+        if User.objects.filter(username__startswith=USERNAME_PREFIX).exists():
+            raise CommandError('Seed data already exists; run it against a fresh database '
+                               '(e.g. after `manage.py flush`).')
+
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        started = time.monotonic()
+
+        with explicit_timestamps(User, Project, Task, Comment, TaskLog, TaskFollower, Notification):
+            self.seed_users(options['users'])
+            self.seed_projects(options['projects'])
+            self.seed_tasks(options['tasks'])
+            self.seed_comments(options['comments'])
+            self.seed_followers(options['followers'])
+            self.seed_logs(options['logs'])
+            self.seed_notifications(options['notifications'])
+
+        self.stdout.write(self.style.SUCCESS(f'Done in {time.monotonic() - started:.1f}s'))
+
+    # Helpers
+
+    def offset(self, after=0.0):
+        """Random number of seconds after EPOCH, no earlier than ``after``"""
+        return after + self.rng.random() * (SPAN_DAYS * 86400 - after)
+
+    def timestamp(self, after=0.0):
+        return EPOCH + timedelta(seconds=self.offset(after))
+
+    def sentence(self, words):
+        return ' '.join(self.rng.choices(WORDS, k=words)).capitalize()
+
+    def hot_task(self):
+        """Index of a task, skewed so a minority of tasks gets most of the activity"""
+        return int(len(self.task_ids) * self.rng.random() ** 3)
+
+    def insert(self, model, rows, total, **kwargs):
+        """bulk_create ``rows`` (a generator) in batches; returns the created objects' ids"""
+        ids = array('q')
+        batch = []
+        created = 0
+        for row in rows:
+            batch.append(row)
+            if len(batch) == self.batch_size:
+                created += self._flush(model, batch, ids, **kwargs)
+                batch = []
+        if batch:
+            created += self._flush(model, batch, ids, **kwargs)
+        self.stdout.write(f'  {model._meta.verbose_name_plural}: {created}/{total}')
+        return ids
+
+    def _flush(self, model, batch, ids, **kwargs):
+        with transaction.atomic():
+            objects = model.objects.bulk_create(batch, **kwargs)
+        if not kwargs.get('ignore_conflicts'):
+            ids.extend(obj.pk for obj in objects)
+        return len(batch)
+
+    # Generators
+
+    def seed_users(self, count):
+        password = make_password(PASSWORD)
+        rows = (
+            User(username=f'{USERNAME_PREFIX}{i:07d}', email=f'{USERNAME_PREFIX}{i:07d}@example.com',
+                 password=password, date_joined=self.timestamp())
+            for i in range(count)
+        )
+        self.user_ids = self.insert(User, rows, count)
+
+    def seed_projects(self, count):
+        users = len(self.user_ids)
+        self.members = []
+        projects = []
+        for i in range(count):
+            size = min(users, max(1, int(3 * self.rng.paretovariate(1.2))))
+            members = self.rng.sample(range(users), size)
+            self.members.append([self.user_ids[m] for m in members])
+            created = self.timestamp()
+            projects.append(Project(
+                name=f'{self.sentence(2)} {i}', description=self.sentence(12),
+                manager_id=self.members[-1][0], created_at=created, updated_at=created,
+            ))
+        self.project_ids = self.insert(Project, iter(projects), count)
+
+        through = Project.members.through
+        rows = (
+            through(project_id=project_id, user_id=user_id)
+            for project_id, members in zip(self.project_ids, self.members)
+            for user_id in members
+        )
+        self.insert(through, rows, sum(len(m) for m in self.members))
+
+    def seed_tasks(self, count):
+        # Bigger teams have proportionally more tasks
+        weights = array('q')
+        total = 0
+        for members in self.members:
+            total += len(members)
+            weights.append(total)
+        # Kept as compact arrays: these are indexed by every later generator
+        self.task_projects = array('l')
+        self.task_created = array('d')
+        self.task_status = array('b')
+        # Last board position handed out per (project, status) column
+        column_ends = {}
+
+        def rows():
+            for i in range(count):
+                project = bisect.bisect(weights, self.rng.random() * total)
+                offset = self.offset()
+                created = EPOCH + timedelta(seconds=offset)
+                self.task_projects.append(project)
+                self.task_created.append(offset)
+                due = created + timedelta(days=self.rng.randint(-10, 60))
+                title, description = f'{self.sentence(4)} #{i}', self.sentence(20)
+                status = self.rng.choices(STATUSES, weights=STATUS_WEIGHTS)[0]
+                self.task_status.append(STATUSES.index(status))
+                position = column_ends[project, status] = key_between(column_ends.get((project, status)), None)
+                yield Task(
+                    title=title, description=description, status=status, position=position,
+                    due_date=due.date() if self.rng.random() < 0.7 else None,
+                    project_id=self.project_ids[project],
+                    assigned_to_id=self.rng.choice(self.members[project]),
+                    created_at=created, updated_at=created,
+                )
+        self.task_ids = self.insert(Task, rows(), count)
+        dashboard.forget_many(self.project_ids, self.user_ids)
+
+    def seed_comments(self, count):
+        self.comment_refs = array('l')
+
+        def rows():
+            for _ in range(count):
+                task = self.hot_task()
+                created = self.timestamp(self.task_created[task])
+                author = self.rng.choice(self.members[self.task_projects[task]])
+                self.comment_refs.append(task)
+                yield Comment(task_id=self.task_ids[task], project_id=self.project_ids[self.task_projects[task]],
+                              author_id=author, content=self.sentence(15), created_at=created, updated_at=created)
+        self.comment_ids = self.insert(Comment, rows(), count)
+
+    def seed_followers(self, count):
+        rows = (
+            TaskFollower(task_id=self.task_ids[task], user_id=self.rng.choice(self.members[self.task_projects[task]]),
+                         created_at=self.timestamp(self.task_created[task]))
+            for task in (self.hot_task() for _ in range(count))
+        )
+        # Duplicate (task, user) pairs are dropped, so the final count may be lower
+        self.insert(TaskFollower, rows, count, ignore_conflicts=True)
+
+    def seed_logs(self, count):
+        per_task = array('l', [0]) * len(self.task_ids)
+        for _ in range(count):
+            per_task[self.hot_task()] += 1
+
+        def rows():
+            # Each task's logs are written together in time order, and its
+            # status changes form one chain that ends at the seeded status
+            for task, logs in enumerate(per_task):
+                if not logs:
+                    continue
+                members = self.members[self.task_projects[task]]
+                fields = [self.rng.choice(['status', 'status', 'description', 'assigned_to']) for _ in range(logs)]
+                offsets = sorted(self.offset(self.task_created[task]) for _ in range(logs))
+                transitions = self.status_chain(STATUSES[self.task_status[task]], fields.count('status'))
+                for field, offset in zip(fields, offsets):
+                    if field == 'status':
+                        old, new = next(transitions)
+                    elif field == 'assigned_to':
+                        old, new = self.rng.choice(members), self.rng.choice(members)
+                    else:
+                        old, new = self.sentence(8), self.sentence(8)
+                    yield TaskLog(task_id=self.task_ids[task], project_id=self.project_ids[self.task_projects[task]],
+                                  field_changed=field, old_value=str(old),
+                                  new_value=str(new), changed_by_id=self.rng.choice(members),
+                                  timestamp=EPOCH + timedelta(seconds=offset))
+        self.insert(TaskLog, rows(), count)
+
+    def status_chain(self, final, length):
+        """``length`` (old, new) status changes in time order, each starting where the last ended"""
+        chain = []
+        current = final
+        for _ in range(length):
+            previous = self.rng.choice([status for status in STATUSES if status != current])
+            chain.append((previous, current))
+            current = previous
+        return reversed(chain)
+
+    def seed_notifications(self, count):
+        def rows():
+            for _ in range(count):
+                comment = None
+                if self.comment_ids and self.rng.random() < 0.5:
+                    index = self.rng.randrange(len(self.comment_ids))
+                    task, comment = self.comment_refs[index], self.comment_ids[index]
+                else:
+                    task = self.hot_task()
+                yield Notification(
+                    user_id=self.rng.choice(self.members[self.task_projects[task]]),
+                    task_id=self.task_ids[task], comment_id=comment,
+                    message=f'Task update: {self.sentence(6)}',
+                    is_read=self.rng.random() < 0.7,
+                    created_at=self.timestamp(self.task_created[task]),
+                )
+        self.insert(Notification, rows(), count)
@@ -0,0 +1,90 @@
+"""
+Summarise the slow-query log written by ``api/slow_queries.py``.
+"""
+import json
+from collections import Counter
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    index = max(0, -(-len(sorted_values) * pct // 100) - 1)
+    return sorted_values[int(index)]
+
+
+class Command(BaseCommand):
+    help = 'Aggregate logged slow queries by fingerprint with counts and latency percentiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', default=settings.SLOW_QUERY_LOG_FILE,
+                            help='Slow-query log to read')
+        parser.add_argument('--hours', type=float,
+                            help='Only include queries logged within this many hours')
+        parser.add_argument('--top', type=int, default=20,
+                            help='Number of fingerprints to show')
+        parser.add_argument('--sort', choices=['total', 'count', 'p95', 'max'], default='total',
+                            help='Ranking of fingerprints')
+        parser.add_argument('--plans', action='store_true',
+                            help='Print the captured EXPLAIN output for each fingerprint')
+
+    def handle(self, *args, **options):
+        if not options['file']:
+            raise CommandError('No slow-query log configured; pass --file.')
+        since = timezone.now() - timedelta(hours=options['hours']) if options['hours'] else None
+
+        groups = {}
+        try:
+            with open(options['file']) as fh:
+                for line in fh:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # partially written line
+                    if since and datetime.fromisoformat(entry['time']) < since:
+                        continue
+                    group = groups.setdefault(entry['fingerprint'], {
+                        'sql': entry['sql'], 'durations': [], 'views': Counter(), 'plan': None,
+                    })
+                    group['durations'].append(entry['duration_ms'])
+                    group['views'][entry.get('view') or '-'] += 1
+                    if entry.get('plan'):
+                        group['plan'] = (entry['plan'], entry.get('analyzed', False))
+        except FileNotFoundError:
+            raise CommandError(f"{options['file']} does not exist; no slow queries logged yet?")
+
+        summaries = []
+        for key, group in groups.items():
+            durations = sorted(group['durations'])
+            summaries.append({
+                'fingerprint': key,
+                'count': len(durations),
+                'total': sum(durations),
+                'p50': percentile(durations, 50),
+                'p95': percentile(durations, 95),
+                'p99': percentile(durations, 99),
+                'max': durations[-1],
+                **group,
+            })
+        summaries.sort(key=lambda s: s[options['sort']], reverse=True)
+
+        self.stdout.write(f"{len(summaries)} fingerprints, "
+                          f"{sum(s['count'] for s in summaries)} slow queries")
+        for summary in summaries[:options['top']]:
+            self.stdout.write('')
+            self.stdout.write(self.style.WARNING(
+                f"{summary['fingerprint']}  count={summary['count']}  total={summary['total']:.0f}ms  "
+                f"p50={summary['p50']:.1f}ms  p95={summary['p95']:.1f}ms  p99={summary['p99']:.1f}ms  "
+                f"max={summary['max']:.1f}ms"
+            ))
+            views = ', '.join(f'{view} ({count})' for view, count in summary['views'].most_common(3))
+            self.stdout.write(f'  views: {views}')
+            self.stdout.write(f"  sql:   {summary['sql'][:500]}")
+            if options['plans'] and summary['plan']:
+                plan, analyzed = summary['plan']
+                self.stdout.write('  plan' + (' (analyzed)' if analyzed else '') + ':')
+                for line in plan.splitlines():
+                    self.stdout.write(f'    {line}')
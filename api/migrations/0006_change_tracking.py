@@ -0,0 +1,62 @@
+# Generated by Django 5.2.1 on 2026-10-19 02:36
+
+from django.db import migrations, models
+
+
+def backfill_change_events(apps, schema_editor):
+    """Seed the change feed with existing rows so a full sync (since=0) sees them"""
+    ChangeEvent = apps.get_model('api', 'ChangeEvent')
+    sources = [
+        ('project', apps.get_model('api', 'Project').objects.values_list('id', 'id')),
+        ('task', apps.get_model('api', 'Task').objects.values_list('id', 'project_id')),
+        ('comment', apps.get_model('api', 'Comment').objects.values_list('id', 'task__project_id')),
+    ]
+    for model, rows in sources:
+        batch = []
+        for object_id, project_id in rows.order_by('id').iterator(chunk_size=2000):
+            batch.append(ChangeEvent(model=model, object_id=object_id, project_id=project_id))
+            if len(batch) >= 2000:
+                ChangeEvent.objects.bulk_create(batch)
+                batch = []
+        ChangeEvent.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_task_reminders'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.CreateModel(
+            name='ChangeEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(choices=[('project', 'Project'), ('task', 'Task'), ('comment', 'Comment')], max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('project_id', models.BigIntegerField()),
+                ('deleted', models.BooleanField(default=False)),
+                ('timestamp', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['project_id', 'id'], name='change_project_seq_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_change_events, migrations.RunPython.noop),
+    ]
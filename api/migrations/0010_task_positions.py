@@ -0,0 +1,38 @@
+# Generated by Django 5.2.1 on 2026-10-19 03:22
+
+from django.conf import settings
+from django.db import migrations, models
+
+from api.positions import spread
+
+
+def backfill_positions(apps, schema_editor):
+    """Order each existing column by creation time"""
+    Task = apps.get_model('api', 'Task')
+    columns = Task.objects.values_list('project_id', 'status').distinct().order_by()
+    for project_id, status in columns:
+        ids = list(Task.objects.filter(project_id=project_id, status=status)
+                   .order_by('created_at', 'id').values_list('id', flat=True))
+        tasks = [Task(id=pk, position=key) for pk, key in zip(ids, spread(len(ids)))]
+        Task.objects.bulk_update(tasks, ['position'], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_webhooks'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='position',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['project', 'status', 'position'], name='task_column_position_idx'),
+        ),
+        migrations.RunPython(backfill_positions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.1 on 2026-10-19 04:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_projects(apps, schema_editor):
+    """Copy each comment's and log entry's project from its task"""
+    Task = apps.get_model('api', 'Task')
+    for model_name in ('Comment', 'TaskLog'):
+        model = apps.get_model('api', model_name)
+        model.objects.update(
+            project_id=models.Subquery(Task.objects.filter(pk=models.OuterRef('task_id')).values('project_id')[:1])
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_task_dependencies'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='project',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='comments', to='api.project'),
+        ),
+        migrations.AddField(
+            model_name='tasklog',
+            name='project',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='task_logs', to='api.project'),
+        ),
+        migrations.RunPython(backfill_projects, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='comment',
+            name='project',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='comments', to='api.project'),
+        ),
+        migrations.AlterField(
+            model_name='tasklog',
+            name='project',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='task_logs', to='api.project'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['task', 'created_at', 'id'], name='comment_task_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['project', 'created_at', 'id'], name='comment_project_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tasklog',
+            index=models.Index(fields=['task', 'timestamp', 'id'], name='tasklog_task_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tasklog',
+            index=models.Index(fields=['project', 'timestamp', 'id'], name='tasklog_project_feed_idx'),
+        ),
+    ]
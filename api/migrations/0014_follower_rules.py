@@ -0,0 +1,23 @@
+# Generated by Django 5.2.1 on 2026-10-19 03:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_task_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='auto_follow',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='taskfollower',
+            name='muted',
+            field=models.BooleanField(default=False),
+        ),
+    ]
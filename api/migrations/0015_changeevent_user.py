@@ -0,0 +1,22 @@
+# Generated by Django 5.2.1 on 2026-10-19 04:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_follower_rules'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='changeevent',
+            name='user_id',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='changeevent',
+            index=models.Index(condition=models.Q(('user_id__isnull', False)), fields=['user_id', 'id'], name='change_user_seq_idx'),
+        ),
+    ]
@@ -1,12 +1,35 @@
+import secrets
+
 from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
 from django.contrib.auth.models import User
 
+from .positions import MAX_LENGTH as POSITION_MAX_LENGTH, key_between
+
+class ProjectManager(models.Manager):
+    """Default manager; projects awaiting background deletion are hidden"""
+    def get_queryset(self):
+        return super().get_queryset().filter(deletion_requested_at__isnull=True)
+
 class Project(models.Model):
+    AUTO_FOLLOW_CHOICES = [
+        ('assignee', 'Assignee'),
+        ('commenter', 'Commenters'),
+        ('manager', 'Project manager'),
+    ]
+
     name = models.CharField(max_length=255)
     description = models.TextField(blank=True)
     manager = models.ForeignKey(User, related_name='managed_projects', on_delete=models.CASCADE)
     members = models.ManyToManyField(User, related_name='projects')
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    deletion_requested_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    # Who follows every task of the project without a TaskFollower row; see api/followers.py
+    auto_follow = models.JSONField(default=list, blank=True)
+
+    objects = ProjectManager()
+    all_objects = models.Manager()
 
     class Meta:
         ordering = ['-created_at']
@@ -28,28 +51,68 @@ class Task(models.Model):
 
     project = models.ForeignKey(Project, related_name='tasks', on_delete=models.CASCADE)
     assigned_to = models.ForeignKey(User, related_name='tasks', on_delete=models.CASCADE)
+    # Fractional-index key ordering the task within its (project, status) column; see api/positions.py
+    position = models.CharField(max_length=POSITION_MAX_LENGTH, blank=True, default='')
+    # Place in the project's dependency order, assigned once the task gains a dependency; see api/dependencies.py
+    dependency_rank = models.PositiveIntegerField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Range scans for due-soon / overdue detection
+            models.Index(fields=['due_date', 'status'], name='task_due_status_idx'),
+            # Board columns: ?ordering=position, neighbour lookups and the end-of-column key
+            models.Index(fields=['project', 'status', 'position'], name='task_column_position_idx'),
+            models.Index(fields=['project', 'dependency_rank'], name='task_dependency_rank_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} ({self.get_status_display()})"
 
+    def save(self, *args, **kwargs):
+        if not self.position:
+            self.position = self.end_of_column(self.project_id, self.status, exclude=self.pk)
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def end_of_column(cls, project_id, status, exclude=None):
+        """A position after every task currently in the column"""
+        column = cls.objects.filter(project_id=project_id, status=status)
+        if exclude is not None:
+            column = column.exclude(pk=exclude)
+        last = column.order_by('-position').values_list('position', flat=True).first()
+        return key_between(last or None, None)
+
 class Comment(models.Model):
     task = models.ForeignKey('Task', on_delete=models.CASCADE, related_name='comments')
+    # Copy of task.project, so the project activity feed reads one index
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='comments')
     author = models.ForeignKey(User, on_delete=models.CASCADE)
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Activity feeds, newest first: see api/activity.py
+            models.Index(fields=['task', 'created_at', 'id'], name='comment_task_feed_idx'),
+            models.Index(fields=['project', 'created_at', 'id'], name='comment_project_feed_idx'),
+        ]
 
     def __str__(self):
         return f"Comment by {self.author.username} on {self.task.title}"
 
+    def save(self, *args, **kwargs):
+        self.project_id = self.task.project_id
+        super().save(*args, **kwargs)
+
 class TaskLog(models.Model):
     task = models.ForeignKey('Task', on_delete=models.CASCADE, related_name='logs')
+    # Copy of task.project, so the project activity feed reads one index
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='task_logs')
     field_changed = models.CharField(max_length=100)
     old_value = models.TextField(blank=True, null=True)
     new_value = models.TextField(blank=True, null=True)
@@ -58,10 +121,18 @@ class TaskLog(models.Model):
 
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['task', 'timestamp', 'id'], name='tasklog_task_feed_idx'),
+            models.Index(fields=['project', 'timestamp', 'id'], name='tasklog_project_feed_idx'),
+        ]
 
     def __str__(self):
         return f"{self.field_changed} changed on {self.task.title}"
 
+    def save(self, *args, **kwargs):
+        self.project_id = self.task.project_id
+        super().save(*args, **kwargs)
+
 class Notification(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notifications')
     message = models.TextField()
@@ -72,14 +143,286 @@ class Notification(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Inbox listing and per-user retention trimming
+            models.Index(fields=['user', '-created_at'], name='notif_user_created_idx'),
+            # Purge of read notifications past the retention window
+            models.Index(fields=['is_read', 'created_at'], name='notif_read_created_idx'),
+        ]
 
     def __str__(self):
         return f"Notification for {self.user.username}: {self.message[:50]}"
 
+class NotificationArchive(models.Model):
+    """Compact copy of a purged notification, kept without foreign key constraints"""
+    original_id = models.BigIntegerField()
+    user_id = models.IntegerField(db_index=True)
+    task_id = models.BigIntegerField(null=True, blank=True)
+    comment_id = models.BigIntegerField(null=True, blank=True)
+    message = models.TextField()
+    is_read = models.BooleanField(default=False)
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Archived notification {self.original_id} for user {self.user_id}"
+
+class TaskArchive(models.Model):
+    """
+    A done task moved out of ``Task`` by ``manage.py archive_tasks``, keeping
+    its original id so it comes back unchanged; see api/archive.py. Users are
+    plain ids, as in ``NotificationArchive``, so archives never block or
+    follow user deletes.
+    """
+    original_id = models.BigIntegerField(unique=True)
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='archived_tasks')
+    title = models.CharField(max_length=255)
+    description = models.TextField(blank=True)
+    status = models.CharField(max_length=20, choices=Task.STATUS_CHOICES)
+    due_date = models.DateField(null=True, blank=True)
+    assigned_to_id = models.IntegerField()
+    follower_ids = models.JSONField(default=list, blank=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-updated_at']
+        indexes = [
+            models.Index(fields=['project', '-updated_at'], name='taskarchive_project_idx'),
+        ]
+
+    def __str__(self):
+        return f"Archived task {self.original_id}: {self.title}"
+
+class CommentArchive(models.Model):
+    original_id = models.BigIntegerField(unique=True)
+    task = models.ForeignKey(TaskArchive, on_delete=models.CASCADE, related_name='comments')
+    author_id = models.IntegerField()
+    content = models.TextField()
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Archived comment {self.original_id} on task {self.task_id}"
+
+class TaskLogArchive(models.Model):
+    original_id = models.BigIntegerField(unique=True)
+    task = models.ForeignKey(TaskArchive, on_delete=models.CASCADE, related_name='logs')
+    field_changed = models.CharField(max_length=100)
+    old_value = models.TextField(blank=True, null=True)
+    new_value = models.TextField(blank=True, null=True)
+    changed_by_id = models.IntegerField()
+    timestamp = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-timestamp']
+
+    def __str__(self):
+        return f"Archived {self.field_changed} change on task {self.task_id}"
+
 class TaskFollower(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     task = models.ForeignKey('Task', on_delete=models.CASCADE)
+    # Opts the user out of a task they would follow through the project's auto_follow rules
+    muted = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('user', 'task')
+
+class TaskDependency(models.Model):
+    """``task`` cannot be finished before ``blocked_by``; both belong to ``project``"""
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='dependencies')
+    task = models.ForeignKey('Task', on_delete=models.CASCADE, related_name='dependencies')
+    blocked_by = models.ForeignKey('Task', on_delete=models.CASCADE, related_name='dependents')
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('task', 'blocked_by')
+        constraints = [
+            models.CheckConstraint(condition=~models.Q(task=models.F('blocked_by')), name='task_not_blocked_by_self'),
+        ]
+
+    def __str__(self):
+        return f"Task {self.task_id} blocked by {self.blocked_by_id}"
+
+class TaskReminder(models.Model):
+    """Records a due-date reminder that was already sent, so the scheduler never repeats it"""
+    KIND_CHOICES = [
+        ('due_soon', 'Due Soon'),
+        ('overdue', 'Overdue'),
+    ]
+
+    task = models.ForeignKey('Task', on_delete=models.CASCADE, related_name='reminders')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    due_date = models.DateField()
+    sent_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('task', 'kind', 'due_date')
+
+    def __str__(self):
+        return f"{self.get_kind_display()} reminder for task {self.task_id}"
+
+class ChangeEvent(models.Model):
+    """
+    Append-only change feed for projects, tasks and comments.
+
+    The auto-incrementing primary key is the sync sequence number. Deletes are
+    recorded as tombstones (``deleted=True``). ``project_id`` is a plain column
+    rather than a foreign key so tombstones outlive the rows they describe.
+    Events with a ``user_id`` are meant for that user alone: a removed member
+    no longer sees the project's feed, so they get a project tombstone of
+    their own (``revoke``), and a new member gets a project event of their
+    own (``grant``) that tells the sync view to check whether the project's
+    earlier changes predate their cursor.
+    """
+    MODEL_CHOICES = [
+        ('project', 'Project'),
+        ('task', 'Task'),
+        ('comment', 'Comment'),
+    ]
+
+    model = models.CharField(max_length=20, choices=MODEL_CHOICES)
+    object_id = models.BigIntegerField()
+    project_id = models.BigIntegerField()
+    deleted = models.BooleanField(default=False)
+    user_id = models.BigIntegerField(null=True, blank=True)
+    timestamp = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['project_id', 'id'], name='change_project_seq_idx'),
+            models.Index(fields=['user_id', 'id'], name='change_user_seq_idx',
+                         condition=models.Q(user_id__isnull=False)),
+        ]
+
+    @classmethod
+    def revocations(cls, project_id, user_ids):
+        """Unsaved project tombstones telling each of ``user_ids`` (no longer members) the project is gone"""
+        return [
+            cls(model='project', object_id=project_id, project_id=project_id, deleted=True, user_id=user_id)
+            for user_id in sorted(user_ids)
+        ]
+
+    @classmethod
+    def revoke(cls, project_id, user_ids):
+        cls.objects.bulk_create(cls.revocations(project_id, user_ids))
+
+    @classmethod
+    def grants(cls, project_id, user_ids):
+        """Unsaved project events telling each of ``user_ids`` (new members) they joined the project"""
+        return [
+            cls(model='project', object_id=project_id, project_id=project_id, user_id=user_id)
+            for user_id in sorted(user_ids)
+        ]
+
+    @classmethod
+    def grant(cls, project_id, user_ids):
+        cls.objects.bulk_create(cls.grants(project_id, user_ids))
+
+    def __str__(self):
+        action = 'deleted' if self.deleted else 'changed'
+        return f"{self.model} {self.object_id} {action} (seq {self.id})"
+
+class ProjectDeletion(models.Model):
+    """Progress of a background project deletion; outlives the project it describes"""
+    project_id = models.BigIntegerField(unique=True)
+    project_name = models.CharField(max_length=255)
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='project_deletions')
+    requested_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    rows_deleted = models.JSONField(default=dict)
+
+    class Meta:
+        ordering = ['-requested_at']
+
+    @property
+    def status(self):
+        if self.completed_at:
+            return 'completed'
+        return 'running' if self.started_at else 'pending'
+
+    def __str__(self):
+        return f"Deletion of project {self.project_name} ({self.status})"
+
+class IdempotencyKey(models.Model):
+    """Stored outcome of a write request sent with an ``Idempotency-Key`` header"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='idempotency_keys')
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    # Null while the original request is still being processed
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField()
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        unique_together = ('user', 'key')
+
+    def __str__(self):
+        return f"{self.user} - {self.key}"
+
+def generate_webhook_secret():
+    return secrets.token_hex(32)
+
+class WebhookSubscription(models.Model):
+    """An endpoint that receives a project's task and comment events"""
+    EVENT_CHOICES = [
+        ('task.updated', 'Task updated'),
+        ('comment.created', 'Comment created'),
+    ]
+
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='webhooks')
+    url = models.URLField(max_length=500)
+    # Empty means every event
+    events = models.JSONField(default=list, blank=True)
+    secret = models.CharField(max_length=64, default=generate_webhook_secret)
+    is_active = models.BooleanField(default=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='webhooks')
     created_at = models.DateTimeField(auto_now_add=True)
 
+    def wants(self, event):
+        return self.is_active and (not self.events or event in self.events)
+
+    def __str__(self):
+        return f"{self.project.name} -> {self.url}"
+
+class WebhookDelivery(models.Model):
+    """One event queued for one subscription; rows stay until delivered or given up on"""
+    subscription = models.ForeignKey(WebhookSubscription, on_delete=models.CASCADE, related_name='deliveries')
+    event = models.CharField(max_length=50)
+    payload = models.JSONField(encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField()
+    claim_token = models.CharField(max_length=32, blank=True)
+    last_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+    failed_at = models.DateTimeField(null=True, blank=True)
+
     class Meta:
-        unique_together = ('user', 'task')
\ No newline at end of file
+        indexes = [
+            models.Index(fields=['next_attempt_at'], name='webhook_pending_idx',
+                         condition=models.Q(delivered_at__isnull=True, failed_at__isnull=True)),
+        ]
+
+    @property
+    def status(self):
+        if self.delivered_at:
+            return 'delivered'
+        return 'failed' if self.failed_at else 'pending'
+
+    def __str__(self):
+        return f"{self.event} to {self.subscription.url} ({self.status})"
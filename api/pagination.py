@@ -0,0 +1,10 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class MemberCursorPagination(CursorPagination):
+    """Cursor pagination for project members, walking the membership index by user id"""
+    ordering = 'id'
+    page_size = settings.PROJECT_MEMBERS_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = settings.PROJECT_MEMBERS_MAX_PAGE_SIZE
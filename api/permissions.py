@@ -1,22 +1,28 @@
 from rest_framework import permissions
 
+
+def is_project_member(user, project_id):
+    """Membership check against the through table, without loading the member list"""
+    from .models import Project
+    return Project.members.through.objects.filter(project_id=project_id, user_id=user.pk).exists()
+
 class IsProjectManagerOrReadOnly(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         # SAFE_METHODS = GET, HEAD, OPTIONS
         if request.method in permissions.SAFE_METHODS:
-            return request.user in obj.members.all()
-        return obj.manager == request.user
+            return is_project_member(request.user, obj.pk)
+        return obj.manager_id == request.user.pk
 
 class IsTaskOwnerOrProjectManager(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         if request.method in permissions.SAFE_METHODS:
-            return request.user in obj.project.members.all()
+            return is_project_member(request.user, obj.project_id)
         return obj.assigned_to == request.user or obj.project.manager == request.user
 
 class IsCommentAuthorOrReadOnly(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         if request.method in permissions.SAFE_METHODS:
-            return request.user in obj.task.project.members.all()
+            return is_project_member(request.user, obj.task.project_id)
         return obj.author == request.user
 
 class IsProjectMember(permissions.BasePermission):
@@ -28,6 +34,6 @@ class IsProjectMember(permissions.BasePermission):
         from .models import Task
         try:
             task = Task.objects.get(pk=task_id)
-            return request.user in task.project.members.all()
+            return is_project_member(request.user, task.project_id)
         except Task.DoesNotExist:
-            return False
\ No newline at end of file
+            return False
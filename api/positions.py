@@ -0,0 +1,105 @@
+"""
+Fractional-index keys for ordering tasks within a board column.
+
+A position is a fixed-width base-36 integer part (``INTEGER_WIDTH`` digits)
+followed by an optional base-36 fraction, so plain string comparison orders
+them. ``key_between`` always finds a key strictly between two others, so
+moving a task only rewrites that task's row. Appending or prepending steps the
+integer part and keeps keys short; inserting into a gap between adjacent
+integers extends the fraction. Fractions never end in ``"0"``: ``"a"`` and
+``"a0"`` would be the same number with no room between them. Digits and
+lower-case letters sort the same way under byte-wise and common linguistic
+collations.
+
+Repeated inserts into the same gap make keys longer; ``manage.py
+rebalance_positions`` (run from cron) rewrites columns whose keys grew past
+``TASK_POSITION_REBALANCE_LENGTH`` with short, evenly spaced ones, long before
+they reach the ``MAX_LENGTH`` column; a move that would still outgrow it is
+refused until the column is respaced, so a move never writes more than the
+moved task's row.
+"""
+from django.db import transaction
+
+DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+BASE = len(DIGITS)
+INTEGER_WIDTH = 6
+INTEGER_MAX = BASE ** INTEGER_WIDTH - 1
+# Task.position's max_length
+MAX_LENGTH = 64
+
+
+def _encode(number):
+    digits = []
+    for _ in range(INTEGER_WIDTH):
+        number, digit = divmod(number, BASE)
+        digits.append(DIGITS[digit])
+    return ''.join(reversed(digits))
+
+
+def _split(key):
+    if len(key) < INTEGER_WIDTH or key.endswith('0') and len(key) > INTEGER_WIDTH:
+        raise ValueError(f'Invalid position key {key!r}')
+    return int(key[:INTEGER_WIDTH], BASE), key[INTEGER_WIDTH:]
+
+
+def _midpoint(a, b):
+    """Fraction between ``a`` and ``b`` (``b`` may be ``None`` for "up to 1"); ``a < b``"""
+    if b is not None:
+        # Shared prefix, treating a as padded with zeros
+        n = 0
+        while n < len(b) and (a[n] if n < len(a) else '0') == b[n]:
+            n += 1
+        if n:
+            return b[:n] + _midpoint(a[n:], b[n:])
+
+    digit_a = DIGITS.index(a[0]) if a else 0
+    digit_b = DIGITS.index(b[0]) if b is not None else BASE
+    if digit_b - digit_a > 1:
+        return DIGITS[(digit_a + digit_b + 1) // 2]
+    # Adjacent first digits
+    if b is not None and len(b) > 1:
+        return b[0]
+    return DIGITS[digit_a] + _midpoint(a[1:], None)
+
+
+def key_between(before=None, after=None):
+    """A key that sorts after ``before`` and before ``after`` (either may be ``None``)"""
+    if before is not None and after is not None and before >= after:
+        raise ValueError(f'{before!r} does not sort before {after!r}')
+    if before is None and after is None:
+        return _encode((INTEGER_MAX + 1) // 2)
+    if after is None:
+        integer, fraction = _split(before)
+        if integer < INTEGER_MAX:
+            return _encode(integer + 1)
+        return _encode(integer) + _midpoint(fraction, None)
+    if before is None:
+        integer, fraction = _split(after)
+        if integer > 0:
+            return _encode(integer - 1)
+        if not fraction:
+            raise ValueError('No key sorts before the smallest possible position')
+        return _encode(0) + _midpoint('', fraction)
+
+    low, low_fraction = _split(before)
+    high, high_fraction = _split(after)
+    if high - low > 1:
+        return _encode((low + high) // 2)
+    if high == low + 1:
+        return _encode(low) + _midpoint(low_fraction, None)
+    return _encode(low) + _midpoint(low_fraction, high_fraction)
+
+
+def spread(count):
+    """``count`` increasing integer keys spaced evenly over the whole key range"""
+    return [_encode((INTEGER_MAX + 1) * (i + 1) // (count + 1)) for i in range(count)]
+
+
+def rebalance(queryset, batch_size=1000):
+    """Give the tasks in ``queryset`` (one column) fresh evenly spaced positions, keeping their order"""
+    ids = list(queryset.order_by('position', 'id').values_list('id', flat=True))
+    model = queryset.model
+    objects = [model(id=pk, position=key) for pk, key in zip(ids, spread(len(ids)))]
+    with transaction.atomic():
+        model.objects.bulk_update(objects, ['position'], batch_size=batch_size)
+    return len(ids)
@@ -0,0 +1,151 @@
+"""
+On-demand profiling of single requests for staff users.
+
+A staff user obtains a short-lived signed token from
+``POST /api/profiling/token/`` and sends it in the ``X-Profile`` header (or as
+``?profile=<token>``). That request then runs under ``cProfile`` with every SQL
+statement timed; the report is written to ``PROFILING_DIR`` and its URL is
+returned in the ``X-Profile-Url`` response header.
+
+With ``PROFILING_ENABLED`` off (the default) the middleware removes itself
+from the stack at startup, so it costs nothing.
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import signing
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.urls import reverse
+from django.utils import timezone
+
+HEADER = 'X-Profile'
+QUERY_PARAM = 'profile'
+SIGNING_SALT = 'api.profiling'
+TOP_FUNCTIONS = 40
+
+
+def make_token(user):
+    return signing.dumps({'user': user.pk}, salt=SIGNING_SALT)
+
+
+def token_user(token):
+    """The staff user a valid, unexpired token was issued to, or ``None``"""
+    try:
+        payload = signing.loads(token, salt=SIGNING_SALT, max_age=settings.PROFILING_TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return None
+    return User.objects.filter(pk=payload.get('user'), is_staff=True, is_active=True).first()
+
+
+def take_slot():
+    """Count this profile against the per-minute budget; False once it is spent"""
+    key = f'profiling:{int(time.time() // 60)}'
+    cache.add(key, 0, timeout=120)
+    try:
+        return cache.incr(key) <= settings.PROFILING_RATE_LIMIT
+    except ValueError:
+        return False
+
+
+def report_paths(profile_id):
+    base = os.path.join(settings.PROFILING_DIR, profile_id)
+    return base + '.json', base + '.prof'
+
+
+class QueryRecorder:
+    """``execute_wrapper`` that times every statement, without needing DEBUG"""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'sql': sql,
+                'params': repr(params),
+                'many': many,
+                'duration_ms': round((time.perf_counter() - started) * 1000, 3),
+            })
+
+
+class RequestProfilingMiddleware:
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = request.headers.get(HEADER) or request.GET.get(QUERY_PARAM)
+        if not token:
+            return self.get_response(request)
+
+        user = token_user(token)
+        if user is None:
+            response = self.get_response(request)
+            response['X-Profile-Error'] = 'invalid or expired token'
+            return response
+        if not take_slot():
+            response = self.get_response(request)
+            response['X-Profile-Error'] = 'rate limit reached'
+            return response
+        return self.profile(request, user)
+
+    def profile(self, request, user):
+        profiler = cProfile.Profile()
+        recorder = QueryRecorder()
+        started_at = timezone.now()
+        started = time.perf_counter()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already active in this thread
+            response = self.get_response(request)
+            response['X-Profile-Error'] = 'profiler busy'
+            return response
+        try:
+            with connection.execute_wrapper(recorder):
+                response = self.get_response(request)
+        finally:
+            profiler.disable()
+        duration = time.perf_counter() - started
+
+        profile_id = uuid.uuid4().hex
+        self.save(profile_id, profiler, {
+            'id': profile_id,
+            'method': request.method,
+            'path': request.path,
+            'query_string': request.META.get('QUERY_STRING', ''),
+            'user': user.username,
+            'status': response.status_code,
+            'started_at': started_at.isoformat(),
+            'duration_ms': round(duration * 1000, 3),
+            'query_count': len(recorder.queries),
+            'query_time_ms': round(sum(q['duration_ms'] for q in recorder.queries), 3),
+            'queries': recorder.queries,
+        })
+        response['X-Profile-Id'] = profile_id
+        response['X-Profile-Url'] = request.build_absolute_uri(reverse('profile-report', args=[profile_id]))
+        return response
+
+    def save(self, profile_id, profiler, report):
+        os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+        json_path, prof_path = report_paths(profile_id)
+        profiler.dump_stats(prof_path)
+
+        summary = io.StringIO()
+        pstats.Stats(profiler, stream=summary).sort_stats('cumulative').print_stats(TOP_FUNCTIONS)
+        report['top_functions'] = summary.getvalue()
+        with open(json_path, 'w') as fh:
+            json.dump(report, fh, indent=2)
@@ -0,0 +1,119 @@
+"""
+Bulk user provisioning.
+
+``provision_users`` validates every row on its own, hashes the passwords of
+the valid ones across a process pool (PBKDF2 is CPU-bound, so threads would
+serialise on the GIL), then inserts users and project memberships with bulk
+writes. Rows that fail validation or collide with an existing username are
+reported individually; the rest are still created.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+
+from .models import ChangeEvent, Project
+from .serializers import ProvisionUserSerializer
+
+
+def _init_worker(settings_module):
+    # Spawned workers start without Django configured; forked ones already are
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+    django.setup()
+
+
+def hash_passwords(passwords, workers=None):
+    """``make_password`` for every password, spread over ``workers`` processes"""
+    workers = workers or settings.PROVISIONING_WORKERS or os.cpu_count() or 1
+    # Starting processes costs more than hashing a handful of passwords
+    if workers == 1 or len(passwords) < 2 * workers:
+        return [make_password(password) for password in passwords]
+    chunksize = max(1, len(passwords) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', 'project_manager.settings'),)) as pool:
+        return list(pool.map(make_password, passwords, chunksize=chunksize))
+
+
+def provision_users(rows, workers=None, batch_size=None):
+    """
+    Create users from dicts with ``username``, ``email``, ``password`` and
+    optional ``projects`` (ids). Returns ``(created, errors)``: the created
+    rows as ``{row, id, username}`` and the rejected ones as ``{row, errors}``.
+    """
+    batch_size = batch_size or settings.PROVISIONING_BATCH_SIZE
+    errors = []
+    valid = []
+    seen = set()
+    for index, row in enumerate(rows):
+        serializer = ProvisionUserSerializer(data=row)
+        if not serializer.is_valid():
+            errors.append({'row': index, 'errors': serializer.errors})
+        elif serializer.validated_data['username'] in seen:
+            errors.append({'row': index, 'errors': {'username': ['Duplicate username in this batch.']}})
+        else:
+            seen.add(serializer.validated_data['username'])
+            valid.append((index, serializer.validated_data))
+
+    # Checked in bulk here rather than per row by the serializer
+    taken = set(User.objects.filter(username__in=seen).values_list('username', flat=True))
+    project_ids = {pk for _, data in valid for pk in data.get('projects', [])}
+    known_projects = set(Project.objects.filter(pk__in=project_ids).values_list('pk', flat=True))
+    accepted = []
+    for index, data in valid:
+        missing = sorted(set(data.get('projects', [])) - known_projects)
+        if data['username'] in taken:
+            errors.append({'row': index, 'errors': {'username': ['A user with that username already exists.']}})
+        elif missing:
+            errors.append({'row': index, 'errors': {'projects': [f'Unknown project ids: {missing}']}})
+        else:
+            accepted.append((index, data))
+
+    hashes = hash_passwords([data['password'] for _, data in accepted], workers)
+    created = []
+    for start in range(0, len(accepted), batch_size):
+        chunk = accepted[start:start + batch_size]
+        users = [User(username=data['username'], email=data.get('email', ''), password=password)
+                 for (_, data), password in zip(chunk, hashes[start:start + batch_size])]
+        created += _insert(chunk, users, errors)
+
+    errors.sort(key=lambda error: error['row'])
+    return created, errors
+
+
+def _insert(chunk, users, errors):
+    try:
+        with transaction.atomic():
+            User.objects.bulk_create(users)
+            _add_memberships(chunk, users)
+        pairs = list(zip(chunk, users))
+    except IntegrityError:
+        # Someone registered one of these usernames meanwhile; isolate it row by row
+        pairs = []
+        for (index, data), user in zip(chunk, users):
+            user.pk = None
+            try:
+                with transaction.atomic():
+                    user.save()
+                    _add_memberships([(index, data)], [user])
+            except IntegrityError:
+                errors.append({'row': index, 'errors': {'username': ['A user with that username already exists.']}})
+            else:
+                pairs.append(((index, data), user))
+    return [{'row': index, 'id': user.pk, 'username': user.username} for (index, _), user in pairs]
+
+
+def _add_memberships(chunk, users):
+    through = Project.members.through
+    memberships = [through(project_id=project_id, user_id=user.pk)
+                   for (_, data), user in zip(chunk, users)
+                   for project_id in data.get('projects', [])]
+    through.objects.bulk_create(memberships, ignore_conflicts=True)
+    # Bulk writes to the through table bypass m2m_changed, so feed the sync log directly
+    ChangeEvent.objects.bulk_create([
+        ChangeEvent(model='project', object_id=project_id, project_id=project_id)
+        for project_id in sorted({m.project_id for m in memberships})
+    ])
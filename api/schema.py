@@ -0,0 +1,86 @@
+"""
+Serving the OpenAPI schema without per-request introspection.
+
+``manage.py build_schema`` writes the schema to ``OPENAPI_SCHEMA_DIR`` at build
+time and ``StaticSchemaView`` serves those files with an ETag. drf-spectacular
+is only imported when the artifact is missing or the docs UI is requested.
+"""
+import hashlib
+import os
+from importlib import import_module
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
+from django.views import View
+
+SCHEMA_FORMATS = {
+    'yaml': ('schema.yaml', 'application/vnd.oai.openapi; charset=utf-8'),
+    'json': ('schema.json', 'application/vnd.oai.openapi+json; charset=utf-8'),
+}
+
+# (path, mtime) -> (content, etag); reloaded when the artifact is rebuilt
+_artifact_cache = {}
+
+
+def schema_path(fmt):
+    return os.path.join(settings.OPENAPI_SCHEMA_DIR, SCHEMA_FORMATS[fmt][0])
+
+
+def load_artifact(fmt):
+    """Return ``(content, etag)`` for a built schema file, or ``None`` if it has not been built"""
+    path = schema_path(fmt)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    key = (path, mtime)
+    if key not in _artifact_cache:
+        with open(path, 'rb') as fh:
+            content = fh.read()
+        _artifact_cache.clear()
+        _artifact_cache[key] = (content, '"%s"' % hashlib.sha256(content).hexdigest()[:32])
+    return _artifact_cache[key]
+
+
+def lazy_view(dotted_path, **initkwargs):
+    """Defer importing a class-based view until its URL is first requested"""
+    view = None
+
+    def wrapper(request, *args, **kwargs):
+        nonlocal view
+        if view is None:
+            module_name, class_name = dotted_path.rsplit('.', 1)
+            view = getattr(import_module(module_name), class_name).as_view(**initkwargs)
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+_dynamic_schema_view = lazy_view('drf_spectacular.views.SpectacularAPIView')
+
+
+class StaticSchemaView(View):
+    """
+    Serve the prebuilt schema (YAML by default, JSON with ``?format=json`` or a
+    JSON ``Accept`` header), falling back to live generation if it was never built.
+    """
+
+    def get(self, request, *args, **kwargs):
+        fmt = request.GET.get('format')
+        if fmt not in SCHEMA_FORMATS:
+            fmt = 'json' if 'json' in request.headers.get('Accept', '') else 'yaml'
+
+        artifact = load_artifact(fmt)
+        if artifact is None:
+            return _dynamic_schema_view(request, *args, **kwargs)
+
+        content, etag = artifact
+        # Exact match against each listed tag; If-None-Match compares weakly
+        known = {tag.removeprefix('W/') for tag in parse_etags(request.headers.get('If-None-Match', ''))}
+        if etag in known or '*' in known:
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(content, content_type=SCHEMA_FORMATS[fmt][1])
+        response['ETag'] = etag
+        response['Cache-Control'] = 'no-cache'
+        return response
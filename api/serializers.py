@@ -1,6 +1,106 @@
-from rest_framework import serializers
+from rest_framework import serializers, permissions
+from django.conf import settings
 from django.contrib.auth.models import User
-from .models import Project, Task, Comment, TaskLog, Notification, TaskFollower
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.core.exceptions import FieldDoesNotExist
+from . import followers, webhooks
+from .models import (
+    Project, Task, Comment, TaskLog, Notification, TaskFollower, ProjectDeletion, WebhookSubscription,
+    WebhookDelivery, TaskArchive, CommentArchive, TaskLogArchive,
+)
+
+
+def _split_param(value):
+    return {item.strip() for item in value.split(',') if item.strip()}
+
+
+class DynamicFieldsMixin:
+    """
+    Sparse fieldsets (``?fields=``) and opt-in expansion (``?expand=``).
+
+    ``Meta.expandable_fields`` maps relations to the serializer used when the
+    relation is expanded; unexpanded relations are rendered as primary keys.
+    Without an ``expand`` parameter the relations in ``Meta.default_expand``
+    are expanded, so the default payload is unchanged. ``Meta.related_hints``
+    lists the ``select``/``prefetch``/``only`` paths read by derived fields so
+    ``setup_queryset`` can load exactly what the selected fields need.
+    Query parameters are only honoured on safe (read) methods.
+    """
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        expand = kwargs.pop('expand', None)
+        super().__init__(*args, **kwargs)
+
+        selected, expanded = self.requested_fields(self.context.get('request'), fields, expand)
+        model = self.Meta.model
+        for name, serializer_class in getattr(self.Meta, 'expandable_fields', {}).items():
+            if name not in self.fields:
+                continue
+            many = model._meta.get_field(name).many_to_many
+            if name in expanded:
+                self.fields[name] = serializer_class(read_only=True, many=many)
+            else:
+                self.fields[name] = serializers.PrimaryKeyRelatedField(read_only=True, many=many)
+
+        if selected is not None:
+            for name in set(self.fields) - selected:
+                self.fields.pop(name)
+
+    @classmethod
+    def requested_fields(cls, request, fields=None, expand=None):
+        """Return ``(selected field names or None for all, expanded relation names)``"""
+        params = {}
+        if request is not None and request.method in permissions.SAFE_METHODS:
+            params = request.query_params
+        if fields is None and params.get('fields') is not None:
+            fields = _split_param(params['fields'])
+        if expand is None:
+            expand = _split_param(params['expand']) if params.get('expand') is not None \
+                else getattr(cls.Meta, 'default_expand', [])
+        return (set(fields) if fields is not None else None), set(expand)
+
+    @classmethod
+    def setup_queryset(cls, queryset, request=None):
+        """Add the select_related/prefetch_related/only() matching the requested fields"""
+        selected, expanded = cls.requested_fields(request)
+        model = cls.Meta.model
+        expandable = getattr(cls.Meta, 'expandable_fields', {})
+        hints = getattr(cls.Meta, 'related_hints', {})
+
+        # The primary key and foreign key columns are always loaded; they are
+        # cheap and permission checks rely on them.
+        only = {field.name for field in model._meta.concrete_fields if field.primary_key or field.is_relation}
+        select, prefetch = set(), set()
+
+        for name in cls.Meta.fields:
+            if selected is not None and name not in selected:
+                continue
+            if name in expandable:
+                if model._meta.get_field(name).many_to_many:
+                    prefetch.add(name)
+                elif name in expanded:
+                    select.add(name)
+                    only.update(f'{name}__{nested}' for nested in expandable[name].Meta.fields)
+                continue
+            hint = hints.get(name, {})
+            select.update(hint.get('select', ()))
+            prefetch.update(hint.get('prefetch', ()))
+            only.update(hint.get('only', ()))
+            try:
+                field = model._meta.get_field(name)
+            except FieldDoesNotExist:
+                continue
+            if field.concrete and not field.many_to_many:
+                only.add(name)
+
+        if select:
+            # select_related() without arguments would follow every foreign key
+            queryset = queryset.select_related(*select)
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        return queryset.only(*only)
+
 
 class UserSerializer(serializers.ModelSerializer):
     """User information serializer"""
@@ -9,7 +109,7 @@ class UserSerializer(serializers.ModelSerializer):
         fields = ['id', 'username', 'email', 'first_name', 'last_name']
         read_only_fields = ['id']
 
-class ProjectListSerializer(serializers.ModelSerializer):
+class ProjectListSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Lightweight project serializer for list views"""
     manager = UserSerializer(read_only=True)
     task_count = serializers.SerializerMethodField()
@@ -18,6 +118,8 @@ class ProjectListSerializer(serializers.ModelSerializer):
     class Meta:
         model = Project
         fields = ['id', 'name', 'description', 'manager', 'task_count', 'member_count', 'created_at']
+        expandable_fields = {'manager': UserSerializer}
+        default_expand = ['manager']
 
     def get_task_count(self, obj):
         return obj.tasks.count()
@@ -25,20 +127,34 @@ class ProjectListSerializer(serializers.ModelSerializer):
     def get_member_count(self, obj):
         return obj.members.count()
 
-class ProjectSerializer(serializers.ModelSerializer):
-    """Detailed project serializer"""
+class ProjectSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    """Detailed project serializer; the full member list lives at /projects/{id}/members/"""
     manager = UserSerializer(read_only=True)
-    members = UserSerializer(read_only=True, many=True)
+    auto_follow = serializers.ListField(
+        child=serializers.ChoiceField(choices=Project.AUTO_FOLLOW_CHOICES),
+        required=False,
+    )
+    member_count = serializers.SerializerMethodField()
+    members_preview = serializers.SerializerMethodField()
     tasks = serializers.SerializerMethodField()
     task_stats = serializers.SerializerMethodField()
 
     class Meta:
         model = Project
-        fields = ['id', 'name', 'description', 'manager', 'members', 'tasks', 'task_stats', 'created_at']
+        fields = ['id', 'name', 'description', 'manager', 'auto_follow', 'member_count', 'members_preview', 'tasks',
+                  'task_stats', 'created_at']
+        expandable_fields = {'manager': UserSerializer}
+        default_expand = ['manager']
+
+    def get_member_count(self, obj):
+        return obj.members.count()
+
+    def get_members_preview(self, obj):
+        members = obj.members.order_by('id')[:settings.PROJECT_MEMBERS_PREVIEW_SIZE]
+        return UserSerializer(members, many=True).data
 
     def get_tasks(self, obj):
-        from .models import Task
-        tasks = obj.tasks.all()[:5]  # Limit to recent 5 tasks
+        tasks = TaskListSerializer.setup_queryset(obj.tasks.all())[:5]  # Limit to recent 5 tasks
         return TaskListSerializer(tasks, many=True).data
 
     def get_task_stats(self, obj):
@@ -50,16 +166,20 @@ class ProjectSerializer(serializers.ModelSerializer):
             'done': tasks.filter(status='done').count(),
         }
 
-class TaskListSerializer(serializers.ModelSerializer):
+class TaskListSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Lightweight task serializer for list views"""
     assigned_to = UserSerializer(read_only=True)
     project_name = serializers.CharField(source='project.name', read_only=True)
 
     class Meta:
         model = Task
-        fields = ['id', 'title', 'status', 'due_date', 'project', 'project_name', 'assigned_to', 'created_at']
+        fields = ['id', 'title', 'status', 'position', 'due_date', 'project', 'project_name', 'assigned_to',
+                  'created_at']
+        expandable_fields = {'assigned_to': UserSerializer}
+        default_expand = ['assigned_to']
+        related_hints = {'project_name': {'select': ['project'], 'only': ['project__name']}}
 
-class TaskSerializer(serializers.ModelSerializer):
+class TaskSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Detailed task serializer"""
     assigned_to = UserSerializer(read_only=True)
     project = serializers.PrimaryKeyRelatedField(queryset=Project.objects.all())
@@ -70,22 +190,196 @@ class TaskSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Task
-        fields = ['id', 'title', 'description', 'status', 'due_date', 'project', 'project_name',
+        fields = ['id', 'title', 'description', 'status', 'position', 'due_date', 'project', 'project_name',
                   'assigned_to', 'comment_count', 'follower_count', 'is_following', 'created_at']
+        # Changed through the move action only
+        read_only_fields = ['position']
+        expandable_fields = {'assigned_to': UserSerializer}
+        default_expand = ['assigned_to']
+        related_hints = {'project_name': {'select': ['project'], 'only': ['project__name']}}
 
     def get_comment_count(self, obj):
         return obj.comments.count()
 
     def get_follower_count(self, obj):
-        return TaskFollower.objects.filter(task=obj).count()
+        return len(followers.followers_of(obj))
 
     def get_is_following(self, obj):
         request = self.context.get('request')
         if request and request.user.is_authenticated:
-            return TaskFollower.objects.filter(task=obj, user=request.user).exists()
+            return request.user.id in followers.followers_of(obj)
         return False
 
 
+class ProjectDeletionSerializer(serializers.ModelSerializer):
+    """Progress of a background project deletion"""
+    status = serializers.CharField(read_only=True)
+
+    class Meta:
+        model = ProjectDeletion
+        fields = ['id', 'project_id', 'project_name', 'status', 'requested_at', 'started_at',
+                  'completed_at', 'rows_deleted']
+        read_only_fields = fields
+
+
+class MemberIdsSerializer(serializers.Serializer):
+    """Payload for bulk membership changes"""
+    user_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.PROJECT_MEMBERS_BULK_LIMIT,
+    )
+
+
+class AnalyticsQuerySerializer(serializers.Serializer):
+    """Query parameters of the project analytics endpoints"""
+    weeks = serializers.IntegerField(min_value=1, max_value=settings.ANALYTICS_MAX_WEEKS, default=12)
+    days = serializers.IntegerField(min_value=1, max_value=settings.ANALYTICS_MAX_WEEKS * 7, default=30)
+    refresh = serializers.BooleanField(default=False)
+
+
+class TaskDependencySerializer(serializers.Serializer):
+    """Payload for adding a dependency: the task that blocks this one"""
+    blocked_by = serializers.IntegerField(min_value=1)
+
+
+class TaskMoveSerializer(serializers.Serializer):
+    """Where to put a task on the board: its new neighbours and, optionally, column"""
+    after = serializers.IntegerField(required=False, allow_null=True, min_value=1,
+                                     help_text='Id of the task that should end up directly above')
+    before = serializers.IntegerField(required=False, allow_null=True, min_value=1,
+                                      help_text='Id of the task that should end up directly below')
+    status = serializers.ChoiceField(choices=Task.STATUS_CHOICES, required=False)
+
+
+class FollowTasksSerializer(serializers.Serializer):
+    """Payload for bulk follow and unfollow"""
+    task_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.FOLLOW_BULK_LIMIT,
+    )
+
+
+class ArchiveQuerySerializer(serializers.Serializer):
+    """Query parameters of reads that can fall back to the task archive"""
+    include_archived = serializers.BooleanField(default=False)
+
+
+class UnarchiveSerializer(serializers.Serializer):
+    """Payload for moving archived tasks back, by their (original) task ids"""
+    task_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.ARCHIVE_BATCH_SIZE,
+    )
+
+
+class TaskArchiveSerializer(serializers.ModelSerializer):
+    """An archived task, under the id it had (and will have again) as a live task"""
+    id = serializers.IntegerField(source='original_id', read_only=True)
+    project = serializers.IntegerField(source='project_id', read_only=True)
+    assigned_to = serializers.IntegerField(source='assigned_to_id', read_only=True)
+    archived = serializers.BooleanField(default=True, read_only=True)
+
+    class Meta:
+        model = TaskArchive
+        fields = ['id', 'title', 'description', 'status', 'due_date', 'project', 'assigned_to', 'follower_ids',
+                  'created_at', 'updated_at', 'archived', 'archived_at']
+        read_only_fields = fields
+
+
+class CommentArchiveSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(source='original_id', read_only=True)
+    author = serializers.IntegerField(source='author_id', read_only=True)
+
+    class Meta:
+        model = CommentArchive
+        fields = ['id', 'author', 'content', 'created_at']
+        read_only_fields = fields
+
+
+class TaskLogArchiveSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(source='original_id', read_only=True)
+    changed_by = serializers.IntegerField(source='changed_by_id', read_only=True)
+
+    class Meta:
+        model = TaskLogArchive
+        fields = ['id', 'field_changed', 'old_value', 'new_value', 'changed_by', 'timestamp']
+        read_only_fields = fields
+
+
+class TaskArchiveDetailSerializer(TaskArchiveSerializer):
+    comments = CommentArchiveSerializer(many=True, read_only=True)
+    logs = TaskLogArchiveSerializer(many=True, read_only=True)
+
+    class Meta(TaskArchiveSerializer.Meta):
+        fields = TaskArchiveSerializer.Meta.fields + ['comments', 'logs']
+        read_only_fields = fields
+
+
+class WebhookSubscriptionSerializer(serializers.ModelSerializer):
+    events = serializers.ListField(
+        child=serializers.ChoiceField(choices=WebhookSubscription.EVENT_CHOICES),
+        required=False,
+    )
+
+    class Meta:
+        model = WebhookSubscription
+        fields = ['id', 'project', 'url', 'events', 'secret', 'is_active', 'created_at']
+        read_only_fields = ['secret', 'created_at']
+
+    def validate_url(self, value):
+        error = webhooks.check_url(value)
+        if error:
+            raise serializers.ValidationError(error)
+        return value
+
+
+class WebhookDeliverySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = WebhookDelivery
+        fields = ['id', 'event', 'status', 'attempts', 'last_status', 'last_error', 'created_at',
+                  'next_attempt_at', 'delivered_at']
+        read_only_fields = fields
+
+
+class BatchItemSerializer(serializers.Serializer):
+    """One call inside a batch request"""
+    method = serializers.ChoiceField(choices=['GET', 'POST', 'PUT', 'PATCH', 'DELETE'], default='GET')
+    path = serializers.CharField(max_length=2000)
+    body = serializers.JSONField(required=False)
+    headers = serializers.DictField(child=serializers.CharField(), required=False)
+
+
+class BatchSerializer(serializers.Serializer):
+    requests = serializers.ListField(
+        child=BatchItemSerializer(),
+        allow_empty=False,
+        max_length=settings.BATCH_MAX_REQUESTS,
+    )
+
+
+class ProvisionUserSerializer(serializers.ModelSerializer):
+    """One row of a bulk provisioning request; username uniqueness is checked in bulk by the caller"""
+    password = serializers.CharField(write_only=True)
+    projects = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False)
+
+    class Meta:
+        model = User
+        fields = ['username', 'email', 'password', 'projects']
+        extra_kwargs = {'username': {'validators': [UnicodeUsernameValidator()]}}
+
+
+class ProvisionUsersSerializer(serializers.Serializer):
+    # Rows are validated one by one so each can fail on its own
+    users = serializers.ListField(
+        child=serializers.DictField(),
+        allow_empty=False,
+        max_length=settings.PROVISIONING_MAX_ROWS,
+    )
+
+
 class RegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
 
@@ -101,29 +395,53 @@ class RegisterSerializer(serializers.ModelSerializer):
         )
         return user
     
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     author_username = serializers.CharField(source='author.username', read_only=True)
 
     class Meta:
         model = Comment
         fields = ['id', 'task', 'author', 'author_username', 'content', 'created_at']
         read_only_fields = ['author', 'created_at']
+        expandable_fields = {'author': UserSerializer}
+        related_hints = {'author_username': {'select': ['author'], 'only': ['author__username']}}
 
-class TaskLogSerializer(serializers.ModelSerializer):
+class TaskLogSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     changed_by_username = serializers.CharField(source='changed_by.username', read_only=True)
 
     class Meta:
         model = TaskLog
         fields = ['id', 'task', 'field_changed', 'old_value', 'new_value', 'changed_by', 'changed_by_username', 'timestamp']
+        expandable_fields = {'changed_by': UserSerializer}
+        related_hints = {'changed_by_username': {'select': ['changed_by'], 'only': ['changed_by__username']}}
 
-class NotificationSerializer(serializers.ModelSerializer):
+class NotificationSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Notification
         fields = ['id', 'user', 'message', 'task', 'comment', 'is_read', 'created_at']
         read_only_fields = ['user', 'message', 'task', 'comment', 'created_at']
 
-class TaskFollowerSerializer(serializers.ModelSerializer):
+class TaskFollowerSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = TaskFollower
         fields = ['id', 'user', 'task', 'created_at']
-        read_only_fields = ['user', 'created_at']
\ No newline at end of file
+        read_only_fields = ['user', 'created_at']
+        expandable_fields = {'user': UserSerializer}
+
+class ProjectSyncSerializer(serializers.ModelSerializer):
+    """Flat project representation used by the sync feed"""
+    class Meta:
+        model = Project
+        fields = ['id', 'name', 'description', 'manager', 'created_at', 'updated_at']
+
+class TaskSyncSerializer(serializers.ModelSerializer):
+    """Flat task representation used by the sync feed"""
+    class Meta:
+        model = Task
+        fields = ['id', 'title', 'description', 'status', 'position', 'due_date', 'project', 'assigned_to',
+                  'created_at', 'updated_at']
+
+class CommentSyncSerializer(serializers.ModelSerializer):
+    """Flat comment representation used by the sync feed"""
+    class Meta:
+        model = Comment
+        fields = ['id', 'task', 'author', 'content', 'created_at', 'updated_at']
@@ -0,0 +1,158 @@
+"""
+Model signal receivers that keep derived data in step with task writes.
+
+Only ``save()`` and ``delete()`` send these signals. Queryset ``update()``,
+``bulk_create``/``bulk_update`` and raw deletes bypass them, so the dashboard
+counters drift on those paths unless the writer drops them itself with
+``dashboard.forget_many`` (see ``api.archive``, ``rebalance_positions`` and
+``seed_perf_data``).
+"""
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from . import dashboard, followers
+from .models import ChangeEvent, Comment, Project, Task
+
+# Fields whose values feed the dashboard counters
+TRACKED_FIELDS = ('status', 'project_id', 'assigned_to_id')
+
+
+def _snapshot(instance):
+    # Read straight from __dict__ so deferred fields are never loaded here
+    return tuple(instance.__dict__.get(field) for field in TRACKED_FIELDS)
+
+
+def _adjust(state, delta):
+    task_status, project_id, assigned_to_id = state
+    dashboard.adjust_count('project', project_id, task_status, delta)
+    dashboard.adjust_count('user', assigned_to_id, task_status, delta)
+
+
+def _forget(state):
+    _, project_id, assigned_to_id = state
+    if project_id is not None:
+        dashboard.forget_counts('project', project_id)
+    if assigned_to_id is not None:
+        dashboard.forget_counts('user', assigned_to_id)
+
+
+@receiver(post_init, sender=Task)
+def remember_task_state(sender, instance, **kwargs):
+    instance._dashboard_state = _snapshot(instance)
+
+
+@receiver(post_save, sender=Task)
+def update_dashboard_counts_on_save(sender, instance, created, **kwargs):
+    old_state = instance._dashboard_state
+    new_state = _snapshot(instance)
+
+    if created:
+        _adjust(new_state, 1)
+    elif old_state != new_state:
+        if None in old_state:
+            # The instance was loaded without some tracked fields, so the
+            # previous counters are unknown; let them be rebuilt.
+            _forget(new_state)
+        else:
+            _adjust(old_state, -1)
+            _adjust(new_state, 1)
+
+    instance._dashboard_state = new_state
+
+
+@receiver(post_save, sender=Task)
+def forget_followers_on_task_save(sender, instance, created, **kwargs):
+    # The assignee or project (and with it the auto-follow rules) may have changed
+    if not created:
+        followers.forget([instance.pk])
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def forget_followers_on_comment(sender, instance, **kwargs):
+    # Commenters may follow the task through the project's rules
+    followers.forget([instance.task_id])
+
+
+@receiver(post_delete, sender=Task)
+def update_dashboard_counts_on_delete(sender, instance, **kwargs):
+    state = instance._dashboard_state
+    if None in state:
+        _forget(state)
+    else:
+        _adjust(state, -1)
+
+
+def _project_id(instance):
+    if isinstance(instance, Project):
+        return instance.pk
+    if isinstance(instance, (Task, Comment)):
+        return instance.project_id
+    if 'task' in instance._state.fields_cache:
+        return instance.task.project_id
+    return Task.objects.filter(pk=instance.task_id).values_list('project_id', flat=True).first()
+
+
+def _record_change(instance, deleted=False):
+    project_id = _project_id(instance)
+    if project_id is None:
+        return
+    ChangeEvent.objects.create(
+        model=instance._meta.model_name,
+        object_id=instance.pk,
+        project_id=project_id,
+        deleted=deleted,
+    )
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_save, sender=Task)
+@receiver(post_save, sender=Comment)
+def record_change_on_save(sender, instance, **kwargs):
+    _record_change(instance)
+
+
+@receiver(post_delete, sender=Project)
+@receiver(post_delete, sender=Task)
+@receiver(post_delete, sender=Comment)
+def record_change_on_delete(sender, instance, origin=None, **kwargs):
+    # Rows removed along with a deleted task or project need no tombstone of
+    # their own: clients drop them with the parent, and one insert per
+    # cascaded comment would make deleting a task cost O(comments) queries.
+    parent = getattr(origin, 'model', type(origin))
+    if parent in (Task, Project) and not isinstance(instance, parent):
+        return
+    _record_change(instance, deleted=True)
+
+
+@receiver(m2m_changed, sender=Project.members.through)
+def record_change_on_membership(sender, instance, action, reverse, pk_set=None, **kwargs):
+    if action == 'pre_clear':
+        # Clears carry no pk_set; remember who is about to lose access
+        if reverse:
+            rows = sender.objects.filter(user_id=instance.pk).values_list('project_id', flat=True)
+        else:
+            rows = sender.objects.filter(project_id=instance.pk).values_list('user_id', flat=True)
+        instance._cleared_ids = set(rows)
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    changed = instance.__dict__.pop('_cleared_ids', set()) if action == 'post_clear' else pk_set or set()
+
+    if reverse:
+        # user.projects.add(...): the changed projects are in pk_set
+        for project_id in changed:
+            ChangeEvent.objects.create(model='project', object_id=project_id, project_id=project_id)
+            if action == 'post_add':
+                ChangeEvent.grant(project_id, [instance.pk])
+            else:
+                ChangeEvent.revoke(project_id, [instance.pk])
+            followers.forget_project(project_id)
+    else:
+        _record_change(instance)
+        if action == 'post_add':
+            ChangeEvent.grant(instance.pk, changed)
+        else:
+            ChangeEvent.revoke(instance.pk, changed)
+        # Followers are limited to members
+        followers.forget_project(instance.pk)
@@ -0,0 +1,159 @@
+"""
+Slow-query log.
+
+Every database connection gets an ``execute_wrapper`` that times statements.
+Those slower than ``SLOW_QUERY_THRESHOLD_MS`` are appended as JSON lines to
+``SLOW_QUERY_LOG_FILE`` with a fingerprint (the SQL with literals and
+``IN``/``VALUES`` lists collapsed) and the view that issued them, which
+``SlowQueryViewMiddleware`` records. The first time a SELECT fingerprint is
+seen its plan is captured with ``EXPLAIN``, or with ``EXPLAIN ANALYZE`` for a
+``SLOW_QUERY_ANALYZE_SAMPLE_RATE`` fraction of them on backends that support
+it. ``manage.py slow_queries`` aggregates the log.
+
+Parameters are never written to the log.
+"""
+import contextvars
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# "GET task-list" for the request being served, None outside requests
+current_view = contextvars.ContextVar('slow_query_view', default=None)
+# Set while the logger runs its own EXPLAIN, so that is not timed in turn
+_capturing = contextvars.ContextVar('slow_query_capturing', default=False)
+_write_lock = threading.Lock()
+# Fingerprints whose plan this process already captured
+_explained = set()
+EXPLAINED_CACHE_TIMEOUT = 24 * 3600
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\bIN \(\s*\?(?:\s*,\s*\?)*\s*\)', re.IGNORECASE)
+_VALUES_ROWS = re.compile(r'(\(\?(?:, \?)*\))(?:, \(\?(?:, \?)*\))+')
+_SPACE = re.compile(r'\s+')
+
+
+def normalize(sql):
+    sql = sql.replace('%s', '?')
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _IN_LIST.sub('IN (...)', sql)
+    sql = _VALUES_ROWS.sub(r'\1, ...', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+def fingerprint(normalized_sql):
+    return hashlib.sha1(normalized_sql.encode()).hexdigest()[:16]
+
+
+def install(sender, connection, **kwargs):
+    """``connection_created`` receiver; connected in ``ApiConfig.ready``"""
+    if settings.SLOW_QUERY_THRESHOLD_MS > 0:
+        connection.execute_wrappers.append(log_slow_queries)
+
+
+def log_slow_queries(execute, sql, params, many, context):
+    if _capturing.get():
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    result = execute(sql, params, many, context)
+    duration_ms = (time.perf_counter() - started) * 1000
+    if settings.SLOW_QUERY_THRESHOLD_MS > 0 and duration_ms >= settings.SLOW_QUERY_THRESHOLD_MS:
+        token = _capturing.set(True)
+        try:
+            record(context['connection'], sql, params, many, duration_ms)
+        except Exception:
+            # The slow-query log must never break the query it is observing
+            logger.exception('Could not record slow query')
+        finally:
+            _capturing.reset(token)
+    return result
+
+
+def record(connection, sql, params, many, duration_ms):
+    normalized = normalize(sql)
+    entry = {
+        'time': timezone.now().isoformat(),
+        'fingerprint': fingerprint(normalized),
+        'duration_ms': round(duration_ms, 3),
+        'view': current_view.get(),
+        'database': connection.alias,
+        'sql': normalized,
+    }
+    if settings.SLOW_QUERY_EXPLAIN and not many and _is_new(entry['fingerprint']):
+        plan = explain(connection, sql, params)
+        if plan is not None:
+            entry['plan'], entry['analyzed'] = plan
+
+    logger.warning('Slow query (%.1f ms) in %s: %s', duration_ms, entry['view'] or '-', normalized[:200])
+    if settings.SLOW_QUERY_LOG_FILE:
+        line = json.dumps(entry) + '\n'
+        with _write_lock:
+            os.makedirs(os.path.dirname(settings.SLOW_QUERY_LOG_FILE) or '.', exist_ok=True)
+            with open(settings.SLOW_QUERY_LOG_FILE, 'a') as fh:
+                fh.write(line)
+
+
+def _is_new(key):
+    if key in _explained:
+        return False
+    _explained.add(key)
+    return cache.add(f'slow_query_plan:{key}', True, EXPLAINED_CACHE_TIMEOUT)
+
+
+def explain(connection, sql, params):
+    """``(plan text, analyzed)`` for a SELECT, or ``None`` if it cannot be explained"""
+    if not sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+        return None
+    if not connection.features.supports_explaining_query_execution:
+        return None
+
+    analyze = random.random() < settings.SLOW_QUERY_ANALYZE_SAMPLE_RATE
+    try:
+        prefix = connection.ops.explain_query_prefix(analyze=True) if analyze else None
+    except ValueError:
+        prefix = None
+    if prefix is None:
+        analyze = False
+        prefix = connection.ops.explain_query_prefix()
+
+    try:
+        # A savepoint keeps a failed EXPLAIN from poisoning the caller's transaction
+        with transaction.atomic(using=connection.alias):
+            with connection.cursor() as cursor:
+                cursor.execute(f'{prefix} {sql}', params)
+                rows = cursor.fetchall()
+    except Exception:
+        logger.exception('EXPLAIN failed for slow query')
+        return None
+    return '\n'.join(' '.join(str(col) for col in row) for row in rows), analyze
+
+
+class SlowQueryViewMiddleware:
+    """Tag queries with the view serving the current request"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = current_view.set(None)
+        try:
+            return self.get_response(request)
+        finally:
+            current_view.reset(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        match = request.resolver_match
+        current_view.set(f'{request.method} {match.view_name or match._func_path}')
@@ -1,8 +1,49 @@
-from django.urls import reverse
-from rest_framework.test import APITestCase
+import gzip
+import importlib
+import json
+import os
+import pstats
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.db.models import Count, F
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import AsyncRequestFactory, RequestFactory, SimpleTestCase, override_settings, tag
+from django.test.utils import CaptureQueriesContext
+from django.urls import clear_url_caches, get_resolver, resolve, reverse
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, APITestCase, APITransactionTestCase
 from rest_framework import status
 from django.contrib.auth.models import User
-from .models import Project, Task, TaskFollower, Notification, Comment
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import AccessToken
+from .models import (
+    Project, Task, TaskFollower, Notification, NotificationArchive, Comment, TaskReminder, TaskLog,
+    ProjectDeletion, IdempotencyKey, WebhookSubscription, WebhookDelivery, TaskDependency, ChangeEvent,
+    TaskArchive, CommentArchive, TaskLogArchive,
+)
+from . import urls as api_urls
+from . import (
+    analytics, archive, async_views, checks, compression, dashboard, followers, idempotency, slow_queries, webhooks,
+)
+from .dependencies import DependencyCycle, DependencyGraph, add_dependency
+from .positions import key_between, spread
+from .provisioning import hash_passwords
+from .views import TaskViewSet
 
 class EdgeCaseTests(APITestCase):
     def setUp(self):
@@ -98,4 +139,2242 @@ class EdgeCaseTests(APITestCase):
         project_id = response.data['id']
         self.assertTrue(
             self.manager in Project.objects.get(id=project_id).members.all()
-        )
\ No newline at end of file
+        )
+
+
+class NotificationRetentionTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader', password='pass123')
+        self.old = timezone.now() - timedelta(days=120)
+
+    def make_notifications(self, count, is_read=False, created_at=None):
+        notifications = Notification.objects.bulk_create([
+            Notification(user=self.user, message=f'n{i}', is_read=is_read) for i in range(count)
+        ])
+        if created_at:
+            Notification.objects.filter(pk__in=[n.pk for n in notifications]).update(created_at=created_at)
+        return notifications
+
+    def purge(self, **options):
+        options.setdefault('sleep', 0)
+        call_command('purge_notifications', stdout=open(os.devnull, 'w'), **options)
+
+    def test_purges_only_old_read_notifications(self):
+        self.make_notifications(3, is_read=True, created_at=self.old)
+        self.make_notifications(2, is_read=False, created_at=self.old)
+        self.make_notifications(2, is_read=True)
+        self.purge(days=90, max_per_user=0, chunk_size=2)
+        self.assertEqual(Notification.objects.count(), 4)
+        self.assertFalse(Notification.objects.filter(is_read=True, created_at__lt=timezone.now() - timedelta(days=90)).exists())
+
+    def test_keeps_most_recent_per_user(self):
+        self.make_notifications(3, created_at=self.old)
+        recent = self.make_notifications(2)
+        self.purge(days=0, max_per_user=2)
+        self.assertEqual(set(Notification.objects.values_list('pk', flat=True)), {n.pk for n in recent})
+
+    def test_archives_to_table_and_file(self):
+        self.make_notifications(3, is_read=True, created_at=self.old)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'archive.ndjson')
+            self.purge(days=90, max_per_user=0, archive_table=True, archive_file=path)
+            with open(path) as fh:
+                lines = [json.loads(line) for line in fh]
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(NotificationArchive.objects.filter(user_id=self.user.id).count(), 3)
+        self.assertEqual(Notification.objects.count(), 0)
+
+    def test_dry_run_deletes_nothing(self):
+        self.make_notifications(3, is_read=True, created_at=self.old)
+        self.purge(days=90, dry_run=True)
+        self.assertEqual(Notification.objects.count(), 3)
+
+
+class DashboardTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='worker', password='pass123')
+        self.projects = []
+        for i in range(3):
+            project = Project.objects.create(name=f'Project {i}', manager=self.user)
+            project.members.add(self.user)
+            self.projects.append(project)
+        today = timezone.localdate()
+        self.overdue = Task.objects.create(title='Late', project=self.projects[0], assigned_to=self.user,
+                                           due_date=today - timedelta(days=1))
+        self.due_soon = Task.objects.create(title='Soon', project=self.projects[1], assigned_to=self.user,
+                                            due_date=today + timedelta(days=1), status='in_progress')
+        Task.objects.create(title='Finished', project=self.projects[1], assigned_to=self.user, status='done',
+                            due_date=today - timedelta(days=5))
+        Notification.objects.create(user=self.user, message='unread')
+        self.client.force_authenticate(self.user)
+        self.url = reverse('dashboard')
+
+    def test_dashboard_summary(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        counts = {p['id']: p['task_counts'] for p in response.data['projects']}
+        self.assertEqual(counts[self.projects[1].id], {'todo': 0, 'in_progress': 1, 'done': 1, 'total': 2})
+        self.assertEqual(counts[self.projects[2].id]['total'], 0)
+        self.assertEqual(response.data['my_task_counts']['total'], 3)
+        self.assertEqual([t['id'] for t in response.data['overdue']], [self.overdue.id])
+        self.assertEqual([t['id'] for t in response.data['due_soon']], [self.due_soon.id])
+        self.assertEqual(response.data['unread_notifications'], 1)
+
+    def test_query_count_does_not_grow_with_projects(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(5):
+            self.client.get(self.url)
+        for i in range(5):
+            project = Project.objects.create(name=f'Extra {i}', manager=self.user)
+            project.members.add(self.user)
+            Task.objects.create(title='Extra', project=project, assigned_to=self.user)
+        self.client.get(self.url)
+        with self.assertNumQueries(5):
+            self.client.get(self.url)
+
+    def test_counters_follow_task_writes(self):
+        project = self.projects[0]
+        dashboard.get_status_counts('project', [project.id])
+        task = Task.objects.get(pk=self.overdue.pk)
+        task.status = 'done'
+        task.save()
+        Task.objects.create(title='New', project=project, assigned_to=self.user)
+        with self.assertNumQueries(0):
+            counts = dashboard.get_status_counts('project', [project.id])[project.id]
+        self.assertEqual(counts, {'todo': 1, 'in_progress': 0, 'done': 1, 'total': 2})
+        task.delete()
+        self.assertEqual(dashboard.get_status_counts('project', [project.id])[project.id]['done'], 0)
+
+    def test_bulk_task_writes_drop_the_counters(self):
+        project = self.projects[1]
+        expected = {'todo': 0, 'in_progress': 0, 'done': 2, 'total': 2}
+        dashboard.get_status_counts('project', [project.id])
+        # Queryset updates skip the signals, so the cached counters go stale
+        Task.objects.filter(project=project).update(status='done')
+        self.assertNotEqual(dashboard.get_status_counts('project', [project.id])[project.id], expected)
+        call_command('rebalance_positions', project=project.id, all=True, stdout=StringIO())
+        self.assertEqual(dashboard.get_status_counts('project', [project.id])[project.id], expected)
+
+        Task.objects.filter(pk=self.due_soon.pk).update(status='in_progress')
+        dashboard.get_status_counts('user', [self.user.id])
+        Task.objects.filter(pk=self.due_soon.pk).update(status='todo')
+        response = self.client.post(reverse('task-move', args=[self.due_soon.id]), {'status': 'done'},
+                                    format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(dashboard.get_status_counts('user', [self.user.id])[self.user.id],
+                         {'todo': 1, 'in_progress': 0, 'done': 2, 'total': 3})
+
+
+class SchedulerTests(APITestCase):
+    def setUp(self):
+        self.manager = User.objects.create_user(username='manager', password='pass123')
+        self.follower = User.objects.create_user(username='follower', password='pass123')
+        self.project = Project.objects.create(name='Deadlines', manager=self.manager)
+        self.project.members.add(self.manager, self.follower)
+        today = timezone.localdate()
+        self.soon = Task.objects.create(title='Soon', project=self.project, assigned_to=self.manager,
+                                        due_date=today + timedelta(days=1))
+        self.late = Task.objects.create(title='Late', project=self.project, assigned_to=self.manager,
+                                        due_date=today - timedelta(days=2))
+        Task.objects.create(title='Done', project=self.project, assigned_to=self.manager, status='done',
+                            due_date=today - timedelta(days=2))
+        Task.objects.create(title='Later', project=self.project, assigned_to=self.manager,
+                            due_date=today + timedelta(days=30))
+        TaskFollower.objects.create(user=self.follower, task=self.late)
+
+    def run_scheduler(self):
+        call_command('run_scheduler', batch_size=1, due_soon_days=1, stdout=open(os.devnull, 'w'))
+
+    def test_reminds_assignees_and_followers(self):
+        self.run_scheduler()
+        self.assertEqual(Notification.objects.filter(task=self.soon).count(), 1)
+        self.assertEqual(
+            set(Notification.objects.filter(task=self.late).values_list('user_id', flat=True)),
+            {self.manager.id, self.follower.id},
+        )
+        self.assertEqual(TaskReminder.objects.count(), 2)
+
+    def test_rerun_is_idempotent(self):
+        self.run_scheduler()
+        self.run_scheduler()
+        self.assertEqual(Notification.objects.count(), 3)
+
+    def test_changed_due_date_is_reminded_again(self):
+        self.run_scheduler()
+        self.soon.due_date = timezone.localdate()
+        self.soon.save()
+        self.run_scheduler()
+        self.assertEqual(Notification.objects.filter(task=self.soon).count(), 2)
+
+    def test_overlapping_run_only_notifies_for_its_own_reminders(self):
+        follower_ids = followers.follower_ids
+
+        def other_run_sends_first(task_ids):
+            # Another run records the reminder after this one read its candidates
+            TaskReminder.objects.get_or_create(task=self.soon, kind='due_soon', due_date=self.soon.due_date)
+            return follower_ids(task_ids)
+
+        with mock.patch.object(followers, 'follower_ids', side_effect=other_run_sends_first):
+            self.run_scheduler()
+        self.assertFalse(Notification.objects.filter(task=self.soon).exists())
+        self.assertEqual(Notification.objects.filter(task=self.late).count(), 2)
+        self.assertEqual(TaskReminder.objects.count(), 2)
+
+
+class SyncTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='syncer', password='pass123')
+        self.outsider = User.objects.create_user(username='outsider', password='pass123')
+        self.project = Project.objects.create(name='Synced', manager=self.user)
+        self.project.members.add(self.user)
+        self.hidden = Project.objects.create(name='Hidden', manager=self.outsider)
+        self.hidden.members.add(self.outsider)
+        Task.objects.create(title='Invisible', project=self.hidden, assigned_to=self.outsider)
+        self.task = Task.objects.create(title='Synced task', project=self.project, assigned_to=self.user)
+        self.client.force_authenticate(self.user)
+        self.url = reverse('sync')
+
+    def sync(self, since=0, **params):
+        response = self.client.get(self.url, {'since': since, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_full_sync_only_includes_member_projects(self):
+        data = self.sync()
+        self.assertEqual({(c['type'], c['id']) for c in data['changes']},
+                         {('project', self.project.id), ('task', self.task.id)})
+        self.assertFalse(data['has_more'])
+
+    def test_delta_contains_only_new_changes_and_tombstones(self):
+        token = self.sync()['next']
+        comment = Comment.objects.create(task=self.task, author=self.user, content='hi')
+        comment_id = comment.id
+        self.task.status = 'done'
+        self.task.save()
+        comment.delete()
+        data = self.sync(token)
+        changes = {(c['type'], c['id']): c for c in data['changes']}
+        self.assertEqual(set(changes), {('comment', comment_id), ('task', self.task.id)})
+        self.assertTrue(changes[('comment', comment_id)]['deleted'])
+        self.assertEqual(changes[('task', self.task.id)]['data']['status'], 'done')
+        self.assertEqual(self.sync(data['next'])['changes'], [])
+
+    def test_comments_deleted_with_their_task_get_no_tombstone_of_their_own(self):
+        comments = [Comment.objects.create(task=self.task, author=self.user, content=f'#{i}') for i in range(3)]
+        comment_id, task_id = comments[0].id, self.task.id
+        token = self.sync()['next']
+        comments[0].delete()
+        self.task.delete()
+        changes = {(c['type'], c['id']): c['deleted'] for c in self.sync(token)['changes']}
+        self.assertEqual(changes, {('comment', comment_id): True, ('task', task_id): True})
+
+    def test_pagination_by_sequence(self):
+        for i in range(3):
+            Task.objects.create(title=f'More {i}', project=self.project, assigned_to=self.user)
+        first = self.sync(limit=2)
+        self.assertTrue(first['has_more'])
+        rest = self.sync(first['next'], limit=100)
+        # An object may turn up on both pages; the manager's join event comes after the project's
+        self.assertEqual(len({(c['type'], c['id']) for c in first['changes'] + rest['changes']}), 5)
+
+    def test_removed_member_receives_a_project_tombstone(self):
+        dev = User.objects.create_user(username='dev', password='pass123')
+        self.project.members.add(dev)
+        self.hidden.members.add(dev)
+        self.client.force_authenticate(dev)
+        token = self.sync()['next']
+        manager_token = token
+
+        self.client.force_authenticate(self.user)
+        self.client.post(reverse('project-remove-members', args=[self.project.id]), {'user_ids': [dev.id]},
+                         format='json')
+        self.hidden.members.remove(dev)
+        self.client.force_authenticate(dev)
+        data = self.sync(token)
+        self.assertEqual({(c['type'], c['id'], c['deleted']) for c in data['changes']},
+                         {('project', self.project.id, True), ('project', self.hidden.id, True)})
+        self.assertEqual(self.sync(data['next'])['changes'], [])
+
+        # Other members only see that the membership changed
+        self.client.force_authenticate(self.user)
+        changes = self.sync(manager_token)['changes']
+        self.assertEqual([(c['type'], c['deleted']) for c in changes], [('project', False)])
+
+    def test_new_member_is_told_to_resync_the_project(self):
+        comment = Comment.objects.create(task=self.task, author=self.user, content='before you came')
+        other = Project.objects.create(name='Older', manager=self.outsider)
+        other.members.add(self.outsider)
+        dev = User.objects.create_user(username='dev', password='pass123')
+        self.hidden.members.add(dev)
+        self.client.force_authenticate(dev)
+        token = self.sync()['next']
+
+        self.client.force_authenticate(self.user)
+        manager_token = self.sync()['next']
+        response = self.client.post(reverse('project-add-members', args=[self.project.id]),
+                                    {'user_ids': [dev.id]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([c['resync'] for c in self.sync(manager_token)['changes']], [False])
+
+        self.client.force_authenticate(dev)
+        data = self.sync(token)
+        self.assertEqual([(c['type'], c['id'], c['resync']) for c in data['changes']],
+                         [('project', self.project.id, True)])
+        changes = self.sync(0, project=self.project.id)['changes']
+        self.assertEqual({(c['type'], c['id']) for c in changes},
+                         {('project', self.project.id), ('task', self.task.id), ('comment', comment.id)})
+
+        # Joining through the m2m manager gets the same treatment
+        other.members.add(dev)
+        self.assertEqual([(c['type'], c['id'], c['resync']) for c in self.sync(data['next'])['changes']],
+                         [('project', other.id, True)])
+
+    def test_task_moved_to_another_project_is_a_tombstone_for_its_old_members(self):
+        other = Project.objects.create(name='Other', manager=self.user)
+        other.members.add(self.user, self.outsider)
+        comment = Comment.objects.create(task=self.task, author=self.user, content='moving along')
+        self.client.force_authenticate(self.outsider)
+        outsider_token = self.sync()['next']
+        self.client.force_authenticate(self.user)
+        token = self.sync()['next']
+
+        # syncer stays a member of both projects; outsider only of the new one
+        response = self.client.patch(reverse('task-detail', args=[self.task.id]), {'project': other.id},
+                                     format='json')
+        self.assertEqual(response.status_code, 200)
+        changes = {(c['type'], c['id']): c for c in self.sync(token)['changes']}
+        self.assertFalse(changes[('task', self.task.id)]['deleted'])
+        self.assertEqual(changes[('task', self.task.id)]['data']['project'], other.id)
+        self.assertFalse(changes[('comment', comment.id)]['deleted'])
+        self.client.force_authenticate(self.outsider)
+        changes = {(c['type'], c['id']): c for c in self.sync(outsider_token)['changes']}
+        self.assertFalse(changes[('task', self.task.id)]['deleted'])
+        self.assertFalse(changes[('comment', comment.id)]['deleted'])
+
+        # Moving it on to a project syncer is not in leaves them a tombstone
+        self.client.force_authenticate(self.user)
+        self.client.patch(reverse('task-detail', args=[self.task.id]), {'project': self.hidden.id},
+                          format='json')
+        changes = {(c['type'], c['id']): c for c in self.sync(token)['changes']}
+        self.assertTrue(changes[('task', self.task.id)]['deleted'])
+        self.assertTrue(changes[('comment', comment.id)]['deleted'])
+
+    def test_objects_now_in_another_project_are_reported_deleted(self):
+        # A move that bypassed the signals leaves only the old project's events
+        Task.objects.filter(pk=self.task.pk).update(project=self.hidden)
+        changes = {(c['type'], c['id']): c for c in self.sync()['changes']}
+        self.assertTrue(changes[('task', self.task.id)]['deleted'])
+        self.assertIsNone(changes[('task', self.task.id)]['data'])
+
+    def test_invalid_token(self):
+        response = self.client.get(self.url, {'since': 'abc'})
+        self.assertEqual(response.status_code, 400)
+
+
+class SparseFieldsetTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='lean', password='pass123')
+        self.project = Project.objects.create(name='Lean', manager=self.user)
+        self.project.members.add(self.user)
+        self.task = Task.objects.create(title='Lean task', description='long text', project=self.project,
+                                        assigned_to=self.user)
+        self.client.force_authenticate(self.user)
+
+    def test_default_payload_is_unchanged(self):
+        response = self.client.get(reverse('task-list'))
+        task = response.data['results'][0]
+        self.assertEqual(task['assigned_to']['username'], 'lean')
+        self.assertEqual(task['project_name'], 'Lean')
+
+    def test_fields_limit_payload_and_columns(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('task-list'), {'fields': 'id,title'})
+        self.assertEqual(response.data['results'], [{'id': self.task.id, 'title': 'Lean task'}])
+        task_query = [q['sql'] for q in ctx.captured_queries if 'FROM "api_task"' in q['sql']][-1]
+        self.assertNotIn('"api_project"."name"', task_query)
+        self.assertNotIn('"api_task"."status"', task_query)
+
+    def test_expand_is_opt_in(self):
+        response = self.client.get(reverse('task-list'), {'fields': 'id,assigned_to', 'expand': ''})
+        self.assertEqual(response.data['results'][0]['assigned_to'], self.user.id)
+        response = self.client.get(reverse('project-detail', args=[self.project.id]),
+                                   {'fields': 'id,manager', 'expand': 'manager'})
+        self.assertEqual(response.data, {'id': self.project.id, 'manager': response.data['manager']})
+        self.assertEqual(response.data['manager']['username'], 'lean')
+
+    def test_comment_author_expansion(self):
+        Comment.objects.create(task=self.task, author=self.user, content='hi')
+        response = self.client.get(reverse('comment-list'), {'expand': 'author'})
+        self.assertEqual(response.data['results'][0]['author']['username'], 'lean')
+
+    def test_writes_ignore_fields_param(self):
+        response = self.client.post(reverse('task-list') + '?fields=id',
+                                    {'title': 'Created', 'project': self.project.id}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['title'], 'Created')
+
+
+class AsyncReadViewTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='async', password='pass123')
+        self.other = User.objects.create_user(username='other', password='pass123')
+        self.project = Project.objects.create(name='Async', manager=self.user)
+        self.project.members.add(self.user)
+        for i in range(3):
+            Task.objects.create(title=f'Task {i}', project=self.project, assigned_to=self.user,
+                                status='done' if i else 'todo')
+        Notification.objects.create(user=self.user, message='hello')
+        self.factory = AsyncRequestFactory()
+
+    def get(self, path, user=None, **params):
+        headers = {}
+        if user:
+            headers['Authorization'] = f'Bearer {AccessToken.for_user(user)}'
+        return self.factory.get(path, params, headers=headers)
+
+    def content(self, response):
+        return json.loads(response.content)
+
+    async def test_task_list_matches_sync_envelope(self):
+        response = await async_views.task_list(self.get('/api/tasks/', self.user, status='done'))
+        self.assertEqual(response.status_code, 200, response.content)
+        data = self.content(response)
+        self.assertEqual(data['count'], 2)
+        self.assertIsNone(data['next'])
+        self.assertEqual(data['results'][0]['assigned_to']['username'], 'async')
+
+    async def test_project_detail(self):
+        response = await async_views.project_detail(self.get('/', self.user), pk=self.project.pk)
+        data = self.content(response)
+        self.assertEqual(data['task_stats'], {'total': 3, 'todo': 1, 'in_progress': 0, 'done': 2})
+        self.assertEqual(len(data['tasks']), 3)
+        self.assertEqual(data['member_count'], 1)
+        self.assertEqual(data['members_preview'][0]['username'], 'async')
+
+    async def test_project_detail_hidden_from_non_members(self):
+        response = await async_views.project_detail(self.get('/', self.other), pk=self.project.pk)
+        self.assertEqual(response.status_code, 404)
+
+    async def test_notifications_require_authentication(self):
+        response = await async_views.notification_list(self.get('/api/notifications/'))
+        self.assertEqual(response.status_code, 401)
+        response = await async_views.notification_list(self.get('/api/notifications/', self.user))
+        self.assertEqual([n['message'] for n in self.content(response)], ['hello'])
+
+
+class StaticSchemaTests(APITestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.settings_override = override_settings(OPENAPI_SCHEMA_DIR=self.tmp.name)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+    def test_serves_prebuilt_schema_with_etag(self):
+        from drf_spectacular.drainage import GENERATOR_STATS
+        with GENERATOR_STATS.silence():
+            call_command('build_schema', stdout=open(os.devnull, 'w'))
+        response = self.client.get(reverse('schema'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content.startswith(b'openapi:'))
+        etag = response['ETag']
+
+        for header in [etag, f'"stale", W/{etag}', '*']:
+            response = self.client.get(reverse('schema'), HTTP_IF_NONE_MATCH=header)
+            self.assertEqual(response.status_code, 304, header)
+        # Tags that merely contain or are contained in the current one do not match
+        for header in [f'"x{etag[1:-1]}x"', etag[:-3] + '"', f'"{etag}"']:
+            response = self.client.get(reverse('schema'), HTTP_IF_NONE_MATCH=header)
+            self.assertEqual(response.status_code, 200, header)
+
+        response = self.client.get(reverse('schema'), {'format': 'json'})
+        self.assertIn('/api/tasks/', json.loads(response.content)['paths'])
+
+    def test_falls_back_to_live_generation(self):
+        from drf_spectacular.drainage import GENERATOR_STATS
+        with GENERATOR_STATS.silence():
+            response = self.client.get(reverse('schema'))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response)
+
+
+class StartupBudgetTests(SimpleTestCase):
+    """Cold-start budget for project_manager.wsgi; override limits with STARTUP_*_BUDGET_MS"""
+
+    def test_cold_start_within_budget(self):
+        output = subprocess.run(
+            [sys.executable, os.path.join(settings.BASE_DIR, 'benchmarks', 'startup.py'), '--json', '--samples', '1'],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        result = json.loads(output)
+        self.assertEqual(result['status'], '200 OK')
+        self.assertEqual(result['loaded_lazy_modules'], [])
+        self.assertLess(result['import_ms'], float(os.environ.get('STARTUP_IMPORT_BUDGET_MS', 2000)))
+        self.assertLess(result['first_request_ms'], float(os.environ.get('STARTUP_FIRST_REQUEST_BUDGET_MS', 1500)))
+
+
+class ProjectMembersTests(APITestCase):
+    def setUp(self):
+        self.manager = User.objects.create_user(username='boss', password='pass123')
+        self.project = Project.objects.create(name='Company', manager=self.manager)
+        self.project.members.add(self.manager)
+        self.users = [User.objects.create_user(username=f'user{i:02d}', password='pass123') for i in range(12)]
+        self.client.force_authenticate(self.manager)
+
+    def add(self, user_ids):
+        return self.client.post(reverse('project-add-members', args=[self.project.id]),
+                                {'user_ids': user_ids}, format='json')
+
+    def test_bulk_add_in_one_insert(self):
+        ids = [u.id for u in self.users]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.add(ids + [99999])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['not_found'], [99999])
+        inserts = [q for q in ctx.captured_queries
+                   if q['sql'].startswith('INSERT') and '"api_project_members"' in q['sql']]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(self.project.members.count(), 13)
+
+    def test_bulk_remove_keeps_manager(self):
+        self.add([u.id for u in self.users])
+        response = self.client.post(reverse('project-remove-members', args=[self.project.id]),
+                                    {'user_ids': [self.manager.id, self.users[0].id]}, format='json')
+        self.assertEqual(response.data['removed'], 1)
+        self.assertTrue(self.project.members.filter(pk=self.manager.pk).exists())
+
+    def test_members_only_manager_can_change(self):
+        self.add([self.users[0].id])
+        self.client.force_authenticate(self.users[0])
+        self.assertEqual(self.add([self.users[1].id]).status_code, 403)
+
+    def test_cursor_pagination_and_search(self):
+        self.add([u.id for u in self.users])
+        url = reverse('project-members', args=[self.project.id])
+        first = self.client.get(url, {'page_size': 5})
+        self.assertEqual(len(first.data['results']), 5)
+        second = self.client.get(first.data['next'])
+        self.assertEqual(len(second.data['results']), 5)
+        self.assertFalse({u['id'] for u in first.data['results']} & {u['id'] for u in second.data['results']})
+        found = self.client.get(url, {'search': 'user1'})
+        self.assertEqual({u['username'] for u in found.data['results']}, {'user10', 'user11'})
+
+    def test_detail_shows_count_and_preview(self):
+        self.add([u.id for u in self.users])
+        response = self.client.get(reverse('project-detail', args=[self.project.id]))
+        self.assertEqual(response.data['member_count'], 13)
+        self.assertEqual(len(response.data['members_preview']), settings.PROJECT_MEMBERS_PREVIEW_SIZE)
+        self.assertNotIn('members', response.data)
+
+
+class ProjectDeletionTests(APITestCase):
+    def setUp(self):
+        self.manager = User.objects.create_user(username='owner', password='pass123')
+        self.member = User.objects.create_user(username='teammate', password='pass123')
+        self.project = Project.objects.create(name='Doomed', manager=self.manager)
+        self.project.members.add(self.manager, self.member)
+        for i in range(5):
+            task = Task.objects.create(title=f'Task {i}', project=self.project, assigned_to=self.member)
+            comment = Comment.objects.create(task=task, author=self.member, content='c')
+            TaskLog.objects.create(task=task, field_changed='status', changed_by=self.manager)
+            TaskFollower.objects.create(task=task, user=self.manager)
+            Notification.objects.create(user=self.manager, task=task, comment=comment, message='n')
+        self.keeper = Project.objects.create(name='Keeper', manager=self.manager)
+        self.keeper.members.add(self.manager)
+        self.kept_task = Task.objects.create(title='Kept', project=self.keeper, assigned_to=self.manager)
+        self.client.force_authenticate(self.manager)
+
+    def process(self):
+        call_command('process_deletions', chunk_size=2, sleep=0, stdout=open(os.devnull, 'w'))
+
+    def test_destroy_hides_project_immediately(self):
+        response = self.client.delete(reverse('project-detail', args=[self.project.id]))
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], 'pending')
+        self.assertEqual(Task.objects.filter(project_id=self.project.id).count(), 5)
+
+        self.client.force_authenticate(self.member)
+        self.assertEqual(self.client.get(reverse('project-list')).data['count'], 0)
+        self.assertEqual(self.client.get(reverse('task-list')).data['count'], 0)
+
+    def test_former_members_sync_the_deletion(self):
+        self.client.force_authenticate(self.member)
+        token = self.client.get(reverse('sync')).data['next']
+        self.client.force_authenticate(self.manager)
+        self.client.delete(reverse('project-detail', args=[self.project.id]))
+        self.process()
+
+        self.client.force_authenticate(self.member)
+        changes = self.client.get(reverse('sync'), {'since': token}).data['changes']
+        self.assertEqual([(c['type'], c['id'], c['deleted']) for c in changes], [('project', self.project.id, True)])
+
+    def test_background_delete_removes_everything_in_batches(self):
+        self.client.delete(reverse('project-detail', args=[self.project.id]))
+        self.process()
+        self.assertFalse(Project.all_objects.filter(pk=self.project.id).exists())
+        self.assertEqual(Task.objects.filter(project_id=self.project.id).count(), 0)
+        self.assertEqual(Comment.objects.count(), 0)
+        self.assertEqual(Notification.objects.count(), 0)
+        self.assertTrue(Task.objects.filter(pk=self.kept_task.pk).exists())
+
+        deletion = ProjectDeletion.objects.get(project_id=self.project.id)
+        self.assertEqual(deletion.status, 'completed')
+        self.assertEqual(deletion.rows_deleted['api.Task'], 5)
+
+        response = self.client.get(reverse('project-deletion-detail', args=[deletion.id]))
+        self.assertEqual(response.data['status'], 'completed')
+
+    def test_resume_after_partial_run(self):
+        self.client.delete(reverse('project-detail', args=[self.project.id]))
+        Comment.objects.filter(task__project_id=self.project.id).first().delete()
+        self.process()
+        self.process()
+        self.assertEqual(Task.objects.filter(project_id=self.project.id).count(), 0)
+        self.assertEqual(ProjectDeletion.objects.get().status, 'completed')
+
+    def test_only_manager_can_delete(self):
+        self.client.force_authenticate(self.member)
+        response = self.client.delete(reverse('project-detail', args=[self.project.id]))
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(ProjectDeletion.objects.exists())
+
+
+class IdempotencyKeyTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='retrier', password='pass123')
+        self.project = Project.objects.create(name='Retries', manager=self.user)
+        self.project.members.add(self.user)
+        self.client.force_authenticate(self.user)
+
+    def create_task(self, key, title='Once'):
+        return self.client.post(reverse('task-list'), {'title': title, 'project': self.project.id},
+                                format='json', headers={'Idempotency-Key': key})
+
+    def test_retry_replays_first_response(self):
+        first = self.create_task('abc')
+        second = self.create_task('abc')
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second.data['id'], first.data['id'])
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(Task.objects.filter(title='Once').count(), 1)
+
+    def test_keys_are_scoped_per_user(self):
+        url = reverse('project-list')
+        self.client.post(url, {'name': 'Mine'}, format='json', headers={'Idempotency-Key': 'abc'})
+        self.client.force_authenticate(User.objects.create_user(username='other', password='pass123'))
+        response = self.client.post(url, {'name': 'Mine'}, format='json', headers={'Idempotency-Key': 'abc'})
+        self.assertNotIn('Idempotent-Replayed', response)
+        self.assertEqual(Project.objects.filter(name='Mine').count(), 2)
+
+    def test_reusing_key_for_different_request_is_rejected(self):
+        self.create_task('abc')
+        response = self.create_task('abc', title='Twice')
+        self.assertEqual(response.status_code, 422)
+        self.assertFalse(Task.objects.filter(title='Twice').exists())
+
+    def test_fingerprint_covers_a_body_the_parsers_already_read(self):
+        fingerprints = set()
+        for title in ('Once', 'Twice'):
+            request = APIRequestFactory().post(reverse('task-list'), {'title': title, 'project': self.project.id},
+                                               format='json', HTTP_IDEMPOTENCY_KEY='abc')
+            request = TaskViewSet(action_map={'post': 'create'}).initialize_request(request)
+            self.assertEqual(request.data['title'], title)
+            fingerprints.add(idempotency.request_fingerprint(request))
+        self.assertEqual(len(fingerprints), 2)
+
+    def test_in_flight_key_conflicts(self):
+        now = timezone.now()
+        IdempotencyKey.objects.create(user=self.user, key='abc', request_hash='x',
+                                      created_at=now, expires_at=now + timedelta(days=1))
+        response = self.create_task('abc')
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(Task.objects.exists())
+
+    @override_settings(IDEMPOTENCY_LOCK_TIMEOUT=0)
+    def test_abandoned_lock_is_taken_over(self):
+        now = timezone.now()
+        IdempotencyKey.objects.create(user=self.user, key='abc', request_hash='x',
+                                      created_at=now, expires_at=now + timedelta(days=1))
+        self.assertEqual(self.create_task('abc').status_code, 201)
+        self.assertEqual(IdempotencyKey.objects.get().status_code, 201)
+
+    def test_expired_key_runs_again(self):
+        self.create_task('abc')
+        IdempotencyKey.objects.update(expires_at=timezone.now())
+        self.assertNotIn('Idempotent-Replayed', self.create_task('abc'))
+        self.assertEqual(Task.objects.filter(title='Once').count(), 2)
+
+    def test_validation_errors_are_replayed(self):
+        url = reverse('task-list')
+        for _ in range(2):
+            response = self.client.post(url, {'project': self.project.id}, format='json',
+                                        headers={'Idempotency-Key': 'bad'})
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(response['Idempotent-Replayed'], 'true')
+
+    def test_follow_and_comment_are_replayed(self):
+        task = Task.objects.create(title='Watched', project=self.project, assigned_to=self.user)
+        follow_url = reverse('task-follow', args=[task.id])
+        for _ in range(2):
+            self.client.post(follow_url, headers={'Idempotency-Key': 'follow-1'})
+        for _ in range(2):
+            self.client.post(reverse('comment-list'), {'task': task.id, 'content': 'hi'},
+                             format='json', headers={'Idempotency-Key': 'comment-1'})
+        self.assertEqual(Comment.objects.count(), 1)
+        self.assertEqual(IdempotencyKey.objects.count(), 2)
+
+    def test_purge_command_removes_expired_keys(self):
+        self.create_task('abc')
+        self.create_task('def')
+        IdempotencyKey.objects.filter(key='abc').update(expires_at=timezone.now())
+        call_command('purge_idempotency_keys', stdout=open(os.devnull, 'w'))
+        self.assertEqual(list(IdempotencyKey.objects.values_list('key', flat=True)), ['def'])
+
+
+@override_settings(BATCH_MAX_WORKERS=1)
+class BatchRequestTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='batcher', password='pass123')
+        self.project = Project.objects.create(name='Batched', manager=self.user)
+        self.project.members.add(self.user)
+        self.task = Task.objects.create(title='First', project=self.project, assigned_to=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    def batch(self, *requests):
+        return self.client.post(reverse('batch'), {'requests': list(requests)}, format='json')
+
+    def test_results_come_back_in_order_with_statuses(self):
+        response = self.batch(
+            {'path': '/api/projects/'},
+            {'path': f'/api/tasks/?project={self.project.id}'},
+            {'method': 'POST', 'path': '/api/tasks/', 'body': {'title': 'Second', 'project': self.project.id}},
+            {'path': '/api/notifications/'},
+            {'path': '/api/tasks/999999/'},
+            {'path': '/api/nowhere/'},
+        )
+        self.assertEqual(response.status_code, 200)
+        results = response.data['results']
+        self.assertEqual([r['status'] for r in results], [200, 200, 201, 200, 404, 404])
+        self.assertEqual(results[0]['body']['results'][0]['name'], 'Batched')
+        self.assertEqual(results[1]['body']['count'], 1)
+        self.assertEqual(results[2]['body']['title'], 'Second')
+
+    def test_authenticates_once(self):
+        with mock.patch.object(JWTAuthentication, 'authenticate', autospec=True,
+                               side_effect=JWTAuthentication.authenticate) as authenticate:
+            self.batch({'path': '/api/projects/'}, {'path': '/api/tasks/'}, {'path': '/api/notifications/'})
+        self.assertEqual(authenticate.call_count, 1)
+
+    def test_sub_requests_keep_permissions(self):
+        outsider = User.objects.create_user(username='outsider', password='pass123')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(outsider)}')
+        response = self.batch({'method': 'DELETE', 'path': f'/api/projects/{self.project.id}/'})
+        self.assertEqual(response.data['results'][0]['status'], 404)
+        self.assertTrue(Project.objects.filter(pk=self.project.id).exists())
+
+    def test_sub_request_headers_are_passed_on(self):
+        item = {'method': 'POST', 'path': '/api/tasks/', 'headers': {'Idempotency-Key': 'k1'},
+                'body': {'title': 'Once', 'project': self.project.id}}
+        self.batch(item, item)
+        self.assertEqual(Task.objects.filter(title='Once').count(), 1)
+
+    def test_limits(self):
+        self.assertEqual(self.client.post(reverse('batch'), {'requests': []}, format='json').status_code, 400)
+        too_many = [{'path': '/api/projects/'}] * (settings.BATCH_MAX_REQUESTS + 1)
+        self.assertEqual(self.batch(*too_many).status_code, 400)
+        nested = self.batch({'method': 'POST', 'path': '/api/batch/', 'body': {'requests': []}})
+        self.assertEqual(nested.data['results'][0]['status'], 400)
+        self.assertEqual(self.batch({'path': '/admin/'}).data['results'][0]['status'], 400)
+
+    def test_requires_authentication(self):
+        self.client.credentials()
+        self.assertEqual(self.batch({'path': '/api/projects/'}).status_code, 401)
+
+
+@override_settings(BATCH_MAX_WORKERS=1)
+class AsyncBatchRequestTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='batcher', password='pass123')
+        self.project = Project.objects.create(name='Batched', manager=self.user)
+        self.project.members.add(self.user)
+        Task.objects.create(title='First', project=self.project, assigned_to=self.user)
+        Notification.objects.create(user=self.user, message='hello')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+        # The async views are wired in when api.urls is imported
+        with self.settings(ASYNC_READ_VIEWS=True):
+            self.load_urls()
+        self.addCleanup(self.load_urls)
+
+    def load_urls(self):
+        importlib.reload(api_urls)
+        clear_url_caches()
+
+    def test_async_read_views_see_the_batch_user(self):
+        self.assertIs(resolve('/tasks/', urlconf='api.urls').func, async_views.task_list)
+        response = self.client.post(reverse('batch'), {'requests': [
+            {'path': '/api/tasks/'},
+            {'path': '/api/notifications/'},
+            {'path': f'/api/projects/{self.project.id}/'},
+        ]}, format='json')
+        results = response.data['results']
+        self.assertEqual([r['status'] for r in results], [200, 200, 200])
+        self.assertEqual(results[0]['body']['count'], 1)
+        self.assertEqual(results[1]['body'][0]['message'], 'hello')
+        self.assertEqual(results[2]['body']['name'], 'Batched')
+
+
+@override_settings(BATCH_MAX_WORKERS=4)
+class ConcurrentBatchReadTests(APITransactionTestCase):
+    def test_reads_run_in_worker_threads_between_writes(self):
+        user = User.objects.create_user(username='parallel', password='pass123')
+        project = Project.objects.create(name='Parallel', manager=user)
+        project.members.add(user)
+        self.client.force_authenticate(user)
+        response = self.client.post(reverse('batch'), {'requests': [
+            {'path': '/api/tasks/'},
+            {'path': '/api/projects/'},
+            {'method': 'POST', 'path': '/api/tasks/', 'body': {'title': 'New', 'project': project.id}},
+            {'path': '/api/tasks/'},
+            {'path': f'/api/projects/{project.id}/'},
+        ]}, format='json')
+        results = response.data['results']
+        self.assertEqual([r['status'] for r in results], [200, 200, 201, 200, 200])
+        self.assertEqual(results[0]['body']['count'], 0)
+        self.assertEqual(results[3]['body']['count'], 1)
+        self.assertEqual(results[4]['body']['task_stats']['total'], 1)
+
+
+class WebhookReceiver(ThreadingHTTPServer):
+    """Local stand-in for a subscriber endpoint"""
+    daemon_threads = True
+
+    def __init__(self):
+        self.requests = []
+        self.statuses = []
+        self.delay = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+        super().__init__(('127.0.0.1', 0), WebhookReceiverHandler)
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}/hook'
+
+
+class WebhookReceiverHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        server = self.server
+        with server.lock:
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        time.sleep(server.delay)
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        with server.lock:
+            server.in_flight -= 1
+            server.requests.append({'headers': dict(self.headers), 'body': body,
+                                    'client_port': self.client_address[1]})
+            status = server.statuses.pop(0) if server.statuses else 200
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+# The local receiver is plain HTTP on loopback
+@override_settings(WEBHOOK_ALLOWED_SCHEMES=['http', 'https'], WEBHOOK_ALLOW_PRIVATE_ADDRESSES=True)
+class WebhookTests(APITestCase):
+    def setUp(self):
+        self.receiver = WebhookReceiver()
+        self.addCleanup(self.receiver.server_close)
+        self.addCleanup(self.receiver.shutdown)
+        self.manager = User.objects.create_user(username='hooker', password='pass123')
+        self.project = Project.objects.create(name='Hooked', manager=self.manager)
+        self.project.members.add(self.manager)
+        self.task = Task.objects.create(title='Watched', project=self.project, assigned_to=self.manager)
+        self.client.force_authenticate(self.manager)
+        response = self.client.post(reverse('webhook-list'),
+                                    {'project': self.project.id, 'url': self.receiver.url}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.subscription = WebhookSubscription.objects.get(pk=response.data['id'])
+
+    def comment(self, content='hello'):
+        self.client.post(reverse('comment-list'), {'task': self.task.id, 'content': content}, format='json')
+
+    def deliver(self, **kwargs):
+        dispatcher = webhooks.Dispatcher(**kwargs)
+        try:
+            return dispatcher.run_once(limit=100), dispatcher
+        finally:
+            dispatcher.close()
+
+    def test_events_are_queued_and_delivered_signed(self):
+        self.comment()
+        self.client.patch(reverse('task-detail', args=[self.task.id]), {'status': 'done'}, format='json')
+        self.assertEqual(WebhookDelivery.objects.count(), 2)
+        self.assertEqual(self.receiver.requests, [])
+
+        (delivered, failed), _ = self.deliver()
+        self.assertEqual((delivered, failed), (2, 0))
+        request = self.receiver.requests[0]
+        headers = request['headers']
+        self.assertEqual(headers['X-Webhook-Signature'],
+                         webhooks.sign(self.subscription.secret, headers['X-Webhook-Timestamp'], request['body']))
+        events = json.loads(request['body'])['deliveries']
+        self.assertEqual([e['event'] for e in events], ['comment.created', 'task.updated'])
+        self.assertEqual(events[1]['data']['changes'], [{'field': 'status', 'old': 'todo', 'new': 'done'}])
+        self.assertFalse(WebhookDelivery.objects.filter(delivered_at__isnull=True).exists())
+
+    def test_batches_share_a_keep_alive_connection(self):
+        for i in range(5):
+            self.comment(f'comment {i}')
+        (delivered, _), dispatcher = self.deliver(batch_size=2, workers=1)
+        self.assertEqual(delivered, 5)
+        self.assertEqual([len(json.loads(r['body'])['deliveries']) for r in self.receiver.requests], [2, 2, 1])
+        self.assertEqual(dispatcher.pool.connections_opened, 1)
+        self.assertEqual(len({r['client_port'] for r in self.receiver.requests}), 1)
+
+    def test_concurrency_is_limited_per_endpoint(self):
+        for i in range(6):
+            self.comment(f'comment {i}')
+        self.receiver.delay = 0.05
+        self.deliver(batch_size=1, workers=6, per_endpoint=2)
+        self.assertEqual(len(self.receiver.requests), 6)
+        self.assertLessEqual(self.receiver.max_in_flight, 2)
+
+    @override_settings(WEBHOOK_MAX_ATTEMPTS=2, WEBHOOK_BACKOFF_BASE=30)
+    def test_failures_back_off_then_give_up(self):
+        self.comment()
+        self.receiver.statuses = [500, 503]
+        (delivered, failed), _ = self.deliver()
+        self.assertEqual((delivered, failed), (0, 1))
+        delivery = WebhookDelivery.objects.get()
+        self.assertEqual((delivery.attempts, delivery.last_status), (1, 500))
+        self.assertGreater(delivery.next_attempt_at, timezone.now() + timedelta(seconds=25))
+
+        # Not due yet
+        self.assertEqual(self.deliver()[0], (0, 0))
+        WebhookDelivery.objects.update(next_attempt_at=timezone.now())
+        self.deliver()
+        self.assertEqual(WebhookDelivery.objects.get().status, 'failed')
+
+    def test_unreachable_endpoint_is_retried(self):
+        self.subscription.url = 'http://127.0.0.1:1/hook'
+        self.subscription.save()
+        self.comment()
+        self.assertEqual(self.deliver()[0], (0, 1))
+        delivery = WebhookDelivery.objects.get()
+        self.assertEqual(delivery.status, 'pending')
+        self.assertIn('ConnectionRefusedError', delivery.last_error)
+
+    def test_event_filter_and_inactive_subscriptions(self):
+        self.subscription.events = ['task.updated']
+        self.subscription.save()
+        self.comment()
+        self.assertFalse(WebhookDelivery.objects.exists())
+        self.subscription.is_active = False
+        self.subscription.save()
+        self.client.patch(reverse('task-detail', args=[self.task.id]), {'status': 'done'}, format='json')
+        self.assertFalse(WebhookDelivery.objects.exists())
+
+    def test_only_manager_can_subscribe(self):
+        member = User.objects.create_user(username='member', password='pass123')
+        self.project.members.add(member)
+        self.client.force_authenticate(member)
+        response = self.client.post(reverse('webhook-list'),
+                                    {'project': self.project.id, 'url': self.receiver.url}, format='json')
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.client.get(reverse('webhook-list')).data['count'], 0)
+
+    def test_command_drains_queue(self):
+        self.comment()
+        call_command('deliver_webhooks', stdout=open(os.devnull, 'w'))
+        self.assertEqual(len(self.receiver.requests), 1)
+        response = self.client.get(reverse('webhook-deliveries', args=[self.subscription.id]))
+        self.assertEqual(response.data[0]['status'], 'delivered')
+
+    @override_settings(WEBHOOK_ALLOWED_SCHEMES=['https'], WEBHOOK_ALLOW_PRIVATE_ADDRESSES=False)
+    def test_endpoints_must_be_public_https(self):
+        for url in [self.receiver.url, 'http://hooks.example.com/hook', 'https://127.0.0.1/hook',
+                    'https://10.0.0.5/hook', 'https://169.254.169.254/latest', 'https://[::ffff:192.168.1.1]/hook']:
+            response = self.client.post(reverse('webhook-list'), {'project': self.project.id, 'url': url},
+                                        format='json')
+            self.assertEqual(response.status_code, 400, url)
+            self.assertIn('url', response.data['details'])
+        response = self.client.post(reverse('webhook-list'),
+                                    {'project': self.project.id, 'url': 'https://hooks.example.com/hook'},
+                                    format='json')
+        self.assertEqual(response.status_code, 201)
+
+    @override_settings(WEBHOOK_ALLOW_PRIVATE_ADDRESSES=False)
+    def test_delivery_refuses_hosts_resolving_to_internal_addresses(self):
+        # Registered under a public-looking name that resolves inside the network
+        self.subscription.url = f'http://metadata.example.com:{self.receiver.server_address[1]}/hook'
+        self.subscription.save()
+        self.comment()
+        answer = [(socket.AF_INET, socket.SOCK_STREAM, 6, '', ('127.0.0.1', self.receiver.server_address[1]))]
+        with mock.patch('api.webhooks.socket.getaddrinfo', return_value=answer):
+            self.assertEqual(self.deliver()[0], (0, 1))
+        self.assertEqual(self.receiver.requests, [])
+        self.assertIn('BlockedAddress', WebhookDelivery.objects.get().last_error)
+
+        self.assertFalse(webhooks.is_public('169.254.169.254'))
+        self.assertFalse(webhooks.is_public('::ffff:10.1.2.3'))
+        self.assertTrue(webhooks.is_public('93.184.216.34'))
+
+
+class SeedPerfDataTests(APITestCase):
+    counts = {'users': 30, 'projects': 8, 'tasks': 200, 'comments': 300, 'followers': 150,
+              'logs': 300, 'notifications': 250}
+
+    def seed(self, seed=7):
+        call_command('seed_perf_data', seed=seed, batch_size=64, stdout=open(os.devnull, 'w'), **self.counts)
+
+    def snapshot(self):
+        return (
+            list(Task.objects.order_by('id').values_list('title', 'status', 'due_date', 'created_at')),
+            list(Project.objects.order_by('id').annotate(size=Count('members')).values_list('name', 'size')),
+            list(Notification.objects.order_by('id').values_list('message', 'is_read', 'created_at')),
+        )
+
+    def test_volumes_and_consistency(self):
+        self.seed()
+        self.assertEqual(User.objects.count(), 30)
+        self.assertEqual(Task.objects.count(), 200)
+        self.assertEqual(Comment.objects.count(), 300)
+        self.assertEqual(TaskLog.objects.count(), 300)
+        self.assertEqual(Notification.objects.count(), 250)
+        self.assertLessEqual(TaskFollower.objects.count(), 150)
+        # Assignees and comment authors belong to the task's project
+        self.assertFalse(Task.objects.exclude(project__members=F('assigned_to')).exists())
+        self.assertFalse(Comment.objects.exclude(task__project__members=F('author')).exists())
+        self.assertFalse(Comment.objects.filter(created_at__lt=F('task__created_at')).exists())
+
+    def test_status_logs_chain_to_the_task_status(self):
+        self.seed()
+        statuses = dict(Task.objects.values_list('id', 'status'))
+        chains = {}
+        for task_id, old, new in (TaskLog.objects.filter(field_changed='status')
+                                  .order_by('task_id', 'timestamp').values_list('task_id', 'old_value', 'new_value')):
+            chain = chains.setdefault(task_id, [])
+            if chain:
+                self.assertEqual(old, chain[-1])
+            self.assertNotEqual(old, new)
+            chain.append(new)
+        self.assertTrue(chains)
+        for task_id, chain in chains.items():
+            self.assertEqual(chain[-1], statuses[task_id])
+
+    def test_same_seed_same_data(self):
+        self.seed()
+        first = self.snapshot()
+        User.objects.all().delete()
+        self.seed()
+        self.assertEqual(self.snapshot(), first)
+
+    def test_refuses_to_seed_twice(self):
+        self.seed()
+        with self.assertRaises(CommandError):
+            self.seed()
+
+
+class RequestProfilingTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.profile_dir = tmp.name
+        self.staff = User.objects.create_user(username='ops', password='pass123', is_staff=True)
+        self.user = User.objects.create_user(username='tenant', password='pass123')
+        project = Project.objects.create(name='Slow', manager=self.user)
+        project.members.add(self.user)
+        self.client.force_authenticate(self.staff)
+        self.token = self.client.post(reverse('profiling-token')).data['token']
+        self.client.force_authenticate(self.user)
+
+    def get_projects(self, token):
+        return self.client.get(reverse('project-list'), headers={'X-Profile': token})
+
+    def test_token_requires_staff(self):
+        self.assertEqual(self.client.post(reverse('profiling-token')).status_code, 403)
+
+    def test_disabled_by_default(self):
+        response = self.get_projects(self.token)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Profile-Url', response)
+        self.assertNotIn('X-Profile-Error', response)
+
+    def test_profiled_request_saves_report(self):
+        with override_settings(PROFILING_ENABLED=True, PROFILING_DIR=self.profile_dir):
+            self.client = self.client_class()
+            self.client.force_authenticate(self.user)
+            response = self.get_projects(self.token)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data['count'], 1)
+            profile_id = response['X-Profile-Id']
+            self.assertTrue(response['X-Profile-Url'].endswith(f'/api/profiling/{profile_id}/'))
+
+            self.client.force_authenticate(self.staff)
+            report = self.client.get(reverse('profile-report', args=[profile_id])).data
+            self.assertEqual((report['method'], report['path'], report['status']), ('GET', '/api/projects/', 200))
+            self.assertEqual(report['query_count'], len(report['queries']))
+            self.assertTrue(any('api_project' in q['sql'] for q in report['queries']))
+            self.assertIn('function calls', report['top_functions'])
+
+            download = self.client.get(reverse('profile-report', args=[profile_id]), {'download': 'prof'})
+            self.assertEqual(download.status_code, 200)
+            self.assertGreater(pstats.Stats(os.path.join(self.profile_dir, f'{profile_id}.prof')).total_calls, 0)
+
+            self.client.force_authenticate(self.user)
+            self.assertEqual(self.client.get(reverse('profile-report', args=[profile_id])).status_code, 403)
+
+    def test_invalid_tokens_and_rate_limit(self):
+        with override_settings(PROFILING_ENABLED=True, PROFILING_DIR=self.profile_dir, PROFILING_RATE_LIMIT=1):
+            self.client = self.client_class()
+            self.client.force_authenticate(self.user)
+            self.assertEqual(self.get_projects('forged')['X-Profile-Error'], 'invalid or expired token')
+            self.assertIn('X-Profile-Url', self.get_projects(self.token))
+            self.assertEqual(self.get_projects(self.token)['X-Profile-Error'], 'rate limit reached')
+
+            self.staff.is_staff = False
+            self.staff.save()
+            cache.clear()
+            self.assertEqual(self.get_projects(self.token)['X-Profile-Error'], 'invalid or expired token')
+        self.assertEqual(len(os.listdir(self.profile_dir)), 2)
+
+
+class SlowQueryLogTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        slow_queries._explained.clear()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.log_file = os.path.join(tmp.name, 'slow.jsonl')
+        self.user = User.objects.create_user(username='slowpoke', password='pass123')
+        project = Project.objects.create(name='Slow', manager=self.user)
+        project.members.add(self.user)
+        Task.objects.create(title='Task', project=project, assigned_to=self.user)
+        self.client.force_authenticate(self.user)
+
+    def entries(self):
+        with open(self.log_file) as fh:
+            return [json.loads(line) for line in fh]
+
+    def test_normalize_collapses_literals_and_lists(self):
+        a = slow_queries.normalize("SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = 'x' LIMIT 21")
+        b = slow_queries.normalize('SELECT * FROM t  WHERE id IN (%s) AND name = %s LIMIT 5')
+        self.assertEqual(a, 'SELECT * FROM t WHERE id IN (...) AND name = ? LIMIT ?')
+        self.assertEqual(a, b)
+        self.assertEqual(slow_queries.normalize('INSERT INTO t VALUES (%s, %s), (%s, %s)'),
+                         'INSERT INTO t VALUES (?, ?), ...')
+
+    def test_slow_queries_are_logged_with_view_and_plan_once(self):
+        with override_settings(SLOW_QUERY_THRESHOLD_MS=0.0001, SLOW_QUERY_LOG_FILE=self.log_file):
+            with self.assertLogs('api.slow_queries', 'WARNING'):
+                self.client.get(reverse('task-list'))
+                self.client.get(reverse('task-list'))
+        entries = self.entries()
+        task_queries = [e for e in entries if e['view'] == 'GET task-list' and '"api_task"' in e['sql']]
+        self.assertGreaterEqual(len(task_queries), 2)
+        by_fingerprint = {}
+        for entry in task_queries:
+            by_fingerprint.setdefault(entry['fingerprint'], []).append(entry)
+        for group in by_fingerprint.values():
+            plans = [e for e in group if 'plan' in e]
+            self.assertEqual(len(plans), 1 if group[0]['sql'].startswith('SELECT') else 0)
+        self.assertTrue(all('%s' not in e['sql'] for e in entries))
+
+    def test_fast_queries_are_not_logged(self):
+        with override_settings(SLOW_QUERY_THRESHOLD_MS=60000, SLOW_QUERY_LOG_FILE=self.log_file):
+            self.client.get(reverse('task-list'))
+        self.assertFalse(os.path.exists(self.log_file))
+
+    def test_report_aggregates_by_fingerprint(self):
+        with open(self.log_file, 'w') as fh:
+            for duration in [10, 20, 30, 40, 1000]:
+                fh.write(json.dumps({'time': timezone.now().isoformat(), 'fingerprint': 'aaa', 'view': 'GET task-list',
+                                     'duration_ms': duration, 'sql': 'SELECT 1', 'plan': 'SCAN t'}) + '\n')
+            fh.write(json.dumps({'time': timezone.now().isoformat(), 'fingerprint': 'bbb', 'view': None,
+                                 'duration_ms': 5, 'sql': 'SELECT 2'}) + '\n')
+        out = StringIO()
+        call_command('slow_queries', file=self.log_file, plans=True, stdout=out)
+        report = out.getvalue()
+        self.assertIn('2 fingerprints, 6 slow queries', report)
+        self.assertIn('aaa  count=5  total=1100ms  p50=30.0ms  p95=1000.0ms', report)
+        self.assertLess(report.index('aaa'), report.index('bbb'))
+        self.assertIn('SCAN t', report)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class BulkProvisioningTests(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin', password='pass123', is_staff=True)
+        User.objects.create_user(username='existing', password='pass123')
+        self.project = Project.objects.create(name='Onboarding', manager=self.admin)
+        self.client.force_authenticate(self.admin)
+
+    def test_bulk_create_reports_row_failures(self):
+        response = self.client.post(reverse('user-bulk-provision'), {'users': [
+            {'username': 'alice', 'email': 'alice@example.com', 'password': 'secret-1', 'projects': [self.project.id]},
+            {'username': 'bad name!', 'password': 'x'},
+            {'username': 'bob', 'password': 'secret-2'},
+            {'username': 'existing', 'password': 'x'},
+            {'username': 'bob', 'password': 'x'},
+            {'username': 'carol', 'password': 'x', 'projects': [999999]},
+            {'username': 'dave', 'email': 'not-an-email', 'password': 'x'},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual([e['row'] for e in response.data['errors']], [1, 3, 4, 5, 6])
+        self.assertIn('email', response.data['errors'][4]['errors'])
+
+        alice = User.objects.get(username='alice')
+        self.assertTrue(alice.check_password('secret-1'))
+        self.assertTrue(self.project.members.filter(pk=alice.pk).exists())
+        self.assertTrue(User.objects.get(username='bob').check_password('secret-2'))
+        self.assertFalse(User.objects.filter(username='carol').exists())
+
+    def test_admin_only_and_row_limit(self):
+        self.client.force_authenticate(User.objects.get(username='existing'))
+        response = self.client.post(reverse('user-bulk-provision'),
+                                    {'users': [{'username': 'x', 'password': 'x'}]}, format='json')
+        self.assertEqual(response.status_code, 403)
+        self.client.force_authenticate(self.admin)
+        response = self.client.post(reverse('user-bulk-provision'), {'users': []}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_process_pool_hashes_match(self):
+        hashes = hash_passwords([f'pw-{i}' for i in range(6)], workers=2)
+        user = User(username='probe')
+        for i, encoded in enumerate(hashes):
+            user.password = encoded
+            self.assertTrue(user.check_password(f'pw-{i}'))
+
+    def test_command_reads_csv(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as fh:
+            fh.write('username,email,password,projects\n')
+            fh.write(f'erin,erin@example.com,pw1,{self.project.id}\n')
+            fh.write('existing,,pw2,\n')
+        self.addCleanup(os.remove, fh.name)
+        err = StringIO()
+        call_command('provision_users', fh.name, workers=1, stdout=StringIO(), stderr=err)
+        self.assertTrue(self.project.members.filter(username='erin').exists())
+        self.assertIn('row 2:', err.getvalue())
+
+
+class TaskPositionTests(APITestCase):
+    def setUp(self):
+        self.manager = User.objects.create_user(username='lead', password='pass123')
+        self.project = Project.objects.create(name='Board', manager=self.manager)
+        self.project.members.add(self.manager)
+        self.tasks = [Task.objects.create(title=f'Card {i}', project=self.project, assigned_to=self.manager)
+                      for i in range(4)]
+        self.client.force_authenticate(self.manager)
+
+    def column(self, status='todo'):
+        return list(Task.objects.filter(project=self.project, status=status)
+                    .order_by('position').values_list('title', flat=True))
+
+    def move(self, task, **data):
+        return self.client.post(reverse('task-move', args=[task.id]), data, format='json')
+
+    def test_keys_sort_between_neighbours(self):
+        keys = [key_between()]
+        keys.append(key_between(keys[-1], None))
+        keys.insert(0, key_between(None, keys[0]))
+        low, high = keys[0], keys[1]
+        for _ in range(200):
+            high = key_between(low, high)
+            self.assertTrue(low < high < keys[1])
+        self.assertLess(len(high), 64)
+        self.assertEqual(spread(5), sorted(set(spread(5))))
+        with self.assertRaises(ValueError):
+            key_between(keys[1], keys[0])
+
+    def test_new_tasks_append_to_their_column(self):
+        self.assertEqual(self.column(), ['Card 0', 'Card 1', 'Card 2', 'Card 3'])
+
+    def test_move_between_neighbours_updates_one_row(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.move(self.tasks[3], after=self.tasks[0].id, before=self.tasks[1].id)
+        self.assertEqual(response.status_code, 200)
+        writes = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('UPDATE "api_task"')]
+        self.assertEqual(len(writes), 1)
+        self.assertEqual(self.column(), ['Card 0', 'Card 3', 'Card 1', 'Card 2'])
+
+        self.move(self.tasks[2], before=self.tasks[0].id)
+        self.assertEqual(self.column(), ['Card 2', 'Card 0', 'Card 3', 'Card 1'])
+
+    def test_move_to_another_column_is_logged(self):
+        done = Task.objects.create(title='Shipped', status='done', project=self.project, assigned_to=self.manager)
+        response = self.move(self.tasks[1], status='done', before=done.id)
+        self.assertEqual(response.data['status'], 'done')
+        self.assertEqual(self.column('done'), ['Card 1', 'Shipped'])
+        self.assertEqual(self.column(), ['Card 0', 'Card 2', 'Card 3'])
+        self.assertTrue(TaskLog.objects.filter(task=self.tasks[1], field_changed='status', new_value='done').exists())
+
+        # A neighbour from another column is rejected
+        response = self.move(self.tasks[0], after=done.id)
+        self.assertEqual(response.status_code, 400)
+
+    def test_status_update_moves_to_end_of_new_column(self):
+        done = Task.objects.create(title='Shipped', status='done', project=self.project, assigned_to=self.manager)
+        self.client.patch(reverse('task-detail', args=[self.tasks[0].id]), {'status': 'done'}, format='json')
+        self.assertEqual(self.column('done'), ['Shipped', 'Card 0'])
+        self.assertGreater(Task.objects.get(pk=self.tasks[0].id).position, done.position)
+
+    def test_ordering_by_position(self):
+        self.move(self.tasks[0], after=self.tasks[3].id)
+        response = self.client.get(reverse('task-list'), {'project': self.project.id, 'status': 'todo',
+                                                          'ordering': 'position'})
+        self.assertEqual([t['title'] for t in response.data['results']], ['Card 1', 'Card 2', 'Card 3', 'Card 0'])
+
+    def test_rebalance_command_shortens_long_keys(self):
+        for _ in range(30):
+            self.move(self.tasks[3], after=self.tasks[0].id)
+            self.move(self.tasks[2], after=self.tasks[0].id)
+        order = self.column()
+        Task.objects.filter(pk=self.tasks[1].id).update(position=Task.objects.get(pk=self.tasks[0].id).position)
+        call_command('rebalance_positions', max_length=8, stdout=StringIO())
+        self.assertEqual(len(self.column()), 4)
+        positions = list(Task.objects.filter(project=self.project).values_list('position', flat=True))
+        self.assertEqual(len(set(positions)), 4)
+        self.assertTrue(all(len(p) <= 8 for p in positions))
+        self.assertEqual(set(self.column()), set(order))
+
+    def test_moves_into_one_gap_never_outgrow_the_column(self):
+        untouched = ChangeEvent.objects.filter(model='task', object_id=self.tasks[1].id)
+        events = untouched.count()
+        longest = 0
+        task = self.tasks[2]
+        for _ in range(800):
+            task = self.tasks[3] if task is self.tasks[2] else self.tasks[2]
+            response = self.move(task, after=self.tasks[0].id)
+            if response.status_code != 200:
+                break
+            longest = max(longest, len(response.data['position']))
+        self.assertEqual(response.status_code, 409)
+        self.assertLessEqual(longest, 64)
+        # Moves only ever wrote the moved task
+        self.assertEqual(untouched.count(), events)
+
+        call_command('rebalance_positions', stdout=StringIO())
+        self.assertEqual(self.move(task, after=self.tasks[0].id).status_code, 200)
+        self.assertEqual(self.column()[0], 'Card 0')
+
+
+class ProjectAnalyticsTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.manager = User.objects.create_user(username='lead', password='pass123')
+        self.dev = User.objects.create_user(username='dev', password='pass123')
+        self.project = Project.objects.create(name='Flow', manager=self.manager)
+        self.project.members.add(self.manager, self.dev)
+        self.now = timezone.now()
+        self.tasks = [Task.objects.create(title=f'T{i}', project=self.project, assigned_to=self.dev)
+                      for i in range(3)]
+        Task.objects.filter(project=self.project).update(created_at=self.now - timedelta(days=10))
+        self.client.force_authenticate(self.manager)
+
+    def transition(self, task, old, new, days_ago):
+        log = TaskLog.objects.create(task=task, changed_by=self.manager, field_changed='status',
+                                     old_value=old, new_value=new)
+        TaskLog.objects.filter(pk=log.pk).update(timestamp=self.now - timedelta(days=days_ago))
+        Task.objects.filter(pk=task.pk).update(status=new)
+
+    def test_reports_from_status_transitions(self):
+        self.transition(self.tasks[0], 'todo', 'in_progress', 8)
+        self.transition(self.tasks[0], 'in_progress', 'done', 6)
+        self.transition(self.tasks[1], 'todo', 'in_progress', 5)
+
+        response = self.client.get(reverse('project-analytics', args=[self.project.id]), {'days': 12})
+        self.assertEqual(response.status_code, 200)
+        data = response.data
+        self.assertEqual(data['dwell-times']['todo']['count'], 2)
+        self.assertEqual(data['dwell-times']['in_progress']['p50'], 48.0)
+        self.assertEqual(data['dwell-times']['in_progress']['current'], 1)
+        self.assertEqual(data['cycle-times']['cycle_time']['p50'], 48.0)
+        self.assertEqual(data['cycle-times']['lead_time']['p50'], 96.0)
+        self.assertEqual(sum(week['completed'] for week in data['throughput']), 1)
+        self.assertEqual(len(data['throughput']), 12)
+        burndown = [day['open'] for day in data['burndown']]
+        self.assertEqual(len(burndown), 12)
+        self.assertEqual(burndown[0], 0)
+        self.assertEqual(burndown[-1], 2)
+        self.assertEqual(data['workload'], [{'user': {'id': self.dev.id, 'username': 'dev'},
+                                             'todo': 1, 'in_progress': 1, 'open': 2, 'completed': 1}])
+
+    def test_only_new_log_rows_are_folded(self):
+        self.transition(self.tasks[0], 'todo', 'done', 3)
+        url = reverse('project-analytics-report', args=[self.project.id, 'cycle-times'])
+        self.assertEqual(self.client.get(url).data['lead_time']['count'], 1)
+
+        self.transition(self.tasks[1], 'todo', 'done', 1)
+        last_seen = analytics.load_state(self.project.id)['last_log_id']
+        self.transition(self.tasks[2], 'todo', 'done', 0)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.data['lead_time']['count'], 3)
+        # One read of the new rows; the rest are the bound and per-task lookups
+        log_reads = [q['sql'] for q in ctx.captured_queries if 'FROM "api_tasklog"' in q['sql']]
+        row_reads = [sql for sql in log_reads if f'"api_tasklog"."id" > {last_seen}' in sql]
+        self.assertEqual(len(row_reads), 1)
+        # Straight off the log's own project column
+        self.assertNotIn('JOIN', row_reads[0])
+        for sql in log_reads:
+            self.assertTrue(sql in row_reads or 'LIMIT 1' in sql or '"task_id" IN' in sql, sql)
+
+        # Deleted history is only forgotten on a rebuild
+        TaskLog.objects.filter(task=self.tasks[0]).delete()
+        self.assertEqual(self.client.get(url).data['lead_time']['count'], 3)
+        self.assertEqual(self.client.get(url, {'refresh': 1}).data['lead_time']['count'], 2)
+
+    def test_rows_committed_after_a_higher_id_are_still_folded(self):
+        self.transition(self.tasks[0], 'todo', 'done', 0)
+        self.transition(self.tasks[1], 'todo', 'done', 0)
+        late = TaskLog.objects.filter(task=self.tasks[0]).get()
+        # Not visible yet when the next row is folded
+        late.delete()
+        url = reverse('project-analytics-report', args=[self.project.id, 'cycle-times'])
+        self.assertEqual(self.client.get(url).data['lead_time']['count'], 1)
+
+        TaskLog.objects.bulk_create([late])
+        self.assertEqual(self.client.get(url).data['lead_time']['count'], 2)
+        # Re-reading the overlap folds nothing twice
+        self.assertEqual(self.client.get(url).data['lead_time']['count'], 2)
+        with self.settings(ANALYTICS_FOLD_OVERLAP=0):
+            self.assertEqual(self.client.get(url, {'refresh': 1}).data['lead_time']['count'], 2)
+
+    def test_folds_in_batches_and_splits_the_cached_state(self):
+        self.transition(self.tasks[0], 'todo', 'in_progress', 8)
+        self.transition(self.tasks[0], 'in_progress', 'done', 6)
+        self.transition(self.tasks[1], 'todo', 'done', 4)
+        self.transition(self.tasks[2], 'todo', 'in_progress', 3)
+        self.transition(self.tasks[2], 'in_progress', 'done', 1)
+        expected = analytics.report(self.project.id, refresh=True)
+
+        cache.clear()
+        with self.settings(ANALYTICS_BATCH_SIZE=2, ANALYTICS_CACHE_ITEM_BYTES=100):
+            with CaptureQueriesContext(connection) as ctx:
+                self.assertEqual(analytics.report(self.project.id), expected)
+            key = analytics.state_key(self.project.id)
+            token, parts = cache.get(key)
+            self.assertGreater(parts, 1)
+            state = analytics.load_state(self.project.id)
+        chunk_reads = [q['sql'] for q in ctx.captured_queries
+                       if q['sql'].startswith('SELECT "api_tasklog"."id"') and 'LIMIT 2' in q['sql']]
+        self.assertEqual(len(chunk_reads), 3)
+        self.assertEqual(state['tasks'][self.tasks[2].id][0], 'done')
+        self.assertEqual(len(state['tasks'][self.tasks[2].id]), 2)
+
+        # A lost piece means a rebuild, not a broken state
+        cache.delete(f'{key}:{token}:0')
+        self.assertIsNone(analytics._cache_get(key))
+        self.assertEqual(analytics.report(self.project.id), expected)
+
+    def test_members_only_and_validated_windows(self):
+        outsider = User.objects.create_user(username='outsider', password='pass123')
+        self.client.force_authenticate(outsider)
+        response = self.client.get(reverse('project-analytics', args=[self.project.id]))
+        self.assertEqual(response.status_code, 404)
+        self.client.force_authenticate(self.dev)
+        response = self.client.get(reverse('project-analytics-report', args=[self.project.id, 'throughput']),
+                                   {'weeks': 0})
+        self.assertEqual(response.status_code, 400)
+
+
+class TaskDependencyTests(APITestCase):
+    def setUp(self):
+        self.manager = User.objects.create_user(username='lead', password='pass123')
+        self.project = Project.objects.create(name='Launch', manager=self.manager)
+        self.project.members.add(self.manager)
+        today = timezone.localdate()
+        self.tasks = {
+            name: Task.objects.create(title=name, project=self.project, assigned_to=self.manager,
+                                      due_date=today + timedelta(days=due) if due is not None else None)
+            for name, due in [('design', 5), ('build', 20), ('test', 10), ('docs', None), ('ship', 30)]
+        }
+        self.client.force_authenticate(self.manager)
+
+    def block(self, task, blocker):
+        return self.client.post(reverse('task-dependencies', args=[self.tasks[task].id]),
+                                {'blocked_by': self.tasks[blocker].id}, format='json')
+
+    def ids(self, *names):
+        return [self.tasks[name].id for name in names]
+
+    def test_add_list_and_remove(self):
+        response = self.block('build', 'design')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([t['id'] for t in response.data['blocked_by']], self.ids('design'))
+        self.assertEqual(self.block('build', 'design').status_code, 200)
+
+        response = self.client.get(reverse('task-dependencies', args=[self.tasks['design'].id]))
+        self.assertEqual([t['id'] for t in response.data['blocking']], self.ids('build'))
+
+        url = reverse('task-remove-dependency', args=[self.tasks['build'].id, self.tasks['design'].id])
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertEqual(self.client.delete(url).status_code, 404)
+
+    def test_cycles_are_refused(self):
+        self.block('build', 'design')
+        self.block('test', 'build')
+        response = self.block('design', 'test')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['details']['cycle'], self.ids('design', 'build', 'test', 'design'))
+        self.assertEqual(self.block('design', 'design').status_code, 400)
+        self.assertEqual(TaskDependency.objects.count(), 2)
+
+        other = Project.objects.create(name='Other', manager=self.manager)
+        outside = Task.objects.create(title='elsewhere', project=other, assigned_to=self.manager)
+        response = self.client.post(reverse('task-dependencies', args=[self.tasks['ship'].id]),
+                                    {'blocked_by': outside.id}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_edges_against_rank_order_are_reordered_locally(self):
+        # Ranks are handed out in insertion order, so each of these needs a reorder
+        add_dependency(self.tasks['test'], self.tasks['build'])
+        add_dependency(self.tasks['build'], self.tasks['design'])
+        add_dependency(self.tasks['ship'], self.tasks['docs'])
+        add_dependency(self.tasks['docs'], self.tasks['test'])
+        with self.assertRaises(DependencyCycle):
+            add_dependency(self.tasks['design'], self.tasks['ship'])
+
+        ranks = dict(Task.objects.values_list('title', 'dependency_rank'))
+        for dependency in TaskDependency.objects.select_related('task', 'blocked_by'):
+            self.assertLess(ranks[dependency.blocked_by.title], ranks[dependency.task.title])
+
+        # Agreeing with the ranks: no graph read, no reorder
+        with CaptureQueriesContext(connection) as ctx:
+            add_dependency(self.tasks['ship'], self.tasks['design'])
+        self.assertFalse([q for q in ctx.captured_queries if 'api_taskdependency" INNER JOIN' in q['sql']])
+
+    def test_project_graph_endpoints(self):
+        self.block('build', 'design')
+        self.block('test', 'build')
+        self.block('ship', 'test')
+        self.block('ship', 'docs')
+        Task.objects.filter(pk=self.tasks['design'].id).update(status='done')
+
+        response = self.client.get(reverse('project-dependency-order', args=[self.project.id]), {'page_size': 50})
+        order = [t['id'] for t in response.data['results']]
+        self.assertLess(order.index(self.tasks['design'].id), order.index(self.tasks['build'].id))
+        self.assertLess(order.index(self.tasks['test'].id), order.index(self.tasks['ship'].id))
+
+        response = self.client.get(reverse('project-blocked-tasks', args=[self.project.id]))
+        blocked = {t['id']: t['blocked_by'] for t in response.data['results']}
+        self.assertEqual(blocked, {self.tasks['test'].id: self.ids('build'),
+                                   self.tasks['ship'].id: sorted(self.ids('test', 'docs'))})
+
+        response = self.client.get(reverse('project-ready-tasks', args=[self.project.id]))
+        self.assertEqual([t['id'] for t in response.data['results']], self.ids('build', 'docs'))
+
+        response = self.client.get(reverse('project-critical-path', args=[self.project.id]))
+        self.assertEqual([t['id'] for t in response.data['tasks']], self.ids('build', 'test', 'ship'))
+        # build is due after test, which it blocks
+        self.assertEqual(response.data['tasks'][0]['effective_due_date'], response.data['tasks'][1]['due_date'])
+
+    def test_large_graph_is_fast(self):
+        rng = __import__('random').Random(7)
+        tasks = [(pk, f'T{pk}', 'todo', None, 1) for pk in range(1, 50001)]
+        edges = {(a, rng.randint(a + 1, min(50000, a + 200))) for a in (rng.randint(1, 49999) for _ in range(50000))}
+        started = time.perf_counter()
+        graph = DependencyGraph(tasks, edges)
+        self.assertEqual(len(graph.topological_order()), 50000)
+        graph.critical_path()
+        self.assertLess(time.perf_counter() - started, 3)
+
+    def test_only_the_requested_page_is_rendered(self):
+        Task.objects.bulk_create([Task(title=f'Chore {i}', project=self.project, assigned_to=self.manager,
+                                       position=f'x{i:05d}') for i in range(45)])
+        with mock.patch.object(DependencyGraph, 'task', autospec=True, side_effect=DependencyGraph.task) as render:
+            response = self.client.get(reverse('project-dependency-order', args=[self.project.id]), {'page': 2})
+            self.assertEqual((response.data['count'], len(response.data['results'])), (50, 20))
+            self.assertEqual(render.call_count, 20)
+            render.reset_mock()
+            response = self.client.get(reverse('project-ready-tasks', args=[self.project.id]), {'page': 3})
+            self.assertEqual(len(response.data['results']), 10)
+            self.assertEqual(render.call_count, 10)
+
+
+class ActivityFeedTests(APITestCase):
+    def setUp(self):
+        self.manager = User.objects.create_user(username='lead', password='pass123')
+        self.dev = User.objects.create_user(username='dev', password='pass123')
+        self.project = Project.objects.create(name='Feed', manager=self.manager)
+        self.project.members.add(self.manager, self.dev)
+        self.task = Task.objects.create(title='Write feed', project=self.project, assigned_to=self.dev)
+        self.other = Task.objects.create(title='Other', project=self.project, assigned_to=self.dev)
+        # Interleaved comments and log entries; some share a timestamp
+        base = timezone.now() - timedelta(hours=1)
+        self.expected = []
+        for i in range(7):
+            stamp = base + timedelta(minutes=i // 2)
+            comment = Comment.objects.create(task=self.task, author=self.dev, content=f'comment {i}')
+            Comment.objects.filter(pk=comment.pk).update(created_at=stamp)
+            log = TaskLog.objects.create(task=self.task, changed_by=self.manager, field_changed='status',
+                                         old_value='todo', new_value=f'step {i}')
+            TaskLog.objects.filter(pk=log.pk).update(timestamp=stamp)
+            self.expected += [('comment', comment.id, stamp), ('log', log.id, stamp)]
+        self.expected.sort(key=lambda item: (item[2], item[0] == 'log', item[1]), reverse=True)
+        Comment.objects.create(task=self.other, author=self.manager, content='elsewhere')
+        self.client.force_authenticate(self.dev)
+
+    def walk(self, url, params):
+        seen = []
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            seen += [(item['type'], item['id']) for item in response.data['results']]
+            if not response.data['next']:
+                return seen
+            response = self.client.get(response.data['next'])
+
+    def test_task_feed_merges_and_pages_without_gaps(self):
+        url = reverse('task-activity', args=[self.task.id])
+        self.assertEqual(self.walk(url, {'page_size': 3}), [(kind, pk) for kind, pk, _ in self.expected])
+        item = self.client.get(url, {'page_size': 1}).data['results'][0]
+        self.assertEqual(item['user']['username'], 'dev' if item['type'] == 'comment' else 'lead')
+
+    def test_task_comment_feed(self):
+        url = reverse('task-comments', args=[self.task.id])
+        ids = [pk for kind, pk, _ in self.expected if kind == 'comment']
+        self.assertEqual(self.walk(url, {'page_size': 4}), [('comment', pk) for pk in ids])
+
+    def test_project_feed_filters_and_query_count(self):
+        url = reverse('project-activity', args=[self.project.id])
+        self.assertEqual(len(self.walk(url, {'page_size': 50})), 15)
+        self.assertEqual(len(self.walk(url, {'type': 'comment'})), 8)
+        self.assertEqual(len(self.walk(url, {'user': self.manager.id})), 8)
+        self.assertEqual(len(self.walk(url, {'task': self.other.id})), 1)
+        self.assertEqual(self.client.get(url, {'type': 'likes'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'cursor': 'garbage'}).status_code, 404)
+
+        first = self.client.get(url, {'page_size': 5})
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(first.data['next'])
+        # membership, project, one query per source with authors joined
+        self.assertLessEqual(len(ctx.captured_queries), 4)
+
+    def test_comment_list_filters_and_log_404(self):
+        response = self.client.get(reverse('comment-list'), {'task': self.other.id})
+        self.assertEqual([c['content'] for c in response.data['results']], ['elsewhere'])
+        self.assertEqual(self.client.get(reverse('task-logs', args=[999999])).status_code, 404)
+        outsider = User.objects.create_user(username='outsider', password='pass123')
+        self.client.force_authenticate(outsider)
+        self.assertEqual(self.client.get(reverse('task-logs', args=[self.task.id])).status_code, 403)
+        self.assertEqual(self.client.get(reverse('task-activity', args=[self.task.id])).status_code, 404)
+
+    def test_project_copy_follows_moved_task(self):
+        target = Project.objects.create(name='Target', manager=self.dev)
+        self.client.patch(reverse('task-detail', args=[self.task.id]), {'project': target.id}, format='json')
+        self.assertEqual(Comment.objects.filter(task=self.task, project=target).count(), 7)
+        self.assertFalse(TaskLog.objects.filter(task=self.task).exclude(project=target).exists())
+
+
+class CompressionMiddlewareTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='remote', password='pass123')
+        project = Project.objects.create(name='Remote office', manager=self.user)
+        project.members.add(self.user)
+        for i in range(20):
+            Task.objects.create(title=f'Compress me {i}', description='x' * 50, project=project,
+                                assigned_to=self.user)
+        self.client.force_authenticate(self.user)
+        self.middleware = compression.CompressionMiddleware(lambda request: None)
+
+    def test_large_json_is_gzipped(self):
+        response = self.client.get(reverse('task-list'), HTTP_ACCEPT_ENCODING='br;q=0.9, gzip;q=0.8')
+        self.assertEqual(response['Content-Encoding'], 'br' if compression.brotli else 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        if response['Content-Encoding'] == 'gzip':
+            body = json.loads(gzip.decompress(response.content))
+            self.assertEqual(body['count'], 20)
+            self.assertEqual(int(response['Content-Length']), len(response.content))
+
+    def test_small_or_unwanted_responses_stay_identity(self):
+        response = self.client.get(reverse('task-list'), {'page_size': 1, 'fields': 'id'},
+                                   HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        response = self.client.get(reverse('task-list'), HTTP_ACCEPT_ENCODING='gzip;q=0, identity')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response.json()['count'], 20)
+
+    def test_negotiation(self):
+        encoders = [compression.GzipEncoder(5)]
+        self.assertEqual(compression.negotiate('deflate, gzip;q=0.5', encoders).name, 'gzip')
+        self.assertEqual(compression.negotiate('*', encoders).name, 'gzip')
+        self.assertIsNone(compression.negotiate('*;q=0', encoders))
+        self.assertIsNone(compression.negotiate('', encoders))
+
+    def test_streaming_response_is_flushed_per_chunk(self):
+        request = RequestFactory().get('/export', HTTP_ACCEPT_ENCODING='gzip')
+        rows = (json.dumps({'row': i, 'padding': 'y' * 100}).encode() + b'\n' for i in range(50))
+        response = self.middleware.compress(
+            request, StreamingHttpResponse(rows, content_type='application/x-ndjson'))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertFalse(response.has_header('Content-Length'))
+
+        decompressor = zlib.decompressobj(31)
+        chunks = iter(response.streaming_content)
+        # The first compressed chunk already decodes to the first row
+        self.assertEqual(json.loads(decompressor.decompress(next(chunks)))['row'], 0)
+        rest = decompressor.decompress(b''.join(chunks))
+        self.assertEqual(len(rest.splitlines()), 49)
+
+    def test_async_streaming_and_precompressed_responses(self):
+        request = RequestFactory().get('/export', HTTP_ACCEPT_ENCODING='gzip')
+
+        async def rows():
+            for i in range(10):
+                yield f'line {i} '.encode() * 20
+
+        async def collect(response):
+            return b''.join([chunk async for chunk in response.streaming_content])
+
+        response = self.middleware.compress(request, StreamingHttpResponse(rows(), content_type='text/plain'))
+        self.assertTrue(gzip.decompress(async_to_sync(collect)(response)).startswith(b'line 0'))
+
+        already = HttpResponse(b'z' * 5000, content_type='application/json', headers={'Content-Encoding': 'br'})
+        self.assertEqual(self.middleware.compress(request, already)['Content-Encoding'], 'br')
+        binary = HttpResponse(b'z' * 5000, content_type='application/octet-stream')
+        self.assertFalse(self.middleware.compress(request, binary).has_header('Content-Encoding'))
+
+
+class TaskArchiveTests(APITestCase):
+    def setUp(self):
+        self.manager = User.objects.create_user(username='lead', password='pass123')
+        self.dev = User.objects.create_user(username='dev', password='pass123')
+        self.project = Project.objects.create(name='Legacy', manager=self.manager)
+        self.project.members.add(self.manager, self.dev)
+        self.done = Task.objects.create(title='Shipped', project=self.project, assigned_to=self.dev, status='done')
+        self.open = Task.objects.create(title='Leftover', project=self.project, assigned_to=self.dev)
+        self.blocker = Task.objects.create(title='Foundation', project=self.project, assigned_to=self.dev,
+                                           status='done')
+        add_dependency(self.open, self.blocker)
+        self.comment = Comment.objects.create(task=self.done, author=self.dev, content='Released in 1.2')
+        TaskLog.objects.create(task=self.done, changed_by=self.dev, field_changed='status',
+                               old_value='in_progress', new_value='done')
+        TaskFollower.objects.create(task=self.done, user=self.manager)
+        self.notification = Notification.objects.create(user=self.manager, task=self.done, comment=self.comment,
+                                                        message='New comment')
+
+        self.active = Project.objects.create(name='Current', manager=self.manager)
+        self.active.members.add(self.manager)
+        self.recent = Task.objects.create(title='Fresh', project=self.active, assigned_to=self.manager,
+                                          status='done')
+        self.comment_time = self.age(self.project, days=400)
+        self.age(self.active, days=400)
+        Task.objects.filter(pk=self.recent.pk).update(updated_at=timezone.now())
+        self.client.force_authenticate(self.manager)
+
+    def age(self, project, days):
+        then = timezone.now() - timedelta(days=days)
+        Project.objects.filter(pk=project.pk).update(updated_at=then)
+        Task.objects.filter(project=project).update(updated_at=then)
+        Comment.objects.filter(project=project).update(created_at=then, updated_at=then)
+        TaskLog.objects.filter(project=project).update(timestamp=then)
+        return then
+
+    def archive(self, **options):
+        out = StringIO()
+        call_command('archive_tasks', sleep=0, stdout=out, **options)
+        return out.getvalue()
+
+    def test_moves_done_tasks_of_idle_projects(self):
+        self.assertIn('Archived 1 tasks', self.archive())
+        self.assertFalse(Task.objects.filter(pk=self.done.pk).exists())
+        # Open work, tasks in the dependency graph and active projects stay hot
+        self.assertEqual(set(Task.objects.values_list('title', flat=True)), {'Leftover', 'Foundation', 'Fresh'})
+        archived = TaskArchive.objects.get(original_id=self.done.pk)
+        self.assertEqual((archived.project_id, archived.follower_ids), (self.project.id, [self.manager.id]))
+        self.assertEqual(archived.comments.get().original_id, self.comment.id)
+        self.assertEqual(archived.logs.get().new_value, 'done')
+        self.assertFalse(Comment.objects.filter(task_id=self.done.pk).exists())
+        self.assertFalse(TaskFollower.objects.filter(task_id=self.done.pk).exists())
+        self.notification.refresh_from_db()
+        self.assertEqual((self.notification.task_id, self.notification.comment_id), (None, None))
+        # Moving rows is not a change clients need to sync
+        self.assertFalse(ChangeEvent.objects.filter(object_id=self.done.pk, deleted=True).exists())
+
+        self.assertIn('Archived 0 tasks', self.archive())
+        self.assertIn('Would archive 1 tasks', self.archive(project=self.active.id, dry_run=True))
+
+    def test_archived_tasks_are_read_separately(self):
+        self.archive()
+        ids = [task['id'] for task in self.client.get(reverse('task-list')).data['results']]
+        self.assertNotIn(self.done.id, ids)
+        url = reverse('task-detail', args=[self.done.id])
+        self.assertEqual(self.client.get(url).status_code, 404)
+        response = self.client.get(url, {'include_archived': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['title'], response.data['archived']), ('Shipped', True))
+
+        response = self.client.get(reverse('project-archived-tasks', args=[self.project.id]))
+        self.assertEqual([task['id'] for task in response.data['results']], [self.done.id])
+        response = self.client.get(reverse('project-archived-task', args=[self.project.id, self.done.id]))
+        self.assertEqual(response.data['comments'][0]['content'], 'Released in 1.2')
+        self.assertEqual(response.data['logs'][0]['changed_by'], self.dev.id)
+
+        self.client.force_authenticate(User.objects.create_user(username='outsider', password='pass123'))
+        self.assertEqual(self.client.get(url, {'include_archived': 1}).status_code, 404)
+
+    def test_unarchive_restores_task_with_its_history(self):
+        self.archive()
+        url = reverse('project-unarchive', args=[self.project.id])
+        self.client.force_authenticate(self.dev)
+        self.assertEqual(self.client.post(url, {'task_ids': [self.done.id]}, format='json').status_code, 403)
+
+        self.client.force_authenticate(self.manager)
+        response = self.client.post(url, {'task_ids': [self.done.id, 999999]}, format='json')
+        self.assertEqual(response.data, {'restored': [self.done.id], 'not_found': [999999]})
+        task = Task.objects.get(pk=self.done.id)
+        self.assertEqual((task.title, task.status, task.assigned_to_id), ('Shipped', 'done', self.dev.id))
+        self.assertGreater(task.position, Task.objects.get(pk=self.blocker.pk).position)
+        comment = Comment.objects.get(pk=self.comment.id)
+        self.assertEqual((comment.project_id, comment.created_at), (self.project.id, self.comment_time))
+        self.assertTrue(TaskFollower.objects.filter(task=task, user=self.manager).exists())
+        self.assertFalse(TaskArchive.objects.exists())
+        self.assertEqual(self.client.get(reverse('task-comments', args=[task.id])).data['results'][0]['id'],
+                         comment.id)
+        # It now counts as fresh activity, so the next run leaves the project alone
+        self.assertIn('Archived 0 tasks', self.archive())
+
+    def test_unarchive_command_restores_a_project(self):
+        self.archive()
+        User.objects.filter(pk=self.dev.pk).delete()
+        out = StringIO()
+        call_command('archive_tasks', unarchive=True, project=self.project.id, stdout=out)
+        self.assertIn('Restored 1 tasks', out.getvalue())
+        # The deleted assignee's task goes to the manager; their comments stay gone
+        task = Task.objects.get(pk=self.done.id)
+        self.assertEqual(task.assigned_to_id, self.manager.id)
+        self.assertFalse(task.comments.exists())
+        with self.assertRaises(CommandError):
+            call_command('archive_tasks', unarchive=True, stdout=StringIO())
+
+    def test_comment_written_during_the_move_keeps_its_task_hot(self):
+        copy_logs = TaskLogArchive.objects.bulk_create
+
+        def comment_after_copy(*args, **kwargs):
+            created = copy_logs(*args, **kwargs)
+            Comment.objects.create(task=self.done, author=self.dev, content='Reopening?')
+            return created
+
+        with mock.patch.object(TaskLogArchive.objects, 'bulk_create', side_effect=comment_after_copy):
+            self.assertIn('Archived 0 tasks', self.archive())
+        self.assertEqual(set(self.done.comments.values_list('content', flat=True)),
+                         {'Released in 1.2', 'Reopening?'})
+        self.assertTrue(TaskLog.objects.filter(task=self.done).exists())
+        self.assertTrue(TaskFollower.objects.filter(task=self.done, user=self.manager).exists())
+        self.assertFalse(TaskArchive.objects.exists())
+        self.assertFalse(CommentArchive.objects.exists())
+
+        # A task reopened after its batch was picked is left alone too
+        counts, _, _ = archive._archive_batch(self.project.id, [self.open.id])
+        self.assertEqual(counts['tasks'], 0)
+        self.assertTrue(Task.objects.filter(pk=self.open.pk).exists())
+
+
+class FollowerRegistryTests(APITestCase):
+    def setUp(self):
+        self.manager = User.objects.create_user(username='lead', password='pass123')
+        self.dev = User.objects.create_user(username='dev', password='pass123')
+        self.reviewer = User.objects.create_user(username='reviewer', password='pass123')
+        self.outsider = User.objects.create_user(username='outsider', password='pass123')
+        self.project = Project.objects.create(name='Followed', manager=self.manager)
+        self.project.members.add(self.manager, self.dev, self.reviewer)
+        self.task = Task.objects.create(title='Watch me', project=self.project, assigned_to=self.dev)
+        self.other = Task.objects.create(title='Me too', project=self.project, assigned_to=self.dev)
+        self.hidden = Project.objects.create(name='Hidden', manager=self.outsider)
+        self.secret = Task.objects.create(title='Secret', project=self.hidden, assigned_to=self.outsider)
+        cache.clear()
+
+    def followers(self, task=None):
+        return followers.followers_of(task or self.task)
+
+    def test_follow_checks_membership(self):
+        self.client.force_authenticate(self.outsider)
+        self.assertEqual(self.client.post(reverse('task-follow', args=[self.task.id])).status_code, 403)
+        self.assertEqual(self.client.post(reverse('task-follow', args=[999999])).status_code, 404)
+        self.client.force_authenticate(self.reviewer)
+        self.assertEqual(self.client.post(reverse('task-follow', args=[self.task.id])).status_code, 200)
+        self.assertEqual(self.followers(), {self.reviewer.id})
+
+    def test_sets_are_cached_and_dropped_on_follow_and_unfollow(self):
+        self.assertEqual(self.followers(), set())
+        with self.assertNumQueries(0):
+            self.assertEqual(self.followers(), set())
+        followers.follow(self.reviewer, [self.task.id])
+        self.assertEqual(self.followers(), {self.reviewer.id})
+        followers.unfollow(self.reviewer, [self.task.id])
+        self.assertEqual(self.followers(), set())
+        # Nothing to mute without a rule
+        self.assertFalse(TaskFollower.objects.exists())
+
+    def test_auto_follow_rules(self):
+        self.client.force_authenticate(self.manager)
+        url = reverse('project-detail', args=[self.project.id])
+        self.assertEqual(self.followers(), set())
+        response = self.client.patch(url, {'auto_follow': ['assignee', 'commenter']}, format='json')
+        self.assertEqual(response.data['auto_follow'], ['assignee', 'commenter'])
+        self.assertEqual(self.followers(), {self.dev.id})
+        self.assertEqual(self.client.patch(url, {'auto_follow': ['everyone']}, format='json').status_code, 400)
+
+        self.client.force_authenticate(self.reviewer)
+        self.client.post(reverse('comment-list'), {'task': self.task.id, 'content': 'LGTM'}, format='json')
+        self.assertEqual(self.followers(), {self.dev.id, self.reviewer.id})
+        # No rows per task: the rules live on the project
+        self.assertFalse(TaskFollower.objects.exists())
+
+        self.client.force_authenticate(self.manager)
+        self.client.patch(reverse('task-detail', args=[self.task.id]), {'status': 'done'}, format='json')
+        notified = set(Notification.objects.filter(task=self.task).values_list('user_id', flat=True))
+        self.assertEqual(notified, {self.dev.id, self.reviewer.id})
+        response = self.client.get(reverse('task-detail', args=[self.task.id]))
+        self.assertEqual((response.data['follower_count'], response.data['is_following']), (2, False))
+
+        # Reassigning moves the rule-based follow to the new assignee
+        self.assertEqual(self.followers(self.other), {self.dev.id})
+        self.other.assigned_to = self.reviewer
+        self.other.save()
+        self.assertEqual(self.followers(self.other), {self.reviewer.id})
+
+    def test_project_changes_retire_its_sets_with_one_key(self):
+        sets = followers.follower_ids([self.task.id, self.other.id, self.secret.id])
+        self.assertEqual(sets[self.task.id], set())
+        Project.objects.filter(pk=self.project.pk).update(auto_follow=['assignee'])
+        with self.assertNumQueries(0):
+            followers.forget_project(self.project.id)
+        sets = followers.follower_ids([self.task.id, self.other.id, self.secret.id])
+        self.assertEqual((sets[self.task.id], sets[self.other.id]), ({self.dev.id}, {self.dev.id}))
+        # Other projects' sets are untouched
+        with self.assertNumQueries(0):
+            followers.follower_ids([self.secret.id])
+
+        # Losing the generation counts as a bump
+        Project.objects.filter(pk=self.project.pk).update(auto_follow=[])
+        cache.delete(followers.generation_key(self.project.id))
+        self.assertEqual(self.followers(), set())
+
+    def test_unfollowing_a_rule_mutes_it(self):
+        self.project.auto_follow = ['assignee']
+        self.project.save()
+        followers.forget_project(self.project.id)
+        self.client.force_authenticate(self.dev)
+        self.client.post(reverse('task-unfollow', args=[self.task.id]))
+        self.assertEqual(self.followers(), set())
+        self.assertTrue(TaskFollower.objects.get(task=self.task, user=self.dev).muted)
+        self.client.post(reverse('task-follow', args=[self.task.id]))
+        self.assertEqual(self.followers(), {self.dev.id})
+        self.assertFalse(TaskFollower.objects.get(task=self.task, user=self.dev).muted)
+
+    def test_bulk_follow_and_unfollow(self):
+        self.client.force_authenticate(self.reviewer)
+        ids = [self.task.id, self.other.id, self.secret.id, 999999]
+        response = self.client.post(reverse('task-bulk-follow'), {'task_ids': ids}, format='json')
+        self.assertEqual(response.data, {'followed': [self.task.id, self.other.id],
+                                         'not_found': [self.secret.id, 999999]})
+        self.assertEqual(followers.follower_ids([self.task.id, self.other.id, self.secret.id]),
+                         {self.task.id: {self.reviewer.id}, self.other.id: {self.reviewer.id}, self.secret.id: set()})
+        response = self.client.post(reverse('task-bulk-unfollow'), {'task_ids': [self.task.id]}, format='json')
+        self.assertEqual(response.data, {'unfollowed': [self.task.id], 'not_found': []})
+        self.assertEqual(self.followers(), set())
+        self.assertEqual(self.client.post(reverse('task-bulk-follow'), {'task_ids': []}, format='json').status_code,
+                         400)
+
+    def test_removed_members_stop_following(self):
+        self.project.auto_follow = ['assignee', 'commenter']
+        self.project.save()
+        Comment.objects.create(task=self.task, author=self.reviewer, content='Watching')
+        followers.follow(self.reviewer, [self.other.id])
+        self.assertEqual(self.followers(), {self.dev.id, self.reviewer.id})
+        self.assertEqual(self.followers(self.other), {self.dev.id, self.reviewer.id})
+
+        self.client.force_authenticate(self.manager)
+        self.client.post(reverse('project-remove-members', args=[self.project.id]),
+                         {'user_ids': [self.reviewer.id]}, format='json')
+        self.project.members.remove(self.dev)
+        self.assertEqual(self.followers(), set())
+        self.assertEqual(self.followers(self.other), set())
+        self.client.patch(reverse('task-detail', args=[self.task.id]), {'status': 'done'}, format='json')
+        self.assertFalse(Notification.objects.filter(task=self.task).exists())
+
+        self.client.post(reverse('project-add-members', args=[self.project.id]),
+                         {'user_ids': [self.reviewer.id]}, format='json')
+        self.assertEqual(self.followers(), {self.reviewer.id})
+
+
+class SharedCacheCheckTests(SimpleTestCase):
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_process_local_cache_is_flagged_for_deployment(self):
+        self.assertEqual([message.id for message in checks.check_shared_cache(None)], ['api.W001'])
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+                                           'LOCATION': 'redis://cache:6379/0'}})
+    def test_shared_cache_passes(self):
+        self.assertEqual(checks.check_shared_cache(None), [])
+
+
+class PerformanceFixtureMixin:
+    """
+    A medium-sized project for the query-budget suite. ``populate`` can be
+    called again on the same fixture to grow every table the endpoints read.
+    """
+    def create_fixture(self):
+        self.lead = User.objects.create_user(username='perf-lead', password='pass123', is_staff=True)
+        # Every auto-follow rule on, so follower lookups take their longest path
+        self.project = Project.objects.create(name='Perf', manager=self.lead,
+                                              auto_follow=['assignee', 'commenter', 'manager'])
+        self.project.members.add(self.lead)
+        self.webhook = WebhookSubscription.objects.create(project=self.project, url='https://hooks.example.com/perf',
+                                                          created_by=self.lead)
+        self.tasks = []
+        self.populate(1)
+        self.quiet_task, self.busy_task = self.tasks[0], self.tasks[1]
+        self.comment = Comment.objects.filter(task=self.busy_task).earliest('id')
+        self.notification = Notification.objects.filter(user=self.lead).earliest('id')
+        self.deletion = ProjectDeletion.objects.filter(requested_by=self.lead).earliest('id')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.lead)}')
+
+        reports = tempfile.TemporaryDirectory()
+        self.addCleanup(reports.cleanup)
+        overrides = override_settings(PROFILING_DIR=reports.name)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.profile_id = 'f' * 32
+        with open(os.path.join(reports.name, f'{self.profile_id}.json'), 'w') as fh:
+            json.dump({'path': '/api/tasks/', 'queries': []}, fh)
+
+    def populate(self, scale):
+        start = len(self.tasks)
+        members = User.objects.bulk_create([
+            User(username=f'perf-member-{start}-{i}', password='!') for i in range(4 * scale)
+        ])
+        self.project.members.add(*members)
+        assignees = [self.lead] + members
+        statuses = [choice for choice, _ in Task.STATUS_CHOICES]
+        count = 12 * scale
+        positions = [self.tasks[-1].position] if self.tasks else [None]
+        for _ in range(count):
+            positions.append(key_between(positions[-1], None))
+        # The first third of the new tasks extend one long dependency chain
+        chain = [self.tasks[self.chain_end]] if self.tasks else []
+        ranked = len(chain) and chain[0].dependency_rank + 1
+        new_tasks = Task.objects.bulk_create([
+            Task(title=f'Perf task {start + i}', description='y' * 200, project=self.project,
+                 assigned_to=assignees[i % len(assignees)], status=statuses[i % len(statuses)],
+                 position=positions[i + 1], due_date=timezone.localdate() + timedelta(days=i),
+                 dependency_rank=ranked + i if i < 4 * scale else None)
+            for i in range(count)
+        ])
+        chain += new_tasks[:4 * scale]
+        TaskDependency.objects.bulk_create([
+            TaskDependency(project=self.project, task=blocked, blocked_by=blocker, created_by=self.lead)
+            for blocker, blocked in zip(chain, chain[1:])
+        ])
+        self.tasks += new_tasks
+        self.chain_end = start + 4 * scale - 1
+
+        # The busy task gains followers with every call; the quiet one never has any
+        TaskFollower.objects.bulk_create([TaskFollower(user=member, task=self.tasks[1]) for member in members])
+        Comment.objects.bulk_create([
+            Comment(task=task, project=self.project, author=assignees[i % len(assignees)], content=f'note {i}')
+            for task in [self.tasks[1]] + new_tasks for i in range(3 * scale)
+        ])
+        TaskLog.objects.bulk_create([
+            TaskLog(task=task, project=self.project, changed_by=self.lead, field_changed='status',
+                    old_value=old, new_value=new)
+            for task in new_tasks for old, new in [('todo', 'in_progress'), ('in_progress', 'done')]
+        ])
+        Notification.objects.bulk_create([
+            Notification(user=self.lead, task=self.tasks[1], message=f'Perf notification {i}')
+            for i in range(5 * scale)
+        ])
+        WebhookDelivery.objects.bulk_create([
+            WebhookDelivery(subscription=self.webhook, event='task.updated', payload={'n': i},
+                            next_attempt_at=timezone.now())
+            for i in range(3 * scale)
+        ])
+        ProjectDeletion.objects.bulk_create([
+            ProjectDeletion(project_id=10 ** 9 + start + i, project_name=f'Gone {i}', requested_by=self.lead)
+            for i in range(scale)
+        ])
+        archived = TaskArchive.objects.bulk_create([
+            TaskArchive(original_id=10 ** 9 + start + i, project=self.project, title=f'Archived {start + i}',
+                        status='done', assigned_to_id=assignees[i % len(assignees)].id,
+                        follower_ids=[member.id for member in members],
+                        created_at=timezone.now(), updated_at=timezone.now())
+            for i in range(2 * scale)
+        ])
+        CommentArchive.objects.bulk_create([
+            CommentArchive(original_id=10 ** 9 + archive.original_id * 100 + i, task=archive, author_id=self.lead.id,
+                           content=f'old note {i}', created_at=timezone.now(), updated_at=timezone.now())
+            for archive in archived for i in range(3 * scale)
+        ])
+        TaskLogArchive.objects.bulk_create([
+            TaskLogArchive(original_id=10 ** 9 + archive.original_id * 100 + i, task=archive, field_changed='status',
+                           old_value='todo', new_value='done', changed_by_id=self.lead.id, timestamp=timezone.now())
+            for archive in archived for i in range(2 * scale)
+        ])
+        self.archived = getattr(self, 'archived', []) + archived
+
+
+@tag('performance')
+class QueryBudgetTests(PerformanceFixtureMixin, APITestCase):
+    """
+    Every route in ``api.urls`` runs within a fixed number of queries, and
+    rendering a response stays under a time bound per serialized row. Run on
+    its own with ``python manage.py test api --tag performance``.
+    """
+    # Seconds per request plus seconds per serialized row, generous enough for a slow CI machine
+    REQUEST_TIME_BUDGET = 0.5
+    ROW_TIME_BUDGET = 0.005
+    # Routes checked elsewhere, with the reason
+    EXEMPT = {}
+
+    def setUp(self):
+        self.create_fixture()
+
+    def cases(self):
+        """``(label, route name, method, url args, data, query budget)``"""
+        project, quiet, busy = self.project.id, self.quiet_task.id, self.busy_task.id
+        blocker, blocked = self.tasks[2].id, self.tasks[3].id
+        free = self.tasks[-1].id
+        archived = self.archived[0].original_id
+        member = self.project.members.exclude(pk=self.lead.pk).order_by('id').first().id
+        return [
+            ('api root', 'api-root', 'get', [], None, 1),
+            ('health', 'health-check', 'get', [], None, 1),
+            ('register', 'register', 'post', [], {'username': 'newbie', 'password': 'pass123'}, 3),
+            ('bulk provisioning', 'user-bulk-provision', 'post', [],
+             {'users': [{'username': f'bulk-{i}', 'password': 'pass123', 'projects': [project]} for i in range(3)]}, 8),
+            ('dashboard', 'dashboard', 'get', [], None, 8),
+            ('sync', 'sync', 'get', [], {'since': 0}, 3),
+            ('batch', 'batch', 'post', [], {'requests': [{'path': '/api/tasks/'}]}, 3),
+            ('profiling token', 'profiling-token', 'post', [], None, 1),
+            ('profile report', 'profile-report', 'get', [self.profile_id], None, 1),
+            ('task logs', 'task-logs', 'get', [busy], None, 5),
+            ('notifications', 'notifications', 'get', [], None, 2),
+            ('mark as read', 'mark-as-read', 'post', [self.notification.id], None, 3),
+            ('follow', 'task-follow', 'post', [quiet], None, 7),
+            ('unfollow', 'task-unfollow', 'post', [busy], None, 11),
+            ('bulk follow', 'task-bulk-follow', 'post', [], {'task_ids': [quiet, busy, free, 999999]}, 6),
+            ('bulk unfollow', 'task-bulk-unfollow', 'post', [], {'task_ids': [quiet, busy, free]}, 10),
+            ('project list', 'project-list', 'get', [], None, 5),
+            ('project create', 'project-list', 'post', [], {'name': 'Another'}, 15),
+            ('project detail', 'project-detail', 'get', [project], None, 10),
+            ('project update', 'project-detail', 'patch', [project], {'description': 'Renamed'}, 12),
+            ('project delete', 'project-detail', 'delete', [project], None, 13),
+            ('members, small page', 'project-members', 'get', [project], {'page_size': 2}, 4),
+            ('members, large page', 'project-members', 'get', [project], {'page_size': 100}, 4),
+            ('add members', 'project-add-members', 'post', [project], {'user_ids': [member]}, 7),
+            ('remove members', 'project-remove-members', 'post', [project], {'user_ids': [member]}, 8),
+            ('analytics', 'project-analytics', 'get', [project], None, 10),
+            ('analytics report', 'project-analytics-report', 'get', [project, 'workload'], None, 10),
+            ('project activity, small page', 'project-activity', 'get', [project], {'page_size': 5}, 5),
+            ('project activity, large page', 'project-activity', 'get', [project], {'page_size': 200}, 5),
+            ('dependency order', 'project-dependency-order', 'get', [project], None, 5),
+            ('blocked tasks', 'project-blocked-tasks', 'get', [project], None, 5),
+            ('ready tasks', 'project-ready-tasks', 'get', [project], None, 5),
+            ('critical path', 'project-critical-path', 'get', [project], None, 5),
+            ('archived tasks', 'project-archived-tasks', 'get', [project], None, 5),
+            ('archived task', 'project-archived-task', 'get', [project, archived], None, 6),
+            ('unarchive', 'project-unarchive', 'post', [project], {'task_ids': [archived]}, 24),
+            ('task detail, archived', 'task-detail', 'get', [archived], {'include_archived': 1}, 3),
+            ('deletion list', 'project-deletion-list', 'get', [], None, 3),
+            ('deletion detail', 'project-deletion-detail', 'get', [self.deletion.id], None, 2),
+            ('task list', 'task-list', 'get', [], None, 3),
+            ('task list, board column', 'task-list', 'get', [],
+             {'project': project, 'status': 'todo', 'ordering': 'position'}, 4),
+            ('task list, sparse', 'task-list', 'get', [], {'fields': 'id,title,assigned_to', 'expand': 'assigned_to'}, 3),
+            ('task create', 'task-list', 'post', [], {'title': 'New', 'project': project, 'assigned_to': member}, 11),
+            ('task detail, no followers', 'task-detail', 'get', [quiet], None, 8),
+            ('task detail, followed', 'task-detail', 'get', [busy], None, 8),
+            ('task update, no followers', 'task-detail', 'patch', [quiet], {'status': 'done', 'title': 'Quiet'}, 19),
+            ('task update, followed', 'task-detail', 'patch', [busy], {'status': 'done', 'title': 'Busy'}, 21),
+            ('task delete', 'task-detail', 'delete', [busy], None, 15),
+            ('task move', 'task-move', 'post', [free], {'after': quiet, 'status': self.quiet_task.status}, 20),
+            ('task comments, small page', 'task-comments', 'get', [busy], {'page_size': 5}, 4),
+            ('task comments, large page', 'task-comments', 'get', [busy], {'page_size': 200}, 4),
+            ('task activity', 'task-activity', 'get', [busy], None, 5),
+            ('task dependencies', 'task-dependencies', 'get', [blocked], None, 5),
+            ('add dependency', 'task-dependencies', 'post', [free], {'blocked_by': quiet}, 16),
+            ('remove dependency', 'task-remove-dependency', 'delete', [blocked, blocker], None, 6),
+            ('comment list', 'comment-list', 'get', [], None, 3),
+            ('comment on quiet task', 'comment-list', 'post', [], {'task': quiet, 'content': 'Hi'}, 12),
+            ('comment on followed task', 'comment-list', 'post', [], {'task': busy, 'content': 'Hi'}, 12),
+            ('comment detail', 'comment-detail', 'get', [self.comment.id], None, 4),
+            ('comment update', 'comment-detail', 'patch', [self.comment.id], {'content': 'Edited'}, 6),
+            ('comment delete', 'comment-detail', 'delete', [self.comment.id], None, 6),
+            ('webhook list', 'webhook-list', 'get', [], None, 3),
+            ('webhook create', 'webhook-list', 'post', [],
+             {'project': project, 'url': 'https://hooks.example.com/new', 'events': ['comment.created']}, 3),
+            ('webhook detail', 'webhook-detail', 'get', [self.webhook.id], None, 2),
+            ('webhook update', 'webhook-detail', 'patch', [self.webhook.id], {'is_active': False}, 3),
+            ('webhook delete', 'webhook-detail', 'delete', [self.webhook.id], None, 4),
+            ('webhook deliveries', 'webhook-deliveries', 'get', [self.webhook.id], None, 3),
+        ]
+
+    def measure(self, route, method, args, data):
+        """``(response, queries, seconds)`` for one call; writes are rolled back afterwards"""
+        cache.clear()
+        url = reverse(route, args=args)
+        with transaction.atomic():
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                if method == 'get':
+                    response = self.client.get(url, data)
+                else:
+                    response = getattr(self.client, method)(url, data, format='json')
+                elapsed = time.perf_counter() - started
+            transaction.set_rollback(True)
+        self.assertLess(response.status_code, 400, f'{method.upper()} {url}: {response.data}')
+        return response, len(queries), elapsed
+
+    @staticmethod
+    def serialized_rows(data):
+        if isinstance(data, dict) and isinstance(data.get('results'), list):
+            return len(data['results'])
+        if isinstance(data, list):
+            return len(data)
+        return 0
+
+    def test_every_route_has_a_budget(self):
+        names = set()
+        patterns = list(get_resolver('api.urls').url_patterns)
+        while patterns:
+            pattern = patterns.pop()
+            if hasattr(pattern, 'url_patterns'):
+                patterns.extend(pattern.url_patterns)
+            elif pattern.name:
+                names.add(pattern.name)
+        covered = {route for _, route, *_ in self.cases()} | set(self.EXEMPT)
+        self.assertEqual(sorted(names - covered), [])
+
+    def test_query_budgets(self):
+        for label, route, method, args, data, budget in self.cases():
+            with self.subTest(label):
+                response, queries, elapsed = self.measure(route, method, args, data)
+                self.assertLessEqual(queries, budget)
+                # Only responses that serialize rows; password hashing alone outlasts the bound
+                rows = self.serialized_rows(response.data)
+                if rows:
+                    self.assertLess(elapsed, self.REQUEST_TIME_BUDGET + rows * self.ROW_TIME_BUDGET,
+                                    f'{rows} rows')
+
+    def test_query_counts_do_not_grow_with_data(self):
+        before = {label: self.measure(route, method, args, data)[1]
+                  for label, route, method, args, data, _ in self.cases()}
+        # Four times the members, tasks, followers, comments, logs and notifications
+        self.populate(3)
+        for label, route, method, args, data, _ in self.cases():
+            with self.subTest(label):
+                self.assertEqual(self.measure(route, method, args, data)[1], before[label])
@@ -1,28 +1,59 @@
-from django.urls import path, include
+from django.conf import settings
+from django.urls import path, re_path, include
 from rest_framework.routers import DefaultRouter
+from .batch import BatchView
 from .views import (
     ProjectViewSet,
+    ProjectDeletionViewSet,
     RegisterView,
+    ProvisionUsersView,
     TaskViewSet,
     CommentViewSet,
     TaskLogViewSet,
     NotificationViewSet,
     TaskFollowViewSet,
+    DashboardView,
+    SyncView,
+    WebhookSubscriptionViewSet,
+    ProfilingTokenView,
+    ProfileReportView,
     health_check
 )
 
 router = DefaultRouter()
 router.register(r'projects', ProjectViewSet, basename='project')
+router.register(r'project-deletions', ProjectDeletionViewSet, basename='project-deletion')
 router.register(r'tasks', TaskViewSet, basename='task')
 router.register(r'comments', CommentViewSet, basename='comment')
+router.register(r'webhooks', WebhookSubscriptionViewSet, basename='webhook')
 
 urlpatterns = [
+    # Ahead of the router, whose task detail route would otherwise match these
+    path('tasks/follow/', TaskFollowViewSet.as_view({'post': 'bulk_follow'}), name='task-bulk-follow'),
+    path('tasks/unfollow/', TaskFollowViewSet.as_view({'post': 'bulk_unfollow'}), name='task-bulk-unfollow'),
     path('', include(router.urls)),
     path('health/', health_check, name='health-check'),
     path('register/', RegisterView.as_view(), name='register'),
+    path('users/bulk/', ProvisionUsersView.as_view(), name='user-bulk-provision'),
+    path('me/dashboard/', DashboardView.as_view(), name='dashboard'),
+    path('sync/', SyncView.as_view(), name='sync'),
+    path('batch/', BatchView.as_view(), name='batch'),
+    path('profiling/token/', ProfilingTokenView.as_view(), name='profiling-token'),
+    re_path(r'^profiling/(?P<profile_id>[0-9a-f]{32})/$', ProfileReportView.as_view(), name='profile-report'),
     path('logs/<int:task_id>/', TaskLogViewSet.as_view({'get': 'list'}), name='task-logs'),
     path('notifications/', NotificationViewSet.as_view({'get': 'list'}), name='notifications'),
     path('notifications/<int:pk>/mark-as-read/', NotificationViewSet.as_view({'post': 'mark_as_read'}), name='mark-as-read'),
     path('tasks/<int:pk>/follow/', TaskFollowViewSet.as_view({'post': 'follow'}), name='task-follow'),
     path('tasks/<int:pk>/unfollow/', TaskFollowViewSet.as_view({'post': 'unfollow'}), name='task-unfollow'),
 ]
+
+if settings.ASYNC_READ_VIEWS:
+    # ASGI profile: the read-heavy endpoints are served by async views, which
+    # hand non-GET methods back to the viewsets above.
+    from . import async_views
+
+    urlpatterns = [
+        path('notifications/', async_views.notification_list),
+        path('tasks/', async_views.task_list),
+        path('projects/<int:pk>/', async_views.project_detail),
+    ] + urlpatterns
@@ -1,9 +1,28 @@
 from rest_framework import viewsets, permissions, generics, filters, status
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
-from rest_framework.exceptions import PermissionDenied
-from django.db import connection
-from .models import Project, Task, Comment, TaskLog, Notification, TaskFollower
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.views import APIView
+import json
+import os
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.http import FileResponse, Http404
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from . import activity, analytics, archive, dashboard, followers, idempotency, profiling, webhooks
+from .provisioning import provision_users
+from .deletion import request_project_deletion
+from .dependencies import DependencyCycle, DependencyGraph, add_dependency
+from .error_handlers import error_response
+from .pagination import MemberCursorPagination
+from .positions import MAX_LENGTH as POSITION_MAX_LENGTH, key_between
+from .models import (
+    Project, Task, Comment, TaskLog, Notification, ChangeEvent, ProjectDeletion,
+    WebhookSubscription, TaskDependency, TaskArchive,
+)
 from .serializers import (
     ProjectSerializer,
     ProjectListSerializer,
@@ -13,12 +32,30 @@ from .serializers import (
     CommentSerializer,
     TaskLogSerializer,
     NotificationSerializer,
-    TaskFollowerSerializer
+    ProjectSyncSerializer,
+    TaskSyncSerializer,
+    CommentSyncSerializer,
+    MemberIdsSerializer,
+    UserSerializer,
+    ProjectDeletionSerializer,
+    WebhookSubscriptionSerializer,
+    WebhookDeliverySerializer,
+    ProvisionUsersSerializer,
+    TaskMoveSerializer,
+    AnalyticsQuerySerializer,
+    TaskDependencySerializer,
+    ArchiveQuerySerializer,
+    UnarchiveSerializer,
+    TaskArchiveSerializer,
+    TaskArchiveDetailSerializer,
+    FollowTasksSerializer
 )
 
 from django.contrib.auth.models import User
-from rest_framework.permissions import IsAuthenticated, AllowAny
-from .permissions import IsProjectManagerOrReadOnly, IsTaskOwnerOrProjectManager, IsCommentAuthorOrReadOnly
+from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
+from .permissions import (
+    IsProjectManagerOrReadOnly, IsTaskOwnerOrProjectManager, IsCommentAuthorOrReadOnly, is_project_member,
+)
 from django_filters.rest_framework import DjangoFilterBackend
 
 
@@ -42,11 +79,73 @@ def health_check(request):
     })
 
 
+class SparseFieldsetMixin:
+    """Trim read querysets to what the requested serializer fields actually use"""
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        serializer_class = self.get_serializer_class()
+        if self.request.method in permissions.SAFE_METHODS and hasattr(serializer_class, 'setup_queryset'):
+            queryset = serializer_class.setup_queryset(queryset, self.request)
+        return queryset
+
+
+class IdempotentWriteMixin:
+    """Replay the first response when a write is retried with the same Idempotency-Key"""
+    idempotency_record = None
+
+    def initialize_request(self, request, *args, **kwargs):
+        if request.headers.get(idempotency.HEADER) and request.method in idempotency.METHODS:
+            # Keep the raw bytes for the fingerprint before a parser consumes the stream
+            request.body
+        return super().initialize_request(request, *args, **kwargs)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        key = request.headers.get(idempotency.HEADER)
+        if key and request.method in idempotency.METHODS and request.user.is_authenticated:
+            fingerprint = idempotency.request_fingerprint(request)
+            self.idempotency_record, replay = idempotency.claim(request.user, key, fingerprint)
+            if replay is not None:
+                raise idempotency.Replay(replay)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, idempotency.Replay):
+            return Response(exc.record.response_body, status=exc.record.status_code,
+                            headers={'Idempotent-Replayed': 'true'})
+        try:
+            return super().handle_exception(exc)
+        except Exception:
+            if self.idempotency_record is not None:
+                idempotency.release(self.idempotency_record)
+            raise
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if self.idempotency_record is not None:
+            idempotency.complete(self.idempotency_record, response)
+            self.idempotency_record = None
+        return response
+
+
 class RegisterView(generics.CreateAPIView):
     queryset = User.objects.all()
     serializer_class = RegisterSerializer
 
-class ProjectViewSet(viewsets.ModelViewSet):
+class ProvisionUsersView(APIView):
+    """Create many accounts at once; invalid rows are reported without blocking the others"""
+    permission_classes = [IsAdminUser]
+
+    def post(self, request):
+        serializer = ProvisionUsersSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        created, errors = provision_users(serializer.validated_data['users'])
+        return Response(
+            {'created': len(created), 'failed': len(errors), 'users': created, 'errors': errors},
+            status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST,
+        )
+
+class ProjectViewSet(IdempotentWriteMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = Project.objects.all()
     serializer_class = ProjectSerializer
     permission_classes = [IsAuthenticated, IsProjectManagerOrReadOnly]
@@ -66,7 +165,208 @@ class ProjectViewSet(viewsets.ModelViewSet):
         # Show only projects where the user is a member
         return Project.objects.filter(members=self.request.user)
 
-class TaskViewSet(viewsets.ModelViewSet):
+    def perform_update(self, serializer):
+        rules = serializer.instance.auto_follow
+        project = serializer.save()
+        if project.auto_follow != rules:
+            followers.forget_project(project.id)
+
+    @action(detail=True, methods=['get'], pagination_class=MemberCursorPagination)
+    def members(self, request, pk=None):
+        """Cursor-paginated member list; ``?search=`` matches username, email and name"""
+        project = self.get_object()
+        queryset = User.objects.filter(projects=project)
+        search = request.query_params.get('search')
+        if search:
+            queryset = queryset.filter(
+                Q(username__icontains=search) | Q(email__icontains=search) |
+                Q(first_name__icontains=search) | Q(last_name__icontains=search)
+            )
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response(UserSerializer(page, many=True).data)
+
+    @action(detail=True, methods=['get'], url_path='analytics', url_name='analytics')
+    def analytics_summary(self, request, pk=None):
+        """Every flow report at once; ``?weeks=`` and ``?days=`` set the windows"""
+        return self._analytics_response(None)
+
+    @action(detail=True, methods=['get'],
+            url_path=r'analytics/(?P<report>{})'.format('|'.join(analytics.REPORT_NAMES)))
+    def analytics_report(self, request, pk=None, report=None):
+        """A single report: dwell-times, cycle-times, throughput, burndown or workload"""
+        return self._analytics_response(report)
+
+    def _analytics_response(self, name):
+        project = self.get_object()
+        query = AnalyticsQuerySerializer(data=self.request.query_params)
+        query.is_valid(raise_exception=True)
+        return Response(analytics.report(project.id, name, **query.validated_data))
+
+    @action(detail=True, methods=['get'], url_path='activity', url_name='activity')
+    def activity_feed(self, request, pk=None):
+        """Comments and change log of every task in the project, newest first; ``?type=``, ``?user=``, ``?task=``"""
+        project = self.get_object()
+        scope = {'project_id': project.id}
+        if request.query_params.get('task'):
+            try:
+                scope['task_id'] = int(request.query_params['task'])
+            except ValueError:
+                raise ValidationError({'task': ['A valid integer is required.']})
+        return Response(activity.feed(request, scope))
+
+    @action(detail=True, methods=['get'], url_path='dependencies/order')
+    def dependency_order(self, request, pk=None):
+        """All tasks, each after the tasks blocking it (earliest due date first among the rest)"""
+        graph = DependencyGraph.load(self.get_object().id)
+        return self._paginated_tasks(graph.topological_order(), graph.task)
+
+    @action(detail=True, methods=['get'], url_path='dependencies/blocked')
+    def blocked_tasks(self, request, pk=None):
+        """Unfinished tasks waiting on an unfinished blocker, with the blockers' ids"""
+        graph = DependencyGraph.load(self.get_object().id)
+        return self._paginated_tasks(graph.blocked(), graph.blocked_task)
+
+    @action(detail=True, methods=['get'], url_path='dependencies/ready')
+    def ready_tasks(self, request, pk=None):
+        """Unfinished tasks with nothing left blocking them, earliest due date first"""
+        graph = DependencyGraph.load(self.get_object().id)
+        return self._paginated_tasks(graph.ready(), graph.task)
+
+    @action(detail=True, methods=['get'], url_path='dependencies/critical-path')
+    def critical_path(self, request, pk=None):
+        """Longest chain of unfinished tasks, with deadlines tightened by what they block"""
+        path = DependencyGraph.load(self.get_object().id).critical_path()
+        return Response({'length': len(path), 'tasks': path})
+
+    def _paginated_tasks(self, indexes, render):
+        # Graph queries yield task indexes; only the requested page is rendered
+        page = self.paginate_queryset(indexes)
+        return self.get_paginated_response([render(i) for i in page])
+
+    @action(detail=True, methods=['get'], url_path='archived-tasks')
+    def archived_tasks(self, request, pk=None):
+        """Done tasks moved to the archive by ``manage.py archive_tasks``, most recently updated first"""
+        project = self.get_object()
+        page = self.paginate_queryset(TaskArchive.objects.filter(project=project).order_by('-updated_at', '-id'))
+        return self.get_paginated_response(TaskArchiveSerializer(page, many=True).data)
+
+    @action(detail=True, methods=['get'], url_path=r'archived-tasks/(?P<task_id>\d+)')
+    def archived_task(self, request, pk=None, task_id=None):
+        """One archived task, by the id it had as a live task, with its comments and change log"""
+        project = self.get_object()
+        queryset = TaskArchive.objects.prefetch_related('comments', 'logs')
+        return Response(TaskArchiveDetailSerializer(
+            get_object_or_404(queryset, project=project, original_id=task_id)).data)
+
+    @action(detail=True, methods=['post'])
+    def unarchive(self, request, pk=None):
+        """Move archived tasks back to the board (end of the done column), with their comments and log"""
+        project = self.get_object()
+        serializer = UnarchiveSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        task_ids = set(serializer.validated_data['task_ids'])
+        restored = archive.unarchive(project.id, task_ids, batch_size=settings.ARCHIVE_BATCH_SIZE)
+        return Response({'restored': sorted(restored), 'not_found': sorted(task_ids - set(restored))})
+
+    @action(detail=True, methods=['post'], url_path='members/add')
+    def add_members(self, request, pk=None):
+        """Add many users in a single INSERT into the membership table"""
+        project = self.get_object()
+        user_ids = self._member_ids(request)
+        found = set(User.objects.filter(id__in=user_ids).values_list('id', flat=True))
+
+        Membership = Project.members.through
+        joined = found - set(Membership.objects.filter(project_id=project.id, user_id__in=found)
+                             .values_list('user_id', flat=True))
+        Membership.objects.bulk_create(
+            [Membership(project_id=project.id, user_id=user_id) for user_id in sorted(joined)],
+            ignore_conflicts=True,
+        )
+        self._record_membership_change(project, joined)
+        # A returning member's comments and follows count again
+        followers.forget_project(project.id)
+        return Response({'added': sorted(found), 'not_found': sorted(set(user_ids) - found)})
+
+    @action(detail=True, methods=['post'], url_path='members/remove')
+    def remove_members(self, request, pk=None):
+        """Remove many users in a single DELETE; the manager always stays a member"""
+        project = self.get_object()
+        user_ids = self._member_ids(request)
+        memberships = (
+            Project.members.through.objects
+            .filter(project_id=project.id, user_id__in=user_ids)
+            .exclude(user_id=project.manager_id)
+        )
+        with transaction.atomic():
+            removed_ids = list(memberships.values_list('user_id', flat=True))
+            removed, _ = memberships.filter(user_id__in=removed_ids).delete()
+            # The remaining members see a change, the removed ones a tombstone of their own
+            ChangeEvent.objects.bulk_create(
+                [ChangeEvent(model='project', object_id=project.id, project_id=project.id)]
+                + ChangeEvent.revocations(project.id, removed_ids)
+            )
+        if removed:
+            followers.forget_project(project.id)
+        return Response({'removed': removed})
+
+    def destroy(self, request, *args, **kwargs):
+        """
+        Hide the project immediately and leave the physical delete to
+        ``manage.py process_deletions``; progress is at /api/project-deletions/.
+        """
+        project = self.get_object()
+        deletion = request_project_deletion(project, request.user)
+        return Response(ProjectDeletionSerializer(deletion).data, status=status.HTTP_202_ACCEPTED)
+
+    def _member_ids(self, request):
+        serializer = MemberIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return set(serializer.validated_data['user_ids'])
+
+    def _record_membership_change(self, project, joined):
+        # Bulk writes to the through table bypass m2m_changed, so feed the
+        # sync log directly; new members get an event of their own.
+        ChangeEvent.objects.bulk_create(
+            [ChangeEvent(model='project', object_id=project.id, project_id=project.id)]
+            + ChangeEvent.grants(project.id, joined)
+        )
+
+class ProjectDeletionViewSet(viewsets.ReadOnlyModelViewSet):
+    """Deletions requested by the current user and how far along they are"""
+    serializer_class = ProjectDeletionSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return ProjectDeletion.objects.filter(requested_by=self.request.user)
+
+
+class WebhookSubscriptionViewSet(viewsets.ModelViewSet):
+    """Webhook endpoints for the projects the current user manages"""
+    serializer_class = WebhookSubscriptionSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return WebhookSubscription.objects.filter(project__manager=self.request.user).order_by('id')
+
+    def perform_create(self, serializer):
+        if serializer.validated_data['project'].manager_id != self.request.user.id:
+            raise PermissionDenied("Only the project manager can add webhooks.")
+        serializer.save(created_by=self.request.user)
+
+    def perform_update(self, serializer):
+        project = serializer.validated_data.get('project')
+        if project is not None and project.manager_id != self.request.user.id:
+            raise PermissionDenied("Only the project manager can add webhooks.")
+        serializer.save()
+
+    @action(detail=True, methods=['get'])
+    def deliveries(self, request, pk=None):
+        """Most recent deliveries, to debug a failing endpoint"""
+        deliveries = self.get_object().deliveries.order_by('-id')[:settings.WEBHOOK_RECENT_DELIVERIES]
+        return Response(WebhookDeliverySerializer(deliveries, many=True).data)
+
+
+class TaskViewSet(IdempotentWriteMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = Task.objects.all()
     serializer_class = TaskSerializer
     permission_classes = [permissions.IsAuthenticated, IsTaskOwnerOrProjectManager]
@@ -74,7 +374,8 @@ class TaskViewSet(viewsets.ModelViewSet):
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['status', 'due_date', 'assigned_to', 'project']
     search_fields = ['title', 'description']
-    ordering_fields = ['created_at', 'due_date', 'status']
+    # ``position`` orders a board column; combine with ?project=&status=
+    ordering_fields = ['created_at', 'due_date', 'status', 'position']
     ordering = ['-created_at']  # Default ordering
 
     def get_queryset(self):
@@ -93,6 +394,19 @@ class TaskViewSet(viewsets.ModelViewSet):
         context['request'] = self.request
         return context
 
+    def retrieve(self, request, *args, **kwargs):
+        """``?include_archived=1`` also finds a task that was moved to the archive"""
+        try:
+            return super().retrieve(request, *args, **kwargs)
+        except Http404:
+            query = ArchiveQuerySerializer(data=request.query_params)
+            query.is_valid(raise_exception=True)
+            if not query.validated_data['include_archived']:
+                raise
+        archived = get_object_or_404(TaskArchive.objects.filter(project__members=request.user),
+                                     original_id=kwargs['pk'])
+        return Response(TaskArchiveSerializer(archived).data)
+
     def perform_create(self, serializer):
         project = serializer.validated_data['project']
         if project.manager != self.request.user:
@@ -109,11 +423,45 @@ class TaskViewSet(viewsets.ModelViewSet):
             raise permissions.PermissionDenied("You do not have permission to update this task.")
 
         old_values = {field: getattr(task, field) for field in ['status', 'description', 'assigned_to']}
-        new_instance = serializer.save()
-        new_values = {field: getattr(new_instance, field) for field in ['status', 'description', 'assigned_to']}
-
+        new_status = serializer.validated_data.get('status', task.status)
+        new_project = serializer.validated_data.get('project', project)
+        if new_project.id != project.id:
+            # Dependencies never cross projects
+            TaskDependency.objects.filter(Q(task=task) | Q(blocked_by=task)).delete()
+            serializer.validated_data['dependency_rank'] = None
+            # Members of the old project only see the task and its comments
+            # leave; the comments' move skips the signals, so the new project's
+            # members hear about them here too
+            comment_ids = list(Comment.objects.filter(task=task).values_list('id', flat=True))
+            ChangeEvent.objects.bulk_create(
+                [ChangeEvent(model='task', object_id=task.id, project_id=project.id, deleted=True)]
+                + [ChangeEvent(model='comment', object_id=pk, project_id=project.id, deleted=True)
+                   for pk in comment_ids]
+                + [ChangeEvent(model='comment', object_id=pk, project_id=new_project.id) for pk in comment_ids]
+            )
+            # Keep the activity feeds' project copies in step
+            Comment.objects.filter(task=task).update(project=new_project)
+            TaskLog.objects.filter(task=task).update(project=new_project)
+        if (new_project.id, new_status) != (project.id, task.status):
+            # Entering another column: go to its end
+            new_instance = serializer.save(position=Task.end_of_column(new_project.id, new_status, exclude=task.pk))
+        else:
+            new_instance = serializer.save()
+        self._record_changes(new_instance, old_values, user)
+
+    def _record_changes(self, new_instance, old_values, user):
+        """Task log, follower notifications and webhooks for the fields that changed"""
+        new_values = {field: getattr(new_instance, field) for field in old_values}
+
+        changes = []
+        recipients = None
         for field in old_values:
             if old_values[field] != new_values[field]:
+                changes.append({
+                    'field': field,
+                    'old': getattr(old_values[field], 'pk', old_values[field]),
+                    'new': getattr(new_values[field], 'pk', new_values[field]),
+                })
                 TaskLog.objects.create(
                     task=new_instance,
                     changed_by=user,
@@ -123,55 +471,183 @@ class TaskViewSet(viewsets.ModelViewSet):
                 )
 
                 # Send notifications to followers
-                followers = TaskFollower.objects.filter(task=new_instance).exclude(user=user)
-                for follower in followers:
-                    Notification.objects.create(
-                        user=follower.user,
+                if recipients is None:
+                    recipients = sorted(followers.followers_of(new_instance) - {user.id})
+                Notification.objects.bulk_create([
+                    Notification(
+                        user_id=follower,
                         message=f"Task '{new_instance.title}' was updated: {field} changed.",
                         task=new_instance
                     )
+                    for follower in recipients
+                ])
 
-class CommentViewSet(viewsets.ModelViewSet):
+        if changes:
+            webhooks.enqueue(new_instance.project_id, 'task.updated', {
+                'task': TaskSyncSerializer(new_instance).data,
+                'changes': changes,
+                'changed_by': user.id,
+            })
+
+    @action(detail=True, methods=['post'])
+    def move(self, request, pk=None):
+        """
+        Reorder a task on the board. ``after``/``before`` name the task that
+        should end up directly above/below it, ``status`` the target column
+        (default: its current one); with neither neighbour it goes to the end
+        of the column. Only the moved task's row is written.
+        """
+        task = self.get_object()
+        serializer = TaskMoveSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        target_status = data.get('status', task.status)
+        column = Task.objects.filter(project_id=task.project_id, status=target_status).exclude(pk=task.pk)
+
+        key = key_between(*self._slot(column, data))
+        if len(key) > POSITION_MAX_LENGTH:
+            # Drops into one gap used up the column's key length; the next
+            # rebalance_positions run respaces it
+            return error_response('This spot on the board is full until the column is respaced; try again shortly.',
+                                  status_code=status.HTTP_409_CONFLICT)
+
+        old_values = {'status': task.status}
+        task.position = key
+        task.status = target_status
+        task.save(update_fields=['position', 'status', 'updated_at'])
+        if old_values['status'] != target_status:
+            # post_save adjusted the counters from the status read when the
+            # task was loaded, as would a concurrent move of the same task;
+            # rebuild them instead
+            dashboard.forget_many([task.project_id], [task.assigned_to_id])
+        self._record_changes(task, old_values, request.user)
+        return Response(TaskSerializer(task, context=self.get_serializer_context()).data)
+
+    @action(detail=True, methods=['get'], url_path='comments', url_name='comments')
+    def comment_feed(self, request, pk=None):
+        """The task's comments, newest first, cursor-paginated"""
+        task = self.get_object()
+        return Response(activity.feed(request, {'task_id': task.id}, types=['comment']))
+
+    @action(detail=True, methods=['get'], url_path='activity', url_name='activity')
+    def activity_feed(self, request, pk=None):
+        """The task's comments and change log in one stream, newest first"""
+        task = self.get_object()
+        return Response(activity.feed(request, {'task_id': task.id}))
+
+    @action(detail=True, methods=['get', 'post'])
+    def dependencies(self, request, pk=None):
+        """The tasks blocking this one and those it blocks; POST ``{"blocked_by": id}`` adds a blocker"""
+        task = self.get_object()
+        if request.method == 'POST':
+            serializer = TaskDependencySerializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            blocker = Task.objects.filter(pk=serializer.validated_data['blocked_by'],
+                                          project_id=task.project_id).first()
+            if blocker is None:
+                raise ValidationError({'blocked_by': ['Task is not in this project.']})
+            try:
+                _, created = add_dependency(task, blocker, request.user)
+            except DependencyCycle as exc:
+                return error_response('This dependency would create a cycle.', {'cycle': exc.path})
+            if not created:
+                return Response(self._dependency_lists(task))
+            return Response(self._dependency_lists(task), status=status.HTTP_201_CREATED)
+        return Response(self._dependency_lists(task))
+
+    @action(detail=True, methods=['delete'], url_path=r'dependencies/(?P<blocked_by>\d+)')
+    def remove_dependency(self, request, pk=None, blocked_by=None):
+        task = self.get_object()
+        deleted, _ = TaskDependency.objects.filter(task=task, blocked_by_id=blocked_by).delete()
+        if not deleted:
+            raise Http404
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    def _dependency_lists(self, task):
+        context = self.get_serializer_context()
+        blocked_by = Task.objects.filter(dependents__task=task).select_related('assigned_to', 'project')
+        blocking = Task.objects.filter(dependencies__blocked_by=task).select_related('assigned_to', 'project')
+        return {
+            'blocked_by': TaskListSerializer(blocked_by.order_by('id'), many=True, context=context).data,
+            'blocking': TaskListSerializer(blocking.order_by('id'), many=True, context=context).data,
+        }
+
+    def _slot(self, column, data):
+        """The positions the moved task goes between"""
+        above = self._neighbour(column, data.get('after'), 'after')
+        below = self._neighbour(column, data.get('before'), 'before')
+        # Only the anchor is trusted; its actual neighbour is looked up, so a
+        # stale board or tied positions cannot produce an out-of-order key
+        if above is not None:
+            below = column.filter(position__gt=above).order_by('position').values_list('position', flat=True).first()
+        elif below is not None:
+            above = column.filter(position__lt=below).order_by('-position').values_list('position', flat=True).first()
+        else:
+            above = column.order_by('-position').values_list('position', flat=True).first()
+        return above, below
+
+    def _neighbour(self, column, task_id, field):
+        if task_id is None:
+            return None
+        position = column.filter(pk=task_id).values_list('position', flat=True).first()
+        if position is None:
+            raise ValidationError({field: ['Task is not in the target column.']})
+        return position
+
+class CommentViewSet(IdempotentWriteMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     serializer_class = CommentSerializer
     permission_classes = [permissions.IsAuthenticated, IsCommentAuthorOrReadOnly]
 
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filterset_fields = ['task', 'author', 'project']
+    ordering_fields = ['created_at']
+    ordering = ['-created_at', '-id']
+
     def get_queryset(self):
-        return Comment.objects.filter(task__project__members=self.request.user)
+        # Authors are joined by SparseFieldsetMixin when the requested fields need them
+        return Comment.objects.filter(project__members=self.request.user)
 
     def perform_create(self, serializer):
         task = serializer.validated_data['task']
-        if self.request.user not in task.project.members.all():
+        if not is_project_member(self.request.user, task.project_id):
             raise PermissionDenied("Only project members can comment.")
 
         comment = serializer.save(author=self.request.user)
 
         # Send notifications to task followers
-        followers = TaskFollower.objects.filter(task=task).exclude(user=self.request.user)
-        for follower in followers:
-            Notification.objects.create(
-                user=follower.user,
+        recipients = sorted(followers.followers_of(task) - {self.request.user.id})
+        Notification.objects.bulk_create([
+            Notification(
+                user_id=follower,
                 task=task,
                 comment=comment,
                 message=f"New comment on task '{task.title}' by {self.request.user.username}"
             )
+            for follower in recipients
+        ])
 
-class TaskLogViewSet(viewsets.ReadOnlyModelViewSet):
+        webhooks.enqueue(task.project_id, 'comment.created', {
+            'comment': CommentSerializer(comment).data,
+            'project': task.project_id,
+        })
+
+class TaskLogViewSet(SparseFieldsetMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = TaskLogSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        task_id = self.kwargs.get('task_id')
-        task = Task.objects.get(id=task_id)
-        if self.request.user not in task.project.members.all():
+        task = get_object_or_404(Task.objects.only('id', 'project_id'), id=self.kwargs.get('task_id'))
+        if not is_project_member(self.request.user, task.project_id):
             raise PermissionDenied("You are not a member of this task's project.")
-        return TaskLog.objects.filter(task=task)
+        return TaskLog.objects.filter(task=task).order_by('-timestamp', '-id')
 
 class NotificationViewSet(viewsets.ViewSet):
     permission_classes = [permissions.IsAuthenticated]
 
     def list(self, request):
         notifications = Notification.objects.filter(user=request.user).order_by('-created_at')
-        serializer = NotificationSerializer(notifications, many=True)
+        notifications = NotificationSerializer.setup_queryset(notifications, request)
+        serializer = NotificationSerializer(notifications, many=True, context={'request': request})
         return Response(serializer.data)
 
     @action(detail=True, methods=['post'])
@@ -185,16 +661,216 @@ class NotificationViewSet(viewsets.ViewSet):
             return Response({'error': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
 
 
-class TaskFollowViewSet(viewsets.ViewSet):
+class TaskFollowViewSet(IdempotentWriteMixin, viewsets.ViewSet):
+    """Explicit follows on top of the projects' auto-follow rules; see api/followers.py"""
     permission_classes = [permissions.IsAuthenticated]
 
+    def _task(self, request, pk):
+        task = get_object_or_404(Task.objects.only('id', 'project_id'), pk=pk)
+        if not is_project_member(request.user, task.project_id):
+            raise PermissionDenied("You are not a member of this task's project.")
+        return task
+
+    def _task_ids(self, request):
+        """The requested tasks that are in the user's projects, and the rest"""
+        serializer = FollowTasksSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        requested = set(serializer.validated_data['task_ids'])
+        found = set(Task.objects.filter(pk__in=requested, project__members=request.user)
+                    .values_list('pk', flat=True))
+        return sorted(found), sorted(requested - found)
+
     @action(detail=True, methods=['post'])
     def follow(self, request, pk=None):
-        task = Task.objects.get(pk=pk)
-        TaskFollower.objects.get_or_create(user=request.user, task=task)
+        followers.follow(request.user, [self._task(request, pk).pk])
         return Response({'detail': 'Now following task.'})
 
     @action(detail=True, methods=['post'])
     def unfollow(self, request, pk=None):
-        TaskFollower.objects.filter(user=request.user, task__id=pk).delete()
-        return Response({'detail': 'Unfollowed task.'})
\ No newline at end of file
+        followers.unfollow(request.user, [self._task(request, pk).pk])
+        return Response({'detail': 'Unfollowed task.'})
+
+    @action(detail=False, methods=['post'])
+    def bulk_follow(self, request):
+        """Follow many tasks at once; tasks outside the user's projects are reported, not followed"""
+        task_ids, not_found = self._task_ids(request)
+        followers.follow(request.user, task_ids)
+        return Response({'followed': task_ids, 'not_found': not_found})
+
+    @action(detail=False, methods=['post'])
+    def bulk_unfollow(self, request):
+        task_ids, not_found = self._task_ids(request)
+        followers.unfollow(request.user, task_ids)
+        return Response({'unfollowed': task_ids, 'not_found': not_found})
+
+
+class DashboardView(APIView):
+    """
+    Cross-project "My Work" summary for the current user.
+
+    Runs a fixed number of queries regardless of how many projects the user
+    belongs to; per-status task counts come from the cached counters in
+    ``api.dashboard``.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        user = request.user
+        today = timezone.localdate()
+        limit = settings.DASHBOARD_TASK_LIMIT
+
+        projects = list(Project.objects.filter(members=user).values_list('id', 'name'))
+        project_counts = dashboard.get_status_counts('project', [pk for pk, _ in projects])
+        my_counts = dashboard.get_status_counts('user', [user.id])[user.id]
+
+        open_tasks = (
+            Task.objects.filter(assigned_to=user, project__members=user)
+            .exclude(status='done')
+            .select_related('assigned_to', 'project')
+            .order_by('due_date')
+        )
+        overdue = open_tasks.filter(due_date__lt=today)[:limit]
+        due_soon = open_tasks.filter(
+            due_date__gte=today,
+            due_date__lte=today + timedelta(days=settings.DASHBOARD_DUE_SOON_DAYS),
+        )[:limit]
+
+        recent_activity = (
+            TaskLog.objects.filter(task__project__members=user)
+            .select_related('changed_by')[:limit]
+        )
+
+        return Response({
+            'projects': [
+                {'id': pk, 'name': name, 'task_counts': project_counts[pk]}
+                for pk, name in projects
+            ],
+            'my_task_counts': my_counts,
+            'overdue': TaskListSerializer(overdue, many=True).data,
+            'due_soon': TaskListSerializer(due_soon, many=True).data,
+            'unread_notifications': Notification.objects.filter(user=user, is_read=False).count(),
+            'recent_activity': TaskLogSerializer(recent_activity, many=True).data,
+        })
+
+
+class SyncView(APIView):
+    """
+    Delta sync feed: everything that changed in the user's projects since a token.
+
+    ``since`` is the sequence number returned as ``next`` by the previous call
+    (``0`` for a full sync). Changes are read from ``ChangeEvent`` through the
+    ``(project_id, id)`` index, collapsed to the latest event per object, and
+    the surviving objects are loaded with one query per model. Projects the
+    user was removed from arrive as tombstones addressed to them alone.
+
+    A user who joins a project also gets a project event of their own. The
+    project's changes from before ``since`` were never in their feed, so if
+    there are any the change carries ``resync: true`` and the client fetches
+    that project again with ``?since=0&project={id}``.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    # Queryset, serializer and the field naming the project an object is in now
+    SOURCES = {
+        'project': (Project.objects.all(), ProjectSyncSerializer, 'id'),
+        'task': (Task.objects.all(), TaskSyncSerializer, 'project_id'),
+        'comment': (Comment.objects.all(), CommentSyncSerializer, 'project_id'),
+    }
+
+    def get(self, request):
+        since = self._int_param('since', 0)
+        limit = min(self._int_param('limit', settings.SYNC_PAGE_SIZE), settings.SYNC_MAX_PAGE_SIZE)
+        if since < 0 or limit < 1:
+            raise ValidationError({'detail': 'since must be >= 0 and limit >= 1.'})
+
+        project_ids = Project.objects.filter(members=request.user).values('id')
+        visible = Q(project_id__in=project_ids, user_id__isnull=True) | Q(user_id=request.user.id)
+        events = ChangeEvent.objects.filter(visible, id__gt=since)
+        project = self._int_param('project', None)
+        if project is not None:
+            events = events.filter(project_id=project)
+        events = list(
+            events.order_by('id')
+            .values_list('id', 'model', 'object_id', 'deleted', 'user_id')[:limit + 1]
+        )
+        has_more = len(events) > limit
+        events = events[:limit]
+
+        # Keep only the most recent event for each object in this page
+        latest = {}
+        joined = set()
+        for seq, model, object_id, deleted, user_id in events:
+            latest[(model, object_id)] = (seq, deleted)
+            if user_id is not None and not deleted:
+                joined.add(object_id)
+        resync = set()
+        if joined and since:
+            resync = set(ChangeEvent.objects.filter(project_id__in=joined, user_id__isnull=True, id__lte=since)
+                         .order_by().values_list('project_id', flat=True).distinct())
+
+        objects = {}
+        for model, (queryset, _, project_field) in self.SOURCES.items():
+            ids = [object_id for (m, object_id), (_, deleted) in latest.items() if m == model and not deleted]
+            if ids:
+                # An object moved to a project the user is not in is gone for them
+                objects[model] = queryset.filter(**{f'{project_field}__in': project_ids}).in_bulk(ids)
+
+        changes = []
+        for (model, object_id), (seq, deleted) in sorted(latest.items(), key=lambda item: item[1][0]):
+            instance = None if deleted else objects.get(model, {}).get(object_id)
+            serializer_class = self.SOURCES[model][1]
+            changes.append({
+                'seq': seq,
+                'type': model,
+                'id': object_id,
+                # An object missing here was deleted later (its tombstone
+                # follows) or now lives in a project the user is not in.
+                'deleted': instance is None,
+                'data': serializer_class(instance).data if instance is not None else None,
+                'resync': model == 'project' and instance is not None and object_id in resync,
+            })
+
+        return Response({
+            'changes': changes,
+            'next': str(events[-1][0] if events else since),
+            'has_more': has_more,
+        })
+
+    def _int_param(self, name, default):
+        value = self.request.query_params.get(name)
+        if value in (None, ''):
+            return default
+        try:
+            return int(value)
+        except ValueError:
+            raise ValidationError({'detail': f'{name} must be an integer.'})
+
+
+class ProfilingTokenView(APIView):
+    """Issue a signed token that turns on profiling for the requests carrying it"""
+    permission_classes = [IsAdminUser]
+
+    def post(self, request):
+        return Response({
+            'token': profiling.make_token(request.user),
+            'header': profiling.HEADER,
+            'expires_in': settings.PROFILING_TOKEN_MAX_AGE,
+            'enabled': settings.PROFILING_ENABLED,
+        })
+
+
+class ProfileReportView(APIView):
+    """A saved request profile: JSON report, or the raw cProfile dump with ``?download=prof``"""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, profile_id):
+        json_path, prof_path = profiling.report_paths(profile_id)
+        if request.query_params.get('download') == 'prof':
+            if not os.path.exists(prof_path):
+                raise Http404
+            return FileResponse(open(prof_path, 'rb'), as_attachment=True, filename=f'{profile_id}.prof')
+        try:
+            with open(json_path) as fh:
+                return Response(json.load(fh))
+        except FileNotFoundError:
+            raise Http404
@@ -0,0 +1,273 @@
+"""
+Outbound webhooks.
+
+Views call ``enqueue`` when a task changes or a comment is posted; that only
+writes ``WebhookDelivery`` rows. ``manage.py deliver_webhooks`` drains the
+queue out of band: due deliveries are claimed, grouped per subscription into
+batched payloads, signed with the subscription's secret and POSTed over
+pooled keep-alive connections. Failures are retried with exponential
+backoff until ``WEBHOOK_MAX_ATTEMPTS`` is reached.
+
+Receivers verify ``X-Webhook-Signature`` as
+``sha256=HMAC(secret, "<X-Webhook-Timestamp>." + body)``.
+
+Anyone can create a project and register a webhook, so endpoints are
+untrusted: only ``WEBHOOK_ALLOWED_SCHEMES`` are accepted, and every
+connection resolves the host itself and refuses loopback, private,
+link-local and other non-public addresses (``BlockedAddress``) unless
+``WEBHOOK_ALLOW_PRIVATE_ADDRESSES`` is on. The socket connects to the
+address that was checked, so a second DNS answer cannot swap it.
+"""
+import hashlib
+import hmac
+import http.client
+import ipaddress
+import json
+import socket
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F
+from django.utils import timezone
+
+from .models import WebhookDelivery, WebhookSubscription
+
+# How long a claimed delivery is hidden from other workers
+CLAIM_LEASE = timedelta(minutes=5)
+USER_AGENT = 'project-manager-webhooks/1.0'
+
+
+def enqueue(project_id, event, payload):
+    """Queue ``event`` for every active subscription of the project that wants it"""
+    now = timezone.now()
+    deliveries = [
+        WebhookDelivery(subscription=subscription, event=event, payload=payload, next_attempt_at=now)
+        for subscription in WebhookSubscription.objects.filter(project_id=project_id, is_active=True)
+        if subscription.wants(event)
+    ]
+    WebhookDelivery.objects.bulk_create(deliveries)
+    return len(deliveries)
+
+
+class BlockedAddress(OSError):
+    """The endpoint resolves to an address webhooks may not be sent to"""
+
+
+def check_url(url):
+    """Reason ``url`` may not be registered as an endpoint, or ``None``"""
+    parts = urlsplit(url)
+    if parts.scheme not in settings.WEBHOOK_ALLOWED_SCHEMES:
+        return f'URL scheme must be one of: {", ".join(settings.WEBHOOK_ALLOWED_SCHEMES)}.'
+    try:
+        address = ipaddress.ip_address(parts.hostname or '')
+    except ValueError:
+        # A host name; it is checked on every connection instead
+        return None
+    if not settings.WEBHOOK_ALLOW_PRIVATE_ADDRESSES and not is_public(address):
+        return 'URL must not point to a private, loopback or link-local address.'
+    return None
+
+
+def is_public(address):
+    address = ipaddress.ip_address(address)
+    if address.version == 6 and address.ipv4_mapped:
+        address = address.ipv4_mapped
+    return address.is_global and not address.is_multicast
+
+
+def resolve(host, port):
+    """The address to connect to for ``host``; raises ``BlockedAddress`` if any of its addresses is not public"""
+    addresses = [info[4][0] for info in socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)]
+    if not settings.WEBHOOK_ALLOW_PRIVATE_ADDRESSES:
+        for address in addresses:
+            if not is_public(address.split('%')[0]):
+                raise BlockedAddress(f'{host} resolves to non-public address {address}')
+    return addresses[0]
+
+
+class CheckedHTTPConnection(http.client.HTTPConnection):
+    def connect(self):
+        address = resolve(self.host, self.port)
+        self.sock = socket.create_connection((address, self.port), self.timeout, self.source_address)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+
+class CheckedHTTPSConnection(http.client.HTTPSConnection):
+    def connect(self):
+        address = resolve(self.host, self.port)
+        sock = socket.create_connection((address, self.port), self.timeout, self.source_address)
+        # Certificate and SNI still use the host name
+        self.sock = self._context.wrap_socket(sock, server_hostname=self.host)
+
+
+def sign(secret, timestamp, body):
+    digest = hmac.new(secret.encode(), f'{timestamp}.'.encode() + body, hashlib.sha256).hexdigest()
+    return f'sha256={digest}'
+
+
+def backoff(attempts):
+    """Seconds to wait before retrying after ``attempts`` failed tries"""
+    return min(settings.WEBHOOK_BACKOFF_BASE * 2 ** (attempts - 1), settings.WEBHOOK_BACKOFF_MAX)
+
+
+class ConnectionPool:
+    """Idle keep-alive connections, reused per (scheme, host, port)"""
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self._idle = defaultdict(list)
+        self._lock = threading.Lock()
+        self.connections_opened = 0
+
+    def post(self, url, body, headers):
+        """Send a POST and return the response status; raises ``OSError``/``HTTPException`` on failure"""
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port)
+        path = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+
+        connection = self._checkout(key)
+        reused = connection is not None
+        while True:
+            if connection is None:
+                connection = self._connect(key)
+            try:
+                connection.request('POST', path, body=body, headers=headers)
+                response = connection.getresponse()
+                response.read()
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                if reused:
+                    # The server may have dropped the idle connection; retry once on a fresh one
+                    connection, reused = None, False
+                    continue
+                raise
+            break
+
+        if response.will_close:
+            connection.close()
+        else:
+            with self._lock:
+                self._idle[key].append(connection)
+        return response.status
+
+    def close(self):
+        with self._lock:
+            for connections in self._idle.values():
+                for connection in connections:
+                    connection.close()
+            self._idle.clear()
+
+    def _checkout(self, key):
+        with self._lock:
+            return self._idle[key].pop() if self._idle[key] else None
+
+    def _connect(self, key):
+        scheme, host, port = key
+        connection_class = CheckedHTTPSConnection if scheme == 'https' else CheckedHTTPConnection
+        with self._lock:
+            self.connections_opened += 1
+        return connection_class(host, port, timeout=self.timeout)
+
+
+class Dispatcher:
+    """Deliver queued webhook events; one instance keeps its connection pool across passes"""
+
+    def __init__(self, batch_size=None, workers=None, per_endpoint=None):
+        self.batch_size = batch_size or settings.WEBHOOK_BATCH_SIZE
+        self.workers = workers or settings.WEBHOOK_WORKERS
+        self.per_endpoint = per_endpoint or settings.WEBHOOK_MAX_CONCURRENCY_PER_ENDPOINT
+        self.pool = ConnectionPool(settings.WEBHOOK_TIMEOUT)
+        self._endpoint_slots = defaultdict(lambda: threading.BoundedSemaphore(self.per_endpoint))
+
+    def close(self):
+        self.pool.close()
+
+    def run_once(self, limit):
+        """Deliver up to ``limit`` due events and return ``(delivered, failed)`` counts"""
+        deliveries = self.claim(limit)
+        batches = []
+        by_subscription = defaultdict(list)
+        for delivery in deliveries:
+            by_subscription[delivery.subscription_id].append(delivery)
+        for group in by_subscription.values():
+            for start in range(0, len(group), self.batch_size):
+                batches.append(group[start:start + self.batch_size])
+
+        delivered = failed = 0
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            # Only HTTP happens in the worker threads; results are saved here
+            for batch, status, error in executor.map(self.send, batches):
+                if error is None and 200 <= status < 300:
+                    self.mark_delivered(batch, status)
+                    delivered += len(batch)
+                else:
+                    self.mark_failed(batch, status, error or f'HTTP {status}')
+                    failed += len(batch)
+        return delivered, failed
+
+    def claim(self, limit):
+        now = timezone.now()
+        token = uuid.uuid4().hex
+        due = WebhookDelivery.objects.filter(
+            delivered_at__isnull=True, failed_at__isnull=True, next_attempt_at__lte=now,
+            subscription__is_active=True,
+        )
+        ids = list(due.order_by('next_attempt_at', 'id').values_list('id', flat=True)[:limit])
+        # Conditional update so two workers never claim the same row
+        WebhookDelivery.objects.filter(id__in=ids, next_attempt_at__lte=now).update(
+            claim_token=token, next_attempt_at=now + CLAIM_LEASE,
+        )
+        return list(
+            WebhookDelivery.objects.filter(claim_token=token)
+            .select_related('subscription').order_by('id')
+        )
+
+    def send(self, batch):
+        subscription = batch[0].subscription
+        body = json.dumps({
+            'deliveries': [
+                {'id': delivery.id, 'event': delivery.event, 'created_at': delivery.created_at,
+                 'data': delivery.payload}
+                for delivery in batch
+            ],
+        }, cls=DjangoJSONEncoder).encode()
+        timestamp = str(int(time.time()))
+        headers = {
+            'Content-Type': 'application/json',
+            'User-Agent': USER_AGENT,
+            'X-Webhook-Timestamp': timestamp,
+            'X-Webhook-Signature': sign(subscription.secret, timestamp, body),
+        }
+        with self._endpoint_slots[subscription.url]:
+            try:
+                return batch, self.pool.post(subscription.url, body, headers), None
+            except (OSError, http.client.HTTPException) as exc:
+                return batch, None, f'{exc.__class__.__name__}: {exc}'
+
+    def mark_delivered(self, batch, status):
+        WebhookDelivery.objects.filter(id__in=[delivery.id for delivery in batch]).update(
+            delivered_at=timezone.now(), last_status=status, last_error='',
+            attempts=F('attempts') + 1, claim_token='',
+        )
+
+    def mark_failed(self, batch, status, error):
+        now = timezone.now()
+        for delivery in batch:
+            delivery.attempts += 1
+            delivery.last_status = status
+            delivery.last_error = error[:1000]
+            delivery.claim_token = ''
+            if delivery.attempts >= settings.WEBHOOK_MAX_ATTEMPTS:
+                delivery.failed_at = now
+            else:
+                delivery.next_attempt_at = now + timedelta(seconds=backoff(delivery.attempts))
+        WebhookDelivery.objects.bulk_update(
+            batch, ['attempts', 'last_status', 'last_error', 'claim_token', 'failed_at', 'next_attempt_at'],
+        )
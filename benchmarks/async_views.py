@@ -0,0 +1,183 @@
+"""
+Compare the sync (WSGI) and async (ASGI) serving profiles under slow database calls.
+
+Every SQL statement is delayed by ``--latency`` milliseconds to mimic a remote
+or overloaded database. The sync profile is driven by a fixed pool of worker
+threads, like gunicorn sync workers; the async profile pushes all concurrent
+requests through a single ASGI application, like one uvicorn worker.
+
+Usage:
+    python benchmarks/async_views.py --requests 200 --concurrency 50 --latency 20 --sync-workers 4
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+ENDPOINTS = ['/api/notifications/', '/api/tasks/', '/api/projects/{project_id}/']
+
+
+def setup_django(db_path):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project_manager.settings')
+    from django.conf import settings
+    settings.DATABASES['default']['NAME'] = db_path
+    import django
+    django.setup()
+
+
+def seed(db_path):
+    setup_django(db_path)
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+    from rest_framework_simplejwt.tokens import AccessToken
+    from api.models import Notification, Project, Task
+
+    call_command('migrate', verbosity=0)
+    user = User.objects.create_user(username='bench', password='bench-pass')
+    project = Project.objects.create(name='Benchmark', manager=user)
+    project.members.add(user)
+    Task.objects.bulk_create([
+        Task(title=f'Task {i}', project=project, assigned_to=user, status=['todo', 'in_progress', 'done'][i % 3])
+        for i in range(200)
+    ])
+    Notification.objects.bulk_create([Notification(user=user, message=f'Note {i}') for i in range(50)])
+    return {'token': str(AccessToken.for_user(user)), 'project_id': project.id}
+
+
+def add_latency(seconds):
+    from django.db.backends.signals import connection_created
+
+    def delay(execute, sql, params, many, context):
+        time.sleep(seconds)
+        return execute(sql, params, many, context)
+
+    def install(sender, connection, **kwargs):
+        connection.execute_wrappers.append(delay)
+
+    connection_created.connect(install, weak=False)
+
+
+def run_sync(paths, token, workers):
+    from django.core.wsgi import get_wsgi_application
+    from wsgiref.util import setup_testing_defaults
+    application = get_wsgi_application()
+
+    def request(path):
+        environ = {'PATH_INFO': path, 'HTTP_AUTHORIZATION': f'Bearer {token}', 'HTTP_HOST': 'localhost'}
+        setup_testing_defaults(environ)
+        status = []
+        started = time.perf_counter()
+        body = application(environ, lambda s, headers: status.append(s))
+        b''.join(body)
+        assert status[0].startswith('200'), status[0]
+        return time.perf_counter() - started
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(request, paths))
+
+
+def run_async(paths, token, concurrency):
+    from django.core.asgi import get_asgi_application
+    application = get_asgi_application()
+
+    async def request(path, limit):
+        async with limit:
+            scope = {
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+                'method': 'GET', 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+                'query_string': b'', 'root_path': '', 'client': ('127.0.0.1', 0), 'server': ('localhost', 80),
+                'headers': [(b'host', b'localhost'), (b'authorization', f'Bearer {token}'.encode())],
+            }
+            received = False
+            status = []
+
+            async def receive():
+                nonlocal received
+                if not received:
+                    received = True
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+                await asyncio.Future()  # never disconnect
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    status.append(message['status'])
+
+            started = time.perf_counter()
+            await application(scope, receive, send)
+            assert status[0] == 200, status[0]
+            return time.perf_counter() - started
+
+    async def main():
+        limit = asyncio.Semaphore(concurrency)
+        return await asyncio.gather(*(request(path, limit) for path in paths))
+
+    return asyncio.run(main())
+
+
+def child(args):
+    setup_django(args.db)
+    add_latency(args.latency / 1000)
+    fixture = json.loads(args.fixture)
+    paths = [ENDPOINTS[i % len(ENDPOINTS)].format(**fixture) for i in range(args.requests)]
+
+    started = time.perf_counter()
+    if args.mode == 'sync':
+        latencies = run_sync(paths, fixture['token'], args.sync_workers)
+    else:
+        latencies = run_async(paths, fixture['token'], args.concurrency)
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(json.dumps({
+        'mode': args.mode,
+        'throughput': len(latencies) / elapsed,
+        'p50_ms': statistics.median(latencies) * 1000,
+        'p95_ms': latencies[int(len(latencies) * 0.95) - 1] * 1000,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=50, help='In-flight requests for the async profile')
+    parser.add_argument('--sync-workers', type=int, default=4, help='Worker threads for the sync profile')
+    parser.add_argument('--latency', type=float, default=20, help='Added delay per SQL statement, in ms')
+    parser.add_argument('--mode', choices=['sync', 'async'], help=argparse.SUPPRESS)
+    parser.add_argument('--db', help=argparse.SUPPRESS)
+    parser.add_argument('--fixture', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        return child(args)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.sqlite3')
+        fixture = seed(db_path)
+        print(f'{args.requests} GETs over {", ".join(ENDPOINTS)} with {args.latency:g} ms per query')
+        print(f'{"profile":<32}{"req/s":>10}{"p50 ms":>10}{"p95 ms":>10}')
+        for mode, async_views, label in [
+            ('sync', 'False', f'sync ({args.sync_workers} workers)'),
+            ('async', 'True', f'async ({args.concurrency} in flight)'),
+        ]:
+            env = dict(os.environ, ASYNC_READ_VIEWS=async_views)
+            output = subprocess.run(
+                [sys.executable, __file__, '--mode', mode, '--db', db_path, '--fixture', json.dumps(fixture),
+                 '--requests', str(args.requests), '--concurrency', str(args.concurrency),
+                 '--sync-workers', str(args.sync_workers), '--latency', str(args.latency)],
+                env=env, check=True, capture_output=True, text=True,
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(f'{label:<32}{result["throughput"]:>10.1f}{result["p50_ms"]:>10.1f}{result["p95_ms"]:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
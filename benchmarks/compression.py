@@ -0,0 +1,98 @@
+"""
+CPU cost vs bytes saved of response compression on task list pages.
+
+Renders synthetic ``GET /api/tasks/`` pages shaped like ``TaskListSerializer``
+output (the default expanded assignee included) and compresses each with
+every available encoding at several levels, one-shot and streamed in 8 KB
+chunks as ``CompressionMiddleware`` would. brotli and zstd rows appear only
+when their packages are installed.
+
+Usage:
+    python benchmarks/compression.py --page-sizes 20 100 1000 --repeat 50
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta, timezone
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+WORDS = ('review fix deploy update design write test plan migrate refactor api client board report '
+         'release sprint backlog invoice onboarding dashboard mobile search export billing').split()
+STREAM_CHUNK = 8192
+
+
+def task_page(rng, size):
+    """A paginated task list body with ``size`` results"""
+    users = [{'id': i, 'username': f'user{i}', 'email': f'user{i}@example.com',
+              'first_name': rng.choice(['Ana', 'Ben', 'Chen', 'Dara', 'Eli']), 'last_name': f'L{i}'}
+             for i in range(1, 40)]
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    results = []
+    for i in range(size):
+        project = rng.randint(1, 30)
+        results.append({
+            'id': 10000 + i,
+            'title': ' '.join(rng.choices(WORDS, k=rng.randint(3, 7))).capitalize(),
+            'status': rng.choice(['todo', 'in_progress', 'done']),
+            'position': f'{rng.randrange(36 ** 6):06x}',
+            'due_date': (date(2025, 3, 1) + timedelta(days=rng.randint(0, 120))).isoformat()
+            if rng.random() < 0.7 else None,
+            'project': project,
+            'project_name': f'Project {project}',
+            'assigned_to': rng.choice(users),
+            'created_at': (start + timedelta(seconds=rng.randint(0, 10 ** 7))).isoformat(),
+        })
+    return {'count': 50000, 'next': 'http://api.example.com/api/tasks/?page=3',
+            'previous': 'http://api.example.com/api/tasks/?page=1', 'results': results}
+
+
+def timed(repeat, func):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return (time.perf_counter() - started) / repeat, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--page-sizes', type=int, nargs='+', default=[20, 100, 1000])
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project_manager.settings')
+    import django
+    django.setup()
+    from rest_framework.renderers import JSONRenderer
+    from api import compression
+
+    candidates = [compression.GzipEncoder(level) for level in (1, 5, 6, 9)]
+    if compression.brotli:
+        candidates += [compression.BrotliEncoder(quality) for quality in (1, 4, 6, 11)]
+    if compression.zstandard:
+        candidates += [compression.ZstdEncoder(level) for level in (1, 3, 9, 19)]
+
+    rng = random.Random(args.seed)
+    for size in args.page_sizes:
+        body = JSONRenderer().render(task_page(rng, size))
+        chunks = [body[i:i + STREAM_CHUNK] for i in range(0, len(body), STREAM_CHUNK)]
+        print(f'\n{size} tasks per page: {len(body):,} bytes of JSON')
+        print(f'{"encoding":<12}{"bytes":>10}{"ratio":>8}{"saved":>9}{"µs/page":>10}{"MB/s":>8}'
+              f'{"streamed":>11}{"µs":>8}')
+        for encoder in candidates:
+            level = getattr(encoder, 'level', getattr(encoder, 'quality', None))
+            seconds, compressed = timed(args.repeat, lambda: encoder.compress(body))
+            streamed_seconds, streamed = timed(
+                args.repeat, lambda: b''.join(compression.compress_stream(encoder, chunks)))
+            label = f'{encoder.name}-{level}' if level is not None else encoder.name
+            print(f'{label:<12}{len(compressed):>10,}{len(body) / len(compressed):>7.1f}x'
+                  f'{len(body) - len(compressed):>9,}{seconds * 1e6:>10.0f}{len(body) / seconds / 1e6:>8.0f}'
+                  f'{len(streamed):>11,}{streamed_seconds * 1e6:>8.0f}')
+
+
+if __name__ == '__main__':
+    main()
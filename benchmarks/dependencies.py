@@ -0,0 +1,58 @@
+"""
+Dependency graph queries on a large synthetic project.
+
+Builds ``DependencyGraph`` from generated task and edge rows (no database) and
+times each read the project dependency endpoints serve.
+
+Usage:
+    python benchmarks/dependencies.py --tasks 50000 --edges 100000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--tasks', type=int, default=50000)
+    parser.add_argument('--edges', type=int, default=100000)
+    parser.add_argument('--span', type=int, default=500,
+                        help='How far apart (in creation order) a blocker and its task may be')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project_manager.settings')
+    import django
+    django.setup()
+    from api.dependencies import DependencyGraph
+
+    rng = random.Random(args.seed)
+    start = date(2025, 1, 1)
+    tasks = [
+        (pk, f'Task {pk}', rng.choice(['todo', 'in_progress', 'done']),
+         start + timedelta(days=rng.randint(0, 365)) if rng.random() < 0.7 else None, 1)
+        for pk in range(1, args.tasks + 1)
+    ]
+    edges = set()
+    while len(edges) < args.edges:
+        blocker = rng.randint(1, args.tasks - 1)
+        edges.add((blocker, rng.randint(blocker + 1, min(args.tasks, blocker + args.span))))
+
+    print(f'{args.tasks} tasks, {len(edges)} dependencies')
+    started = time.perf_counter()
+    graph = DependencyGraph(tasks, edges)
+    print(f'{"build":<20}{(time.perf_counter() - started) * 1000:>10.1f} ms')
+    for name in ['topological_order', 'blocked', 'ready', 'critical_path']:
+        started = time.perf_counter()
+        result = getattr(graph, name)()
+        print(f'{name:<20}{(time.perf_counter() - started) * 1000:>10.1f} ms  ({len(result)} tasks)')
+
+
+if __name__ == '__main__':
+    main()
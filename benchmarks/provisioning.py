@@ -0,0 +1,44 @@
+"""
+Password hashing throughput of bulk provisioning for different pool sizes.
+
+Hashing dominates bulk user creation, so this measures ``hash_passwords``
+alone with the configured PASSWORD_HASHERS.
+
+Usage:
+    python benchmarks/provisioning.py --passwords 64 --workers 1 2 4 8
+"""
+import argparse
+import os
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--passwords', type=int, default=64)
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project_manager.settings')
+    import django
+    django.setup()
+    from api.provisioning import hash_passwords
+
+    passwords = [f'password-{i}' for i in range(args.passwords)]
+    print(f'{args.passwords} passwords on {os.cpu_count()} cores')
+    print(f'{"workers":<10}{"hashes/s":>12}{"speedup":>10}')
+    baseline = None
+    for workers in args.workers:
+        started = time.perf_counter()
+        hash_passwords(passwords, workers)
+        rate = args.passwords / (time.perf_counter() - started)
+        baseline = baseline or rate
+        print(f'{workers:<10}{rate:>12.1f}{rate / baseline:>9.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Measure worker cold start for ``project_manager.wsgi``.
+
+Each sample runs in a fresh interpreter and records the time to import the
+WSGI module and the time to serve the first request (``/api/health/``), plus
+whether optional heavy modules were pulled in along the way.
+
+Usage:
+    python benchmarks/startup.py --samples 5
+    python benchmarks/startup.py --json   # machine-readable, used by the budget test
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that should only be imported when the docs endpoints are used
+LAZY_MODULES = ['drf_spectacular.views', 'drf_spectacular.generators']
+
+PROBE = r'''
+import json, os, sys, time
+sys.path.insert(0, {base_dir!r})
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project_manager.settings')
+started = time.perf_counter()
+from django.conf import settings
+settings.DATABASES['default']['NAME'] = ':memory:'
+import project_manager.wsgi
+imported = time.perf_counter()
+
+from wsgiref.util import setup_testing_defaults
+environ = {{'PATH_INFO': '/api/health/', 'HTTP_HOST': 'localhost'}}
+setup_testing_defaults(environ)
+status = []
+b''.join(project_manager.wsgi.application(environ, lambda s, h: status.append(s)))
+served = time.perf_counter()
+
+print(json.dumps({{
+    'import_ms': (imported - started) * 1000,
+    'first_request_ms': (served - imported) * 1000,
+    'status': status[0],
+    'loaded_lazy_modules': [m for m in {lazy_modules!r} if m in sys.modules],
+}}))
+'''
+
+
+def sample():
+    code = PROBE.format(base_dir=BASE_DIR, lazy_modules=LAZY_MODULES)
+    output = subprocess.run([sys.executable, '-c', code], check=True, capture_output=True, text=True,
+                            cwd=BASE_DIR).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def measure(samples):
+    results = [sample() for _ in range(samples)]
+    return {
+        'import_ms': statistics.median(r['import_ms'] for r in results),
+        'first_request_ms': statistics.median(r['first_request_ms'] for r in results),
+        'status': results[-1]['status'],
+        'loaded_lazy_modules': sorted({m for r in results for m in r['loaded_lazy_modules']}),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--samples', type=int, default=5)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    result = measure(args.samples)
+    if args.json:
+        print(json.dumps(result))
+        return
+    print(f'median of {args.samples} cold starts')
+    print(f'  import project_manager.wsgi: {result["import_ms"]:.1f} ms')
+    print(f'  first request (/api/health/): {result["first_request_ms"]:.1f} ms  [{result["status"]}]')
+    print(f'  lazy modules loaded: {", ".join(result["loaded_lazy_modules"]) or "none"}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,15 @@
+"""
+Gunicorn configuration for the async (ASGI) serving profile.
+
+Usage:
+    ASYNC_READ_VIEWS=True gunicorn project_manager.asgi:application -c gunicorn_async.conf.py
+"""
+import multiprocessing
+
+from decouple import config
+
+bind = config('GUNICORN_BIND', default='0.0.0.0:8000')
+worker_class = 'uvicorn.workers.UvicornWorker'
+workers = config('GUNICORN_WORKERS', default=multiprocessing.cpu_count() * 2 + 1, cast=int)
+timeout = config('GUNICORN_TIMEOUT', default=30, cast=int)
+keepalive = config('GUNICORN_KEEPALIVE', default=5, cast=int)
@@ -1,6 +1,7 @@
 from pathlib import Path
 from datetime import timedelta
 from decouple import config, Csv
+from corsheaders.defaults import default_headers
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -72,8 +73,125 @@ SPECTACULAR_SETTINGS = {
     'SCHEMA_PATH_PREFIX': '/api/',
 }
 
+# Prebuilt schema served at /api/schema/ (written by `manage.py build_schema`)
+OPENAPI_SCHEMA_DIR = config('OPENAPI_SCHEMA_DIR', default=str(BASE_DIR / 'openapi'))
+
+# Notification retention (enforced by `manage.py purge_notifications`)
+NOTIFICATION_RETENTION_DAYS = config('NOTIFICATION_RETENTION_DAYS', default=90, cast=int)
+NOTIFICATION_MAX_PER_USER = config('NOTIFICATION_MAX_PER_USER', default=1000, cast=int)
+NOTIFICATION_PURGE_CHUNK_SIZE = config('NOTIFICATION_PURGE_CHUNK_SIZE', default=1000, cast=int)
+NOTIFICATION_PURGE_SLEEP = config('NOTIFICATION_PURGE_SLEEP', default=0.1, cast=float)
+
+# "My Work" dashboard
+DASHBOARD_CACHE_TIMEOUT = config('DASHBOARD_CACHE_TIMEOUT', default=300, cast=int)
+DASHBOARD_DUE_SOON_DAYS = config('DASHBOARD_DUE_SOON_DAYS', default=3, cast=int)
+DASHBOARD_TASK_LIMIT = config('DASHBOARD_TASK_LIMIT', default=20, cast=int)
+
+# Due-date reminders (sent by `manage.py run_scheduler`)
+SCHEDULER_BATCH_SIZE = config('SCHEDULER_BATCH_SIZE', default=500, cast=int)
+SCHEDULER_DUE_SOON_DAYS = config('SCHEDULER_DUE_SOON_DAYS', default=1, cast=int)
+SCHEDULER_OVERDUE_LOOKBACK_DAYS = config('SCHEDULER_OVERDUE_LOOKBACK_DAYS', default=30, cast=int)
+
+# Delta sync feed
+SYNC_PAGE_SIZE = config('SYNC_PAGE_SIZE', default=500, cast=int)
+SYNC_MAX_PAGE_SIZE = config('SYNC_MAX_PAGE_SIZE', default=2000, cast=int)
+
+# Project membership
+PROJECT_MEMBERS_PAGE_SIZE = config('PROJECT_MEMBERS_PAGE_SIZE', default=50, cast=int)
+PROJECT_MEMBERS_MAX_PAGE_SIZE = config('PROJECT_MEMBERS_MAX_PAGE_SIZE', default=500, cast=int)
+PROJECT_MEMBERS_PREVIEW_SIZE = config('PROJECT_MEMBERS_PREVIEW_SIZE', default=5, cast=int)
+PROJECT_MEMBERS_BULK_LIMIT = config('PROJECT_MEMBERS_BULK_LIMIT', default=1000, cast=int)
+
+# Background project deletion (run by `manage.py process_deletions`)
+DELETION_CHUNK_SIZE = config('DELETION_CHUNK_SIZE', default=1000, cast=int)
+DELETION_SLEEP = config('DELETION_SLEEP', default=0.05, cast=float)
+
+# Idempotency-Key replay window and how long an unfinished request holds its key
+IDEMPOTENCY_KEY_TTL = config('IDEMPOTENCY_KEY_TTL', default=86400, cast=int)
+IDEMPOTENCY_LOCK_TIMEOUT = config('IDEMPOTENCY_LOCK_TIMEOUT', default=60, cast=int)
+
+# POST /api/batch/: sub-requests per batch and threads for concurrent reads
+BATCH_MAX_REQUESTS = config('BATCH_MAX_REQUESTS', default=25, cast=int)
+BATCH_MAX_WORKERS = config('BATCH_MAX_WORKERS', default=4, cast=int)
+
+# Outbound webhooks (delivered by `manage.py deliver_webhooks`)
+WEBHOOK_BATCH_SIZE = config('WEBHOOK_BATCH_SIZE', default=50, cast=int)
+WEBHOOK_WORKERS = config('WEBHOOK_WORKERS', default=8, cast=int)
+WEBHOOK_MAX_CONCURRENCY_PER_ENDPOINT = config('WEBHOOK_MAX_CONCURRENCY_PER_ENDPOINT', default=2, cast=int)
+WEBHOOK_TIMEOUT = config('WEBHOOK_TIMEOUT', default=10, cast=float)
+WEBHOOK_MAX_ATTEMPTS = config('WEBHOOK_MAX_ATTEMPTS', default=8, cast=int)
+WEBHOOK_BACKOFF_BASE = config('WEBHOOK_BACKOFF_BASE', default=30, cast=int)
+WEBHOOK_BACKOFF_MAX = config('WEBHOOK_BACKOFF_MAX', default=6 * 3600, cast=int)
+WEBHOOK_RECENT_DELIVERIES = config('WEBHOOK_RECENT_DELIVERIES', default=50, cast=int)
+# Endpoints are user-supplied: https only, and never internal addresses (turn on for local receivers)
+WEBHOOK_ALLOWED_SCHEMES = config('WEBHOOK_ALLOWED_SCHEMES', default='https', cast=Csv())
+WEBHOOK_ALLOW_PRIVATE_ADDRESSES = config('WEBHOOK_ALLOW_PRIVATE_ADDRESSES', default=False, cast=bool)
+
+# On-demand request profiling for staff (see api/profiling.py); off by default
+PROFILING_ENABLED = config('PROFILING_ENABLED', default=False, cast=bool)
+PROFILING_DIR = config('PROFILING_DIR', default=str(BASE_DIR / 'profiles'))
+PROFILING_RATE_LIMIT = config('PROFILING_RATE_LIMIT', default=10, cast=int)  # profiles per minute
+PROFILING_TOKEN_MAX_AGE = config('PROFILING_TOKEN_MAX_AGE', default=3600, cast=int)
+
+# Slow-query log (summarised by `manage.py slow_queries`); threshold 0 disables it
+SLOW_QUERY_THRESHOLD_MS = config('SLOW_QUERY_THRESHOLD_MS', default=500, cast=float)
+SLOW_QUERY_LOG_FILE = config('SLOW_QUERY_LOG_FILE', default=str(BASE_DIR / 'logs' / 'slow_queries.jsonl'))
+SLOW_QUERY_EXPLAIN = config('SLOW_QUERY_EXPLAIN', default=True, cast=bool)
+# Fraction of newly seen queries explained with EXPLAIN ANALYZE (re-runs the query)
+SLOW_QUERY_ANALYZE_SAMPLE_RATE = config('SLOW_QUERY_ANALYZE_SAMPLE_RATE', default=0.0, cast=float)
+
+# Bulk user provisioning (POST /api/users/bulk/ and `manage.py provision_users`)
+PROVISIONING_MAX_ROWS = config('PROVISIONING_MAX_ROWS', default=5000, cast=int)
+PROVISIONING_BATCH_SIZE = config('PROVISIONING_BATCH_SIZE', default=1000, cast=int)
+PROVISIONING_WORKERS = config('PROVISIONING_WORKERS', default=0, cast=int)  # 0 = one per CPU core
+
+# Board columns whose position keys grow longer than this are respaced by
+# `manage.py rebalance_positions` (run it from cron)
+TASK_POSITION_REBALANCE_LENGTH = config('TASK_POSITION_REBALANCE_LENGTH', default=24, cast=int)
+
+# Project analytics (GET /api/projects/{id}/analytics/): state folded from TaskLog is
+# cached this long and extended incrementally on each read
+ANALYTICS_CACHE_TIMEOUT = config('ANALYTICS_CACHE_TIMEOUT', default=86400, cast=int)
+ANALYTICS_BATCH_SIZE = config('ANALYTICS_BATCH_SIZE', default=5000, cast=int)
+# Rows this many seconds older than the newest one folded are read again, so a
+# transaction that committed late (with a lower id) is still folded in
+ANALYTICS_FOLD_OVERLAP = config('ANALYTICS_FOLD_OVERLAP', default=300, cast=int)
+# Largest cache entry the folded state is split into (memcached refuses items over 1 MB by default)
+ANALYTICS_CACHE_ITEM_BYTES = config('ANALYTICS_CACHE_ITEM_BYTES', default=900 * 1024, cast=int)
+ANALYTICS_MAX_WEEKS = config('ANALYTICS_MAX_WEEKS', default=104, cast=int)
+
+# Task and project activity feeds (comments and change log, cursor-paginated)
+ACTIVITY_PAGE_SIZE = config('ACTIVITY_PAGE_SIZE', default=50, cast=int)
+ACTIVITY_MAX_PAGE_SIZE = config('ACTIVITY_MAX_PAGE_SIZE', default=200, cast=int)
+
+# Task followers: resolved follower sets are cached this long; bulk follow/unfollow limit
+FOLLOWER_CACHE_TIMEOUT = config('FOLLOWER_CACHE_TIMEOUT', default=3600, cast=int)
+FOLLOW_BULK_LIMIT = config('FOLLOW_BULK_LIMIT', default=1000, cast=int)
+
+# Hot/cold task storage (`manage.py archive_tasks`): done tasks of projects with no
+# activity for this many days move to the archive tables, in batches
+ARCHIVE_INACTIVE_DAYS = config('ARCHIVE_INACTIVE_DAYS', default=180, cast=int)
+ARCHIVE_BATCH_SIZE = config('ARCHIVE_BATCH_SIZE', default=500, cast=int)
+ARCHIVE_SLEEP = config('ARCHIVE_SLEEP', default=0.05, cast=float)
+
+# Response compression: encodings in server preference order (br and zstd need the
+# brotli and zstandard packages), the smallest body worth compressing, and levels
+COMPRESSION_ENABLED = config('COMPRESSION_ENABLED', default=True, cast=bool)
+COMPRESSION_ENCODINGS = config('COMPRESSION_ENCODINGS', default='zstd,br,gzip', cast=Csv())
+COMPRESSION_MIN_SIZE = config('COMPRESSION_MIN_SIZE', default=1024, cast=int)
+COMPRESSION_GZIP_LEVEL = config('COMPRESSION_GZIP_LEVEL', default=5, cast=int)
+COMPRESSION_BROTLI_QUALITY = config('COMPRESSION_BROTLI_QUALITY', default=4, cast=int)
+COMPRESSION_ZSTD_LEVEL = config('COMPRESSION_ZSTD_LEVEL', default=3, cast=int)
+
+# Serve the notification inbox, task list and project detail with async views.
+# Enable together with the ASGI server profile (see gunicorn_async.conf.py).
+ASYNC_READ_VIEWS = config('ASYNC_READ_VIEWS', default=False, cast=bool)
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'api.compression.CompressionMiddleware',  # Outermost body transform; see api/compression.py
+    'api.profiling.RequestProfilingMiddleware',  # Removes itself unless PROFILING_ENABLED
+    'api.slow_queries.SlowQueryViewMiddleware',
     'corsheaders.middleware.CorsMiddleware',  # Must be before CommonMiddleware
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -90,6 +208,7 @@ CORS_ALLOWED_ORIGINS = config(
     cast=Csv()
 )
 CORS_ALLOW_CREDENTIALS = True
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
 
 # Security Settings
 if not DEBUG:
@@ -132,6 +251,25 @@ DATABASES = {
     }
 }
 
+# Dashboard counters, follower sets and analytics state are adjusted in
+# place by whichever worker handled the write, so every worker must share
+# one cache. Required whenever more than one process serves requests; the
+# per-process fallback is only fit for development and tests.
+REDIS_URL = config('REDIS_URL', default='')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators